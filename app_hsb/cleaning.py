@@ -0,0 +1,135 @@
+"""
+Cleaning pipeline producing 'clean_cvd.csv' from the raw dataset 'cardio_train.csv'.
+
+The output is deterministic, and a manifest written next to it records the SHA-256 of the raw file it was built from,
+so that the pipeline only runs again when the raw data (or the pipeline) changes.
+
+Usage: python cleaning.py [--source cardio_train.csv] [--output clean_cvd.csv] [--chunksize N] [--force]
+"""
+import argparse
+import fcntl
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from features import add_features
+from model import file_digest
+
+# Bumped whenever the cleaning steps change, so that existing outputs are rebuilt
+CLEANING_VERSION = 1
+
+# Subjects under this age (years) are outliers: none of them had a cardiovascular disease, and none were aged 32 to 38
+MIN_AGE = 32
+
+# Cut-off values of blood pressure (mmHg), which also drop negative values, zeros and likely unit errors
+AP_HI_RANGE = (60, 300)
+AP_LO_RANGE = (40, 250)
+
+COLUMNS = ['id', 'age', 'sex', 'height', 'weight', 'ap_hi', 'ap_lo', 'cholesterol', 'gluc', 'smoke', 'alco', 'active', 'cardio',
+           'bmi', 'ap_m', 'ap_aha', 'lifestyle', 'healthy_ls']
+
+def clean_chunk(df):
+    """
+    Cleans rows of the raw dataset and adds the derived features.
+
+    Age is converted from days to years, subjects under MIN_AGE are dropped, swapped blood pressure values are put back
+    in the right column and values outside of AP_HI_RANGE and AP_LO_RANGE are dropped. Every step only depends on the row
+    itself, so that the dataset can be cleaned chunk by chunk.
+
+    Args:
+        df (pd.DataFrame): Rows of 'cardio_train.csv'.
+
+    Returns:
+        pd.DataFrame: The cleaned rows, with columns in the order of COLUMNS.
+    """
+    df = df.copy()
+    df['age'] = df['age'] / 365.25
+    df = df[df['age'] >= MIN_AGE]
+
+    swapped = df['ap_hi'] < df['ap_lo']
+    df['ap_hi'], df['ap_lo'] = np.where(swapped, df['ap_lo'], df['ap_hi']), np.where(swapped, df['ap_hi'], df['ap_lo'])
+    df = df[df['ap_hi'].between(*AP_HI_RANGE) & df['ap_lo'].between(*AP_LO_RANGE)].copy()
+
+    df['sex'] = np.where(df['gender'] == 1, 'female', 'male')
+    return add_features(df)[COLUMNS]
+
+def manifest_path(output):
+    return f"{os.path.splitext(output)[0]}.json"
+
+def is_up_to_date(source, output):
+    """
+    Checks that 'output' was built by the current pipeline from the current 'source' file, and was not modified since.
+    """
+    try:
+        with open(manifest_path(output)) as f:
+            manifest = json.load(f)
+        output_digest = file_digest(output)
+    except FileNotFoundError:
+        return False
+    return (manifest.get("version") == CLEANING_VERSION and manifest.get("source_digest") == file_digest(source)
+            and manifest.get("output_digest") == output_digest)
+
+def clean_dataset(source = 'cardio_train.csv', output = 'clean_cvd.csv', chunksize = None, force = False):
+    """
+    Builds the cleaned dataset, unless it is up to date.
+
+    Concurrent calls (e.g. the workers of a server loading the data) are serialized by a lock file next to the output,
+    so that the dataset is built once and the others find it up to date.
+
+    Args:
+        source (str): Path to the raw dataset.
+        output (str): Path to the cleaned dataset.
+        chunksize (int): If given, the raw dataset is read and cleaned by chunks of this many rows.
+        force (bool): Rebuild even if the output is up to date.
+
+    Returns:
+        bool: True if the cleaned dataset was (re)built.
+    """
+    if not force and is_up_to_date(source, output):
+        return False
+
+    with open(f"{output}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not force and is_up_to_date(source, output):
+            return False
+
+        # Written to a temporary file of this process first, so that readers never see a partial dataset
+        directory = os.path.dirname(os.path.abspath(output))
+        descriptor, temporary = tempfile.mkstemp(dir = directory, suffix = ".tmp")
+        try:
+            with os.fdopen(descriptor, 'w', newline = '') as f:
+                chunks = pd.read_csv(source, sep = ';', chunksize = chunksize) if chunksize else [pd.read_csv(source, sep = ';')]
+                for i, chunk in enumerate(chunks):
+                    clean_chunk(chunk).to_csv(f, header = i == 0, index = False)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, output)
+
+            manifest = {"version": CLEANING_VERSION, "source": source, "source_digest": file_digest(source), "output_digest": file_digest(output)}
+            descriptor, temporary = tempfile.mkstemp(dir = directory, suffix = ".tmp")
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(manifest, f, indent = 2)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, manifest_path(output))
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default = 'cardio_train.csv')
+    parser.add_argument('--output', default = 'clean_cvd.csv')
+    parser.add_argument('--chunksize', type = int, default = None, help = "Rows read and cleaned at a time")
+    parser.add_argument('--force', action = 'store_true', help = "Rebuild even if the output is up to date")
+    args = parser.parse_args()
+
+    if clean_dataset(args.source, args.output, args.chunksize, args.force):
+        print(f"{args.output} built from {args.source} ({len(pd.read_csv(args.output))} subjects)")
+    else:
+        print(f"{args.output} is up to date")
+
+
+if __name__ == '__main__':
+    main()
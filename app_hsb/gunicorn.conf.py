@@ -0,0 +1,24 @@
+# Gunicorn settings for serving the app in production: gunicorn -c gunicorn.conf.py wsgi:app
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('HSB_BIND', '0.0.0.0:5000')
+
+# Pre-fork workers, each serving requests on several threads
+workers = int(os.environ.get('HSB_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('HSB_THREADS', 4))
+worker_class = 'gthread'
+
+# Seconds an idle keep-alive connection stays open
+keepalive = int(os.environ.get('HSB_KEEPALIVE', 5))
+timeout = int(os.environ.get('HSB_TIMEOUT', 60))
+
+# Load the model and the datasets once in the master process, workers share them through copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the garbage collector's reach, so that collections in the
+    # workers do not write to (and therefore copy) the pages shared with the master
+    gc.freeze()
@@ -1,17 +1,19 @@
-from flask import Flask, render_template, abort, url_for, request
+from flask import Flask, Blueprint, current_app, render_template, abort, url_for, request, jsonify
 from flask_wtf import FlaskForm
 from wtforms import StringField, SubmitField, IntegerField, RadioField
 from wtforms.validators import NumberRange, DataRequired
 from viz_dicts import viz_data
-from utils import load_data, load_raw_data
-import joblib
-import pandas as pd
+from model import ModelArtifacts, canary_subjects, memory_usage, MODEL_BACKENDS, PREDICTION_MODES, WARNING_AGE, WARNING_BP
+import hmac
+import os
+import tempfile
+import threading
+import time
 
 import numpy
 print(numpy.__version__)
 
-app = Flask(__name__, template_folder='templates')
-app.config['SECRET_KEY'] = "22475"
+bp = Blueprint('hsb', __name__)
 
 class InputForm(FlaskForm):
     age_input = IntegerField("Age: ", validators=[DataRequired(), NumberRange(min=18, max=85)])
@@ -24,22 +26,169 @@ class InputForm(FlaskForm):
  
     submit = SubmitField("Evaluate cardiovascular risk")
 
-svm = joblib.load('hsb_svm.pkl')
-scaler = joblib.load('hsb_scaler.pkl')
-le = joblib.load('hsb_le.pkl')
+def configure(app):
+    app.config['SECRET_KEY'] = "22475"
+    app.config['MAX_BATCH_SIZE'] = 5000
+    # Inference backend ('svm', 'reduced', 'kernel_approx' or 'portable'), HSB_MODEL_PATH overrides its model file
+    app.config['MODEL_BACKEND'] = os.environ.get('HSB_MODEL_BACKEND', 'svm')
+    app.config['MODEL_PATH'] = os.environ.get('HSB_MODEL_PATH', MODEL_BACKENDS[app.config['MODEL_BACKEND']])
+    # Memory-map the model arrays, so that worker processes share them read-only
+    app.config['MODEL_MMAP'] = os.environ.get('HSB_MODEL_MMAP', '0') == '1'
+    # Precision of the support vectors and kernel evaluation ('float64', 'float32' or 'float16'), for RBF-kernel SVMs
+    app.config['MODEL_PRECISION'] = os.environ.get('HSB_MODEL_PRECISION', 'float64')
+    app.config['SCALER_PATH'] = 'hsb_scaler.pkl'
+    app.config['LE_PATH'] = 'hsb_le.pkl'
+    app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('HSB_PREDICTION_CACHE_SIZE', 4096))
+    # Aggregate concurrent '/ml' predictions into batches of up to MICRO_BATCH_SIZE subjects, within MICRO_BATCH_WAIT_MS
+    app.config['MICRO_BATCH'] = os.environ.get('HSB_MICRO_BATCH', '0') == '1'
+    app.config['MICRO_BATCH_SIZE'] = int(os.environ.get('HSB_MICRO_BATCH_SIZE', 64))
+    app.config['MICRO_BATCH_WAIT_MS'] = float(os.environ.get('HSB_MICRO_BATCH_WAIT_MS', 2))
+    # Decision grid built with 'python model_build.py grid', used only if it matches the model
+    app.config['DECISION_GRID_PATH'] = os.environ.get('HSB_DECISION_GRID_PATH', 'hsb_grid.npy')
+    app.config['DECISION_GRID_META_PATH'] = os.environ.get('HSB_DECISION_GRID_META_PATH', 'hsb_grid.json')
+    # Calibration of the decision values built with 'python model_build.py calibrate'
+    app.config['CALIBRATION_PATH'] = os.environ.get('HSB_CALIBRATION_PATH', 'hsb_calibration.json')
+    # 'risk' shows the calibrated risk and ignores the grid; 'lookup' answers by grid lookup, without the risk
+    app.config['PREDICTION_MODE'] = os.environ.get('HSB_PREDICTION_MODE', 'risk')
+    if app.config['PREDICTION_MODE'] not in PREDICTION_MODES:
+        raise ValueError(f"HSB_PREDICTION_MODE must be one of {', '.join(PREDICTION_MODES)}")
+    # Hot reload: artifact files are polled every RELOAD_INTERVAL seconds (0 disables it), and '/admin/reload'
+    # is enabled by setting ADMIN_TOKEN. New artifacts must agree with the served ones on RELOAD_MIN_AGREEMENT of the canary batch
+    app.config['RELOAD_INTERVAL'] = float(os.environ.get('HSB_RELOAD_INTERVAL', 5))
+    app.config['RELOAD_CANARY_SIZE'] = int(os.environ.get('HSB_RELOAD_CANARY_SIZE', 256))
+    app.config['RELOAD_MIN_AGREEMENT'] = float(os.environ.get('HSB_RELOAD_MIN_AGREEMENT', 0.5))
+    app.config['ADMIN_TOKEN'] = os.environ.get('HSB_ADMIN_TOKEN')
+    # Touched by '/admin/reload' and watched with the artifacts, so that every worker process reloads.
+    # It must be writable by the workers, which the app directory is not in the Docker image
+    app.config['RELOAD_TRIGGER_PATH'] = os.environ.get('HSB_RELOAD_TRIGGER_PATH', os.path.join(tempfile.gettempdir(), 'hsb_reload.trigger'))
+    # Visualization pages are computed on first request, unless preloaded at startup (e.g. to share them across workers)
+    app.config['VIZ_PRELOAD'] = os.environ.get('HSB_VIZ_PRELOAD', '0') == '1'
+    # Downcast the dataset of the visualization pages to its narrowest dtypes
+    app.config['LOW_MEMORY'] = os.environ.get('HSB_LOW_MEMORY', '0') == '1'
+    # Snapshot of the visualization pages built with 'python viz_dicts.py', used only if it matches the datasets
+    app.config['VIZ_SNAPSHOT_PATH'] = os.environ.get('HSB_VIZ_SNAPSHOT_PATH', 'hsb_viz.json')
 
-df = load_data()
-df_raw = load_raw_data()
+class ArtifactReloader:
+    """
+    Reloads the model artifacts without restarting the server.
 
-@app.route('/')
+    The new artifacts are loaded in a background thread and run on a canary batch, which warms them up and checks
+    their predictions, then swapped in with a single assignment: requests in flight finish with the artifacts
+    they started with, and a failed reload leaves the served artifacts untouched.
+
+    Memory-mapped files (the decision grid, and the model with MODEL_MMAP) must be replaced atomically by renaming
+    a new file over them: a reload is refused if one of them was rewritten in place.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.canary = canary_subjects(app.config['RELOAD_CANARY_SIZE'])
+        self.signature = self.files_signature()
+        self.generation = 0
+        self.last_reload = None
+        self.watcher_pid = None
+
+    def files_signature(self):
+        return ModelArtifacts.signature(self.app.config, [self.app.config['RELOAD_TRIGGER_PATH']])
+
+    def request_reload(self):
+        """
+        Touches the trigger file, so that the watcher of every worker process reloads the artifacts.
+        """
+        path = self.app.config['RELOAD_TRIGGER_PATH']
+        with open(path, 'a'):
+            os.utime(path)
+
+    def reload(self):
+        if not self.lock.acquire(blocking=False):
+            return False
+        self._reload()
+        return True
+
+    def _reload(self):
+        # Called with the lock held, released here
+        config = self.app.config
+        started = time.perf_counter()
+        signature = self.files_signature()
+        try:
+            in_place = ModelArtifacts.modified_in_place(config, self.signature, signature)
+            if in_place:
+                raise ValueError(f"{', '.join(in_place)} changed in place while memory-mapped: write the new file "
+                                 "under another name, then rename it over the served one")
+            served = self.app.extensions['hsb_artifacts']
+            artifacts = ModelArtifacts.load(config)
+            report = artifacts.validate(self.canary, served, config['RELOAD_MIN_AGREEMENT'])
+        except Exception as error:
+            self.last_reload = {"status": "failed", "error": str(error), "at": time.time()}
+            self.app.logger.warning("Model artifacts reload failed, keeping the served ones: %s", error)
+        else:
+            self.app.extensions['hsb_artifacts'] = artifacts
+            served.close()
+            self.generation += 1
+            self.last_reload = dict(report, status="ok", generation=self.generation, seconds=time.perf_counter() - started, at=time.time())
+            self.app.logger.info("Model artifacts reloaded (generation %d)", self.generation)
+        finally:
+            self.signature = signature
+            self.lock.release()
+
+    def start_watcher(self):
+        # Started on first request, in each worker process, since threads do not survive a fork
+        if self.app.config['RELOAD_INTERVAL'] > 0 and self.watcher_pid != os.getpid():
+            self.watcher_pid = os.getpid()
+            threading.Thread(target=self.watch, daemon=True).start()
+
+    def watch(self):
+        pending = None
+        while True:
+            time.sleep(self.app.config['RELOAD_INTERVAL'])
+            signature = self.files_signature()
+            if signature == self.signature:
+                pending = None
+            elif signature == pending:
+                # Unchanged since the last poll, so the files are no longer being written
+                self.reload()
+                pending = None
+            else:
+                pending = signature
+
+    def stats(self):
+        return {"generation": self.generation, "reloading": self.lock.locked(), "last_reload": self.last_reload}
+
+def create_app():
+    """
+    Creates the Flask app and loads the model (and, with VIZ_PRELOAD, the visualization pages).
+
+    Everything is loaded here, so that a pre-fork server loading the app in its master process
+    (see wsgi.py) shares it with all of its workers.
+    """
+    app = Flask(__name__, template_folder='templates')
+    configure(app)
+
+    memory_before_load = memory_usage()
+    app.extensions['hsb_artifacts'] = ModelArtifacts.load(app.config)
+    viz_data.low_memory = app.config['LOW_MEMORY']
+    viz_data.load_snapshot(app.config['VIZ_SNAPSHOT_PATH'])
+    if app.config['VIZ_PRELOAD']:
+        viz_data.load_all()
+    app.extensions['hsb_memory'] = {"before_load": memory_before_load, "after_load": memory_usage()}
+    app.extensions['hsb_reloader'] = ArtifactReloader(app)
+
+    app.register_blueprint(bp)
+    return app
+
+@bp.before_app_request
+def start_reload_watcher():
+    current_app.extensions['hsb_reloader'].start_watcher()
+
+@bp.route('/')
 def home():
     return render_template('home.html')
 
-@app.route('/viz-home')
+@bp.route('/viz-home')
 def viz_home():
     return render_template('viz_home.html')
 
-@app.route('/visualization/<viz_id>')
+@bp.route('/visualization/<viz_id>')
 def visualization(viz_id):
     if viz_id not in viz_data:
         abort(404) 
@@ -50,7 +199,7 @@ def visualization(viz_id):
     return render_template("viz_base.html", **data)
 
 
-@app.route('/ml', methods = ['GET', 'POST'])
+@bp.route('/ml', methods = ['GET', 'POST'])
 def ml():
     warning_age = ""
     warning_height = ""
@@ -61,12 +210,12 @@ def ml():
     if user_input.age_input.data is None:
         pass
     elif user_input.age_input.data not in range(39,66,1):
-        warning_age = "Model was trained on data from subjects aged from 39 to 65 years. Outside of this age range, prediction may loose in accuracy."
+        warning_age = WARNING_AGE
        
     if user_input.aphi_input.data is None or user_input.aplo_input.data is None:
         pass
     elif user_input.aphi_input.data < 50 or user_input.aplo_input.data <50:
-        warning_bp = "Systolic and/or diastolic blood pressure values appears to be very low. Please consider rechecking the values."
+        warning_bp = WARNING_BP
 
     if user_input.validate_on_submit():
         user_age = user_input.age_input.data
@@ -77,32 +226,16 @@ def ml():
         user_cholesterol = int(user_input.cholesterol_input.data)
         user_gluc = int(user_input.gluc_input.data)
 
-        user_height_in_meters = user_height / 100     # Convert height (cm to meters)
-        user_bmi = round(user_weight / (user_height_in_meters ** 2), 1)
-
-        user_apm = round((user_aphi + 2 * user_aplo) / 3, 1)
-
-        test_data = {
-            "age": [user_age],
-            "ap_hi": [user_aphi],
-            "ap_lo": [user_aplo],
-            "cholesterol": [user_cholesterol],
-            "gluc": [user_gluc],
-            "bmi": [user_bmi],
-            "ap_m": [user_apm]
-        }
-
-        df_subject = pd.DataFrame(test_data)
-        df_s1 = df_subject.copy()
-        df_subject['cholesterol'] = le.transform(df_subject['cholesterol'])
-        df_subject['gluc'] = le.transform(df_subject['gluc'])
-        
-        cols = df_subject.columns
-        df_subject = scaler.transform(df_subject)
-        df_subject = pd.DataFrame(df_subject, columns = cols)
-
-        sub_pred = svm.predict(df_subject)
-        if sub_pred == [0]:
+        artifacts = current_app.extensions['hsb_artifacts']
+        decision_value = artifacts.decision_function(user_age, user_weight, user_height, user_aphi, user_aplo, user_cholesterol, user_gluc)
+        sub_pred = artifacts.label(decision_value)
+
+        risk_note = ""
+        risk = artifacts.risk(decision_value)
+        if risk is not None:
+            risk_note = f"<br><i>Estimated risk of cardiovascular disease: {risk:.0%}</i>."
+
+        if sub_pred == 0:
             test_output = f"""
                         <div>
                         <p id = "result-0">
@@ -111,7 +244,7 @@ def ml():
                         healthcare professional for personalized advice and preventive measures.
                         </p>
                         <p>
-                        <i>Note: This model has a 74% accuracy</i>.
+                        <i>Note: This model has a 74% accuracy</i>.{risk_note}
                         </p>
                         </div>"""
         else:
@@ -122,16 +255,52 @@ def ml():
                         <br>It's important to consult with a healthcare professional for further evaluation and guidance.
                         </p>
                         <p>
-                        <i>Note: This model has a 74% accuracy</i>.
+                        <i>Note: This model has a 74% accuracy</i>.{risk_note}
                         </p>
                         </div>
                         """
             
     return render_template("ml.html", user_form = user_input, test_result=test_output, warning_age=warning_age, warning_height=warning_height, warning_bp=warning_bp)
 
-@app.route('/about')
+@bp.route('/api/predict', methods = ['POST'])
+def api_predict():
+    payload = request.get_json(silent=True)
+    subjects = payload.get('subjects') if isinstance(payload, dict) else None
+    max_batch_size = current_app.config['MAX_BATCH_SIZE']
+
+    if not isinstance(subjects, list):
+        return jsonify(error="Request body must be a JSON object with a 'subjects' list."), 400
+    if len(subjects) > max_batch_size:
+        return jsonify(error=f"A batch may not contain more than {max_batch_size} subjects."), 413
+
+    return jsonify(results=current_app.extensions['hsb_artifacts'].predict_batch(subjects))
+
+@bp.route('/api/stats')
+def api_stats():
+    memory = dict(current_app.extensions['hsb_memory'], pid=os.getpid(), model_mmap=current_app.config['MODEL_MMAP'], current=memory_usage())
+    return jsonify(**current_app.extensions['hsb_artifacts'].stats(), memory=memory, datasets=viz_data.memory, reload=current_app.extensions['hsb_reloader'].stats())
+
+@bp.route('/admin/reload', methods = ['GET', 'POST'])
+def admin_reload():
+    token = current_app.config['ADMIN_TOKEN']
+    if not token or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        abort(404)
+
+    reloader = current_app.extensions['hsb_reloader']
+    if request.method == 'POST':
+        # Only the worker answering this request could reload now: the others are told through the trigger file
+        if current_app.config['RELOAD_INTERVAL'] <= 0:
+            return jsonify(error="Reloading requires HSB_RELOAD_INTERVAL > 0, so that every worker picks it up."), 409
+        try:
+            reloader.request_reload()
+        except OSError as error:
+            return jsonify(error=f"Could not request a reload: {error}"), 500
+        return jsonify(status="reload requested", within_seconds=2 * current_app.config['RELOAD_INTERVAL']), 202
+    return jsonify(reloader.stats())
+
+@bp.route('/about')
 def about():
     return render_template("about.html")
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,815 @@
+import hashlib
+import json
+import math
+import os
+import queue
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Future
+import joblib
+import numpy as np
+from features import bmi, ap_m
+
+# The model was fitted on a DataFrame, but is fed NumPy arrays at inference time
+warnings.filterwarnings("ignore", message = "X does not have valid feature names", category = UserWarning)
+
+# Features expected by the SVM, in the order used for training
+FEATURES = ["age", "ap_hi", "ap_lo", "cholesterol", "gluc", "bmi", "ap_m"]
+
+# Model files of each inference backend, built by model_build.py for all but 'svm'
+MODEL_BACKENDS = {
+    "svm": "hsb_svm.pkl",
+    "reduced": "hsb_svm_reduced.pkl",
+    "kernel_approx": "hsb_kernel_approx.pkl",
+    "portable": "hsb_svm.npz",
+}
+
+# Version of the sklearn-free model format written by 'python model_build.py export'
+PORTABLE_FORMAT_VERSION = 1
+
+# Storage precision of the support vectors: float16 support vectors are evaluated in float32
+MODEL_PRECISIONS = {"float64": np.float64, "float32": np.float32, "float16": np.float16}
+
+# What '/ml' answers with: the calibrated risk (with the label from the model), or the label by grid lookup (no risk)
+PREDICTION_MODES = ("risk", "lookup")
+
+# Raw inputs and their valid ranges, mirroring the NumberRange validators of InputForm
+INPUT_RANGES = {
+    "age": (18, 85),
+    "weight": (30, 220),
+    "height": (120, 220),
+    "ap_hi": (60, 260),
+    "ap_lo": (35, 200),
+    "cholesterol": (1, 3),
+    "gluc": (1, 3),
+}
+
+# Axes of the decision grid built by 'python model_build.py grid', in storage order
+GRID_AXES = ["age", "cholesterol", "gluc", "ap_hi", "ap_lo", "bmi"]
+
+# Bumped when grids built by older versions can no longer be trusted (version 2 masks the nodes near the boundary)
+GRID_FORMAT_VERSION = 2
+
+# Fields of /proc/self/smaps_rollup reported by memory_usage, in kB
+MEMORY_FIELDS = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_clean_mb", "Private_Dirty": "private_dirty_mb"}
+
+WARNING_AGE = "Model was trained on data from subjects aged from 39 to 65 years. Outside of this age range, prediction may loose in accuracy."
+WARNING_BP = "Systolic and/or diastolic blood pressure values appears to be very low. Please consider rechecking the values."
+
+
+def subject_warnings(age, ap_hi, ap_lo):
+    """
+    Lists the warnings raised by the '/ml' page for a subject's inputs.
+
+    Args:
+        age (int): Age of the subject, in years.
+        ap_hi (int): Systolic blood pressure, in mmHg.
+        ap_lo (int): Diastolic blood pressure, in mmHg.
+
+    Returns:
+        list: The warning messages that apply to the subject.
+    """
+    messages = []
+    if age not in range(39, 66, 1):
+        messages.append(WARNING_AGE)
+    if ap_hi < 50 or ap_lo < 50:
+        messages.append(WARNING_BP)
+    return messages
+
+
+def validate_subject(subject):
+    """
+    Checks a subject submitted to the prediction API against INPUT_RANGES.
+
+    Args:
+        subject (dict): Raw inputs of the subject, keyed by the names of INPUT_RANGES.
+
+    Returns:
+        tuple: The inputs converted to int and the list of errors found (empty if the subject is valid).
+    """
+    if not isinstance(subject, dict):
+        return None, ["Subject must be a JSON object."]
+
+    values = {}
+    errors = []
+    for name, (low, high) in INPUT_RANGES.items():
+        value = subject.get(name)
+        # NaN and infinities (accepted by the JSON parser) cannot be converted to int. Integers are compared
+        # to the range as they are: a huge one would overflow the conversion to float
+        if (isinstance(value, bool) or not isinstance(value, (int, float))
+                or isinstance(value, float) and (not math.isfinite(value) or value != int(value))):
+            errors.append(f"'{name}' must be an integer.")
+        elif not low <= value <= high:
+            errors.append(f"'{name}' must be between {low} and {high}.")
+        else:
+            values[name] = int(value)
+    return values, errors
+
+
+def load_model(path, mmap = False):
+    """
+    Loads a model dumped with joblib, or exported to the portable format if 'path' is a .npz file.
+
+    With 'mmap', the arrays of a joblib model (support vectors, dual coefficients...) are memory-mapped read-only
+    instead of being copied in memory, so that all the worker processes of a server share the same physical pages.
+    """
+    if path.endswith(".npz"):
+        return PortableSVM.load(path)
+    return joblib.load(path, mmap_mode = "r" if mmap else None)
+
+
+def memory_usage():
+    """
+    Reports the memory used by the current process, from /proc/self/smaps_rollup (Linux only).
+
+    PSS (proportional set size) splits shared pages between the processes mapping them, which makes it
+    the relevant figure to estimate how many workers fit in a container.
+
+    Returns:
+        dict: Values in MB, keyed as in MEMORY_FIELDS (empty if unavailable).
+    """
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                field, _, value = line.partition(":")
+                if field in MEMORY_FIELDS:
+                    usage[MEMORY_FIELDS[field]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+class Preprocessor:
+    """
+    Maps raw subject inputs to the scaled feature vector expected by the SVM, without going through pandas.
+
+    The label encoding and min-max scaling parameters are read once from the fitted LabelEncoder and
+    MinMaxScaler (or from a portable model), so that each prediction only costs a few arithmetic operations
+    on a NumPy array.
+    """
+    def __init__(self, scale, offset, classes, clip_range = None):
+        self.scale = np.asarray(scale, dtype = np.float64)
+        self.offset = np.asarray(offset, dtype = np.float64)
+        self.clip_range = clip_range
+        self.classes = np.asarray(classes)
+        self.codes = {label.item(): code for code, label in enumerate(self.classes)}
+
+    @classmethod
+    def from_fitted(cls, scaler, le):
+        clip_range = tuple(scaler.feature_range) if getattr(scaler, "clip", False) else None
+        return cls(scaler.scale_, scaler.min_, le.classes_, clip_range)
+
+    @classmethod
+    def from_files(cls, scaler_path, le_path):
+        return cls.from_fitted(joblib.load(scaler_path), joblib.load(le_path))
+
+    def encode(self, label):
+        try:
+            return self.codes[label]
+        except KeyError:
+            raise ValueError(f"y contains previously unseen labels: {label}") from None
+
+    def encode_batch(self, labels):
+        labels = np.asarray(labels)
+        codes = np.searchsorted(self.classes, labels).clip(0, len(self.classes) - 1)
+        if not np.array_equal(self.classes[codes], labels):
+            raise ValueError(f"y contains previously unseen labels: {np.setdiff1d(labels, self.classes)}")
+        return codes
+
+    def scale_features(self, features):
+        features *= self.scale
+        features += self.offset
+        if self.clip_range is not None:
+            np.clip(features, self.clip_range[0], self.clip_range[1], out = features)
+        return features
+
+    def scale_subject(self, age, ap_hi, ap_lo, cholesterol, gluc, bmi, ap_m):
+        """
+        Encodes and scales the model features of a single subject.
+
+        Returns:
+            np.ndarray: A (1, 7) array, with columns in the order of FEATURES.
+        """
+        features = np.array([[age, ap_hi, ap_lo, self.encode(cholesterol), self.encode(gluc), bmi, ap_m]], dtype = np.float64)
+        return self.scale_features(features)
+
+    def transform(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
+        """
+        Computes BMI and mean arterial pressure from the raw inputs of a single subject, then encodes and scales its features.
+
+        Returns:
+            np.ndarray: A (1, 7) array, with columns in the order of FEATURES.
+        """
+        height_in_meters = height / 100     # Convert height (cm to meters)
+        bmi = round(weight / (height_in_meters ** 2), 1)
+        ap_m = round((ap_hi + 2 * ap_lo) / 3, 1)
+        return self.scale_subject(age, ap_hi, ap_lo, cholesterol, gluc, bmi, ap_m)
+
+    def transform_batch(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
+        """
+        Vectorized counterpart of transform: each argument is an array with one value per subject.
+
+        Returns:
+            np.ndarray: A (n, 7) array, with columns in the order of FEATURES.
+        """
+        features = np.empty((len(weight), len(FEATURES)), dtype = np.float64)
+        features[:, 0] = age
+        features[:, 1] = ap_hi
+        features[:, 2] = ap_lo
+        features[:, 3] = self.encode_batch(cholesterol)
+        features[:, 4] = self.encode_batch(gluc)
+        features[:, 5] = bmi(weight, height)
+        features[:, 6] = ap_m(ap_hi, ap_lo)
+        return self.scale_features(features)
+
+
+class PortableSVM:
+    """
+    RBF-kernel SVM classifier evaluated with NumPy only, from the arrays exported by 'python model_build.py export'.
+
+    Its decision_function and predict reproduce those of the fitted SVC (up to floating point rounding), and the
+    export also carries the scaling and label encoding parameters, so that serving does not need scikit-learn.
+
+    With a reduced 'dtype', the support vectors are stored and the kernel evaluated in float32 (float16 support
+    vectors are converted to float32 at each call), which halves the memory read per prediction.
+    """
+    # Bounds the size of the (subjects x support vectors) kernel block evaluated at once
+    BLOCK_SIZE = 1 << 22
+
+    def __init__(self, support_vectors, dual_coef, intercept, gamma, classes, preprocessor, source_digest = None, dtype = np.float64):
+        self.storage_dtype = np.dtype(dtype)
+        self.dtype = np.dtype(np.float64 if self.storage_dtype == np.float64 else np.float32)
+        self.support_vectors_ = np.asarray(support_vectors, dtype = self.storage_dtype)
+        self.dual_coef_ = np.asarray(dual_coef, dtype = self.dtype).reshape(1, -1)
+        self.intercept_ = np.asarray(intercept, dtype = np.float64).reshape(1)
+        self.gamma = float(gamma)
+        self.classes_ = np.asarray(classes)
+        self.preprocessor = preprocessor
+        self.source_digest = source_digest
+        support_vectors = self.support_vectors_.astype(self.dtype)
+        self.sv_norms = np.einsum("ij,ij->i", support_vectors, support_vectors)
+
+    @classmethod
+    def from_svc(cls, svm, preprocessor, source_digest = None, dtype = np.float64):
+        """
+        Builds a portable model from a fitted binary RBF-kernel SVC.
+        """
+        if getattr(svm, "kernel", None) != "rbf" or len(getattr(svm, "classes_", [])) != 2:
+            raise ValueError(f"Only binary RBF-kernel SVC models can be converted, not {type(svm).__name__}")
+        # _gamma is the numeric value, also when the gamma parameter is 'scale' or 'auto'
+        return cls(svm.support_vectors_, svm.dual_coef_, svm.intercept_, svm._gamma, svm.classes_, preprocessor, source_digest, dtype)
+
+    def astype(self, dtype):
+        return PortableSVM(self.support_vectors_, self.dual_coef_, self.intercept_, self.gamma, self.classes_, self.preprocessor, self.source_digest, dtype)
+
+    @property
+    def nbytes(self):
+        return self.support_vectors_.nbytes + self.dual_coef_.nbytes
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle = False) as f:
+            version = int(f["format_version"])
+            if version != PORTABLE_FORMAT_VERSION:
+                raise ValueError(f"{path} uses version {version} of the portable model format, expected {PORTABLE_FORMAT_VERSION}")
+            clip_range = tuple(f["scaler_clip_range"]) if f["scaler_clip_range"].size else None
+            preprocessor = Preprocessor(f["scaler_scale"], f["scaler_min"], f["label_classes"], clip_range)
+            return cls(f["support_vectors"], f["dual_coef"], f["intercept"], f["gamma"], f["classes"], preprocessor, str(f["source_digest"]))
+
+    def decision_function(self, X):
+        """
+        Computes sum_i dual_coef_i * exp(-gamma * |x - sv_i|^2) + intercept for each row of X, by blocks of rows.
+
+        Returns:
+            np.ndarray: One decision value per row.
+        """
+        X = np.asarray(X, dtype = self.dtype)
+        support_vectors = self.support_vectors_
+        values = np.empty(len(X))
+        step = max(1, self.BLOCK_SIZE // len(support_vectors))
+        for start in range(0, len(X), step):
+            if support_vectors.dtype != self.dtype:
+                support_vectors = self.support_vectors_.astype(self.dtype)
+            block = X[start:start + step]
+            distances = block @ support_vectors.T
+            distances *= -2
+            distances += np.einsum("ij,ij->i", block, block)[:, None]
+            distances += self.sv_norms
+            np.maximum(distances, 0, out = distances)
+            distances *= -self.gamma
+            values[start:start + step] = np.exp(distances, out = distances) @ self.dual_coef_[0]
+        return values + self.intercept_[0]
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+
+class PredictionCache:
+    """
+    Size-bounded, thread-safe LRU cache of decision values, keyed on the scaled feature vector of a subject.
+
+    Inputs are integers within the form's ranges and BMI and mean arterial pressure are rounded to 0.1,
+    so identical subjects are frequent and their prediction can be reused.
+    """
+    def __init__(self, maxsize = 4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def decision_function(self, model, features):
+        """
+        Returns the decision value of 'model' for a (1, 7) feature array, from the cache when possible.
+        """
+        key = tuple(features.ravel().tolist())
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = float(model.decision_function(features)[0])
+        with self.lock:
+            self.entries[key] = value
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last = False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+            }
+
+
+def file_digest(path):
+    """
+    Computes the SHA-256 digest of a file, used to tie derived artifacts to the files they were built from.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Calibrator:
+    """
+    Maps the decision values of the model to probabilities with a sigmoid fitted offline (Platt scaling),
+    which avoids training the SVM with probability=True.
+    """
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = intercept
+
+    @classmethod
+    def load(cls, path, model_path, model_digest = None):
+        """
+        Loads a calibration, unless it is missing or was fitted for another model than the one at 'model_path'
+        (identified by 'model_digest' if given, such as the digest of the pickle a portable model was exported from).
+
+        Returns:
+            Calibrator or None
+        """
+        try:
+            with open(path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta["model_digest"] != (model_digest or file_digest(model_path)):
+            print(f"Ignoring {path}: it was not fitted for {model_path}")
+            return None
+        return cls(meta["coef"], meta["intercept"])
+
+    def probability(self, decision_value):
+        """
+        Returns the probability of class 1 for a decision value (or an array of decision values).
+        """
+        return 1 / (1 + np.exp(-(self.coef * decision_value + self.intercept)))
+
+
+class DecisionGrid:
+    """
+    Precomputed decision function of the SVM over a quantized grid of the valid input domain.
+
+    The grid is memory-mapped, so that a prediction is a single array lookup at the node closest to the subject.
+    Subjects outside of the grid, at nodes masked (NaN) because the label could change within their cell,
+    or whose decision value is within 'margin' of the decision boundary, are left to the live model.
+    """
+    def __init__(self, grid_path, meta_path):
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+        self.grid = np.load(grid_path, mmap_mode = "r")
+        self.axes = [self.meta["axes"][name] for name in GRID_AXES]
+        self.margin = self.meta["margin"]
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def load(cls, grid_path, meta_path, model_path, model_digest = None):
+        """
+        Loads a grid, unless it is missing or was built from another model than the one at 'model_path'
+        (identified by 'model_digest' if given).
+
+        Returns:
+            DecisionGrid or None
+        """
+        try:
+            grid = cls(grid_path, meta_path)
+        except FileNotFoundError:
+            return None
+        if grid.meta.get("version") != GRID_FORMAT_VERSION:
+            print(f"Ignoring {grid_path}: it was built by an older version of 'model_build.py grid'")
+            return None
+        if grid.meta["model_digest"] != (model_digest or file_digest(model_path)):
+            print(f"Ignoring {grid_path}: it was not built from {model_path}")
+            return None
+        return grid
+
+    def lookup(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
+        """
+        Returns the decision value at the grid node closest to the subject, or None if the subject is outside of the grid.
+        """
+        height_in_meters = height / 100
+        bmi = round(weight / (height_in_meters ** 2), 1)
+        index = []
+        for value, (start, step, size) in zip((age, cholesterol, gluc, ap_hi, ap_lo, bmi), self.axes):
+            i = round((value - start) / step)
+            if not 0 <= i < size:
+                return None
+            index.append(i)
+        return float(self.grid[tuple(index)])
+
+    def decision_function(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
+        """
+        Returns the decision value from the grid, or None when the live model must be used instead.
+        """
+        value = self.lookup(age, weight, height, ap_hi, ap_lo, cholesterol, gluc)
+        found = value is not None and abs(value) > self.margin
+        with self.lock:
+            if found:
+                self.hits += 1
+            else:
+                self.fallbacks += 1
+        return value if found else None
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "fallbacks": self.fallbacks, "margin": self.margin}
+
+
+class MicroBatcher:
+    """
+    Aggregates concurrent single-subject predictions into batched decision function calls.
+
+    Requests are queued, and a background thread takes all those waiting (up to 'max_batch_size'), waits at most
+    'max_wait' seconds for more, evaluates them together, then hands each result back to its caller.
+    The kernel evaluation of a batch is much cheaper per row than one call per subject.
+    Callers wait at most 'timeout' seconds for their result; once closed, predictions go straight to the model.
+    """
+    def __init__(self, model, max_batch_size = 64, max_wait = 0.002, timeout = 30.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pid = None
+        self.thread = None
+        self.requests = None
+        self.closed = False
+        self.batches = 0
+        self.rows = 0
+        self.max_rows = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    def start(self):
+        # Called with the lock held. The thread is started on first use, in the process that uses it:
+        # a thread started in the master process of a pre-fork server does not exist in its workers
+        if self.thread is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.requests = queue.Queue()
+            self.thread = threading.Thread(target = self.run, args = (self.requests,), daemon = True)
+            self.thread.start()
+
+    def close(self):
+        # Requests already queued are still served; later ones go straight to the model
+        with self.lock:
+            self.closed = True
+            if self.thread is not None and self.pid == os.getpid():
+                self.requests.put(None)
+            self.thread = None
+
+    def decision_function(self, features):
+        """
+        Queues a (1, 7) feature array and waits for its decision value.
+
+        Returns:
+            np.ndarray: A one-element array, like the decision_function of the model.
+
+        Raises:
+            TimeoutError: If the batch thread does not answer within 'timeout' seconds.
+        """
+        # Checked and queued under the lock, so that no request is queued after the sentinel put by close()
+        with self.lock:
+            closed = self.closed
+            if not closed:
+                self.start()
+                future = Future()
+                self.requests.put((features, time.perf_counter(), future))
+        if closed:
+            return self.model.decision_function(features)
+        return np.array([future.result(timeout = self.timeout)])
+
+    def run(self, requests):
+        while True:
+            first = requests.get()
+            if first is None:
+                self.drain(requests)
+                return
+            batch = [first]
+            # The window starts when the batch is opened: under load, requests have already waited
+            # for the previous batch, and those queued meanwhile are taken at once
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = requests.get_nowait()
+                except queue.Empty:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = requests.get(timeout = timeout)
+                    except queue.Empty:
+                        break
+                if item is None:
+                    requests.put(None)
+                    break
+                batch.append(item)
+            self.process(batch)
+
+    def drain(self, requests):
+        # Serves whatever is left behind the sentinel, so that no caller is left waiting
+        batch = []
+        while True:
+            try:
+                item = requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        for start in range(0, len(batch), self.max_batch_size):
+            self.process(batch[start:start + self.max_batch_size])
+
+    def process(self, batch):
+        started = time.perf_counter()
+        try:
+            values = self.model.decision_function(np.vstack([features for features, _, _ in batch]))
+        except Exception as error:
+            for _, _, future in batch:
+                future.set_exception(error)
+            return
+
+        delays = [started - queued for _, queued, _ in batch]
+        with self.lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.max_rows = max(self.max_rows, len(batch))
+            self.total_delay += sum(delays)
+            self.max_delay = max(self.max_delay, max(delays))
+        for (_, _, future), value in zip(batch, values):
+            future.set_result(float(value))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "requests": self.rows,
+                "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_rows,
+                "mean_queueing_delay_ms": 1000 * self.total_delay / self.rows if self.rows else 0.0,
+                "max_queueing_delay_ms": 1000 * self.max_delay,
+            }
+
+
+def canary_subjects(size = 256, seed = 0):
+    """
+    Draws a fixed batch of plausible subjects, used to check newly loaded model artifacts before serving them.
+
+    Returns:
+        list: Subjects in the format of the prediction API.
+    """
+    rng = np.random.RandomState(seed)
+    ap_lo = rng.randint(60, 101, size)
+    subjects = {
+        "age": rng.randint(39, 66, size),
+        "weight": rng.randint(50, 111, size),
+        "height": rng.randint(150, 191, size),
+        "ap_hi": ap_lo + rng.randint(20, 61, size),
+        "ap_lo": ap_lo,
+        "cholesterol": rng.randint(1, 4, size),
+        "gluc": rng.randint(1, 4, size),
+    }
+    return [{name: int(values[i]) for name, values in subjects.items()} for i in range(size)]
+
+
+def predict_batch(svm, preprocessor, subjects, calibrator = None):
+    """
+    Scores a list of subjects with a single preprocessing and decision function pass.
+
+    Invalid subjects are reported with their errors and left out of the prediction.
+
+    Args:
+        svm: The trained classifier.
+        preprocessor (Preprocessor): Maps raw inputs to scaled features.
+        subjects (list): Raw inputs of the subjects, as dicts.
+        calibrator (Calibrator): If given, the calibrated risk of each subject is added to its result.
+
+    Returns:
+        list: One result dict per subject, in input order.
+    """
+    results = []
+    valid = []
+    for index, subject in enumerate(subjects):
+        values, errors = validate_subject(subject)
+        if errors:
+            results.append({"index": index, "errors": errors})
+        else:
+            results.append({"index": index, "cardio": None, "warnings": subject_warnings(values["age"], values["ap_hi"], values["ap_lo"])})
+            valid.append((index, values))
+
+    if valid:
+        columns = {name: np.array([values[name] for _, values in valid]) for name in INPUT_RANGES}
+        values = svm.decision_function(preprocessor.transform_batch(**columns))
+        predictions = svm.classes_[(values > 0).astype(int)]
+        risks = calibrator.probability(values) if calibrator is not None else [None] * len(values)
+        for (index, _), prediction, risk in zip(valid, predictions, risks):
+            results[index]["cardio"] = int(prediction)
+            if risk is not None:
+                results[index]["risk"] = round(float(risk), 4)
+    return results
+
+
+class ModelArtifacts:
+    """
+    The model and everything derived from it (preprocessing, decision grid, calibration, prediction cache
+    and micro-batching), loaded together from the app configuration.
+    """
+    def __init__(self, model, preprocessor, decision_grid = None, calibrator = None, cache_size = 4096, batcher = None):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.decision_grid = decision_grid
+        self.calibrator = calibrator
+        self.prediction_cache = PredictionCache(cache_size)
+        self.batcher = batcher
+
+    @classmethod
+    def load(cls, config):
+        model_path = config["MODEL_PATH"]
+        model = load_model(model_path, mmap = config["MODEL_MMAP"])
+        # A portable model carries its own preprocessing, and is tied to the pickle it was exported from
+        if isinstance(model, PortableSVM):
+            preprocessor, model_digest = model.preprocessor, model.source_digest
+        else:
+            preprocessor, model_digest = Preprocessor.from_files(config["SCALER_PATH"], config["LE_PATH"]), None
+
+        precision = MODEL_PRECISIONS[config["MODEL_PRECISION"]]
+        if isinstance(model, PortableSVM):
+            model = model.astype(precision)
+        elif precision != np.float64:
+            model = PortableSVM.from_svc(model, preprocessor, dtype = precision)
+
+        batcher = None
+        if config["MICRO_BATCH"]:
+            batcher = MicroBatcher(model, config["MICRO_BATCH_SIZE"], config["MICRO_BATCH_WAIT_MS"] / 1000)
+
+        # The grid is only accurate enough for the label: the calibrated risk needs the exact decision value,
+        # and must match the one of '/api/predict', which always uses the model. Without a calibration, the grid is used
+        calibrator = decision_grid = None
+        if config["PREDICTION_MODE"] == "risk":
+            calibrator = Calibrator.load(config["CALIBRATION_PATH"], model_path, model_digest)
+        grid_args = (config["DECISION_GRID_PATH"], config["DECISION_GRID_META_PATH"], model_path, model_digest)
+        if calibrator is None:
+            decision_grid = DecisionGrid.load(*grid_args)
+        elif DecisionGrid.load(*grid_args) is not None:
+            warnings.warn(f"Ignoring {config['DECISION_GRID_PATH']}: the calibrated risk needs the exact decision value "
+                          "(set HSB_PREDICTION_MODE=lookup to answer by table lookup, without the risk)")
+        return cls(model, preprocessor, decision_grid, calibrator, config["PREDICTION_CACHE_SIZE"], batcher)
+
+    @staticmethod
+    def files(config):
+        return [config[key] for key in ("MODEL_PATH", "SCALER_PATH", "LE_PATH", "DECISION_GRID_PATH", "DECISION_GRID_META_PATH", "CALIBRATION_PATH")]
+
+    @staticmethod
+    def mapped_files(config):
+        # Files read through a memory map while they are served: they must be replaced, never rewritten in place
+        files = [config["DECISION_GRID_PATH"]]
+        if config["MODEL_MMAP"] and not config["MODEL_PATH"].endswith(".npz"):
+            files.append(config["MODEL_PATH"])
+        return files
+
+    @classmethod
+    def signature(cls, config, extra_files = ()):
+        """
+        Returns the inode, modification time and size of each artifact file (None if missing), to detect changes.
+        """
+        signature = []
+        for path in [*cls.files(config), *extra_files]:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None))
+        return tuple(signature)
+
+    @classmethod
+    def modified_in_place(cls, config, previous, current):
+        """
+        Lists the memory-mapped files that changed between two signatures without being replaced by a new file
+        (same inode): the pages of a served model or grid were then overwritten under it.
+        """
+        previous, current = dict((entry[0], entry[1:]) for entry in previous), dict((entry[0], entry[1:]) for entry in current)
+        return [path for path in cls.mapped_files(config)
+                if previous.get(path, (None,))[0] is not None and previous.get(path) != current.get(path)
+                and current.get(path, (None,))[0] == previous[path][0]]
+
+    def validate(self, subjects, reference = None, min_agreement = 0.0):
+        """
+        Runs a canary batch through the artifacts, which also warms them up before they serve requests.
+
+        Args:
+            subjects (list): Canary subjects (see canary_subjects).
+            reference (ModelArtifacts): Artifacts currently served, to compare the predictions with.
+            min_agreement (float): Minimal share of canary predictions agreeing with the reference.
+
+        Returns:
+            dict: The size of the canary batch and the agreement with the reference (None without reference).
+
+        Raises:
+            ValueError: If a prediction fails or the agreement is below min_agreement.
+        """
+        results = self.predict_batch(subjects)
+        for result in results:
+            if "errors" in result:
+                raise ValueError(f"Canary subject {result['index']} was rejected: {result['errors']}")
+            if result["cardio"] not in (0, 1) or not np.isfinite(result.get("risk", 0.0)):
+                raise ValueError(f"Invalid prediction for canary subject {result['index']}: {result}")
+
+        agreement = None
+        if reference is not None:
+            labels = [result["cardio"] for result in reference.predict_batch(subjects)]
+            agreement = float(np.mean([result["cardio"] == label for result, label in zip(results, labels)]))
+            if agreement < min_agreement:
+                raise ValueError(f"Canary predictions agree at {agreement:.1%} with the served model, below {min_agreement:.1%}.")
+        return {"canary_size": len(subjects), "agreement": agreement}
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+    def decision_function(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
+        """
+        Returns the decision value for the raw inputs of a single subject, from the decision grid when possible,
+        then from the prediction cache or the model (through the micro-batcher if enabled).
+        """
+        value = None
+        if self.decision_grid is not None:
+            value = self.decision_grid.decision_function(age, weight, height, ap_hi, ap_lo, cholesterol, gluc)
+        if value is None:
+            subject = self.preprocessor.transform(age, weight, height, ap_hi, ap_lo, cholesterol, gluc)
+            value = self.prediction_cache.decision_function(self.batcher or self.model, subject)
+        return value
+
+    def label(self, decision_value):
+        return self.model.classes_[int(decision_value > 0)]
+
+    def risk(self, decision_value):
+        """
+        Returns the calibrated risk for a decision value, or None if no calibration is available.
+        """
+        return self.calibrator.probability(decision_value) if self.calibrator is not None else None
+
+    def predict_batch(self, subjects):
+        return predict_batch(self.model, self.preprocessor, subjects, self.calibrator)
+
+    def stats(self):
+        return {
+            "prediction_cache": self.prediction_cache.stats(),
+            "decision_grid": self.decision_grid.stats() if self.decision_grid is not None else None,
+            "micro_batching": self.batcher.stats() if self.batcher is not None else None,
+        }
@@ -0,0 +1,519 @@
+"""
+Offline steps producing alternative model artifacts from 'hsb_svm.pkl' and 'cardio_train.csv'.
+
+Usage: python model_build.py <command> [options], run from the app_hsb directory.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import brier_score_loss, log_loss
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.svm import SVC
+from cleaning import clean_chunk
+from model import FEATURES, GRID_AXES, GRID_FORMAT_VERSION, INPUT_RANGES, MODEL_PRECISIONS, PORTABLE_FORMAT_VERSION, PortableSVM, Preprocessor, file_digest, load_model, memory_usage
+
+RANDOM_STATE = 46
+
+
+def load_training_data(path = 'cardio_train.csv'):
+    """
+    Rebuilds the model features and target from the raw dataset.
+
+    The dataset goes through the cleaning pipeline (see cleaning.py), then age is truncated to whole years and
+    subjects outside of the ranges accepted by the '/ml' form for height and weight are dropped.
+
+    Args:
+        path (str): Path to the raw dataset.
+
+    Returns:
+        tuple: The raw features (pd.DataFrame, columns as in FEATURES) and the target (np.ndarray).
+    """
+    df = clean_chunk(pd.read_csv(path, sep = ";"))
+    df['age'] = df['age'].astype(int)
+    df = df[df['height'].between(120, 220) & df['weight'].between(30, 220)]
+    return df[FEATURES].reset_index(drop = True), df['cardio'].to_numpy()
+
+
+def load_splits(preprocessor, path = 'cardio_train.csv', test_size = 0.2):
+    """
+    Scales the training data and splits it into a training and a holdout set.
+
+    Returns:
+        tuple: X_train, X_test, y_train, y_test, as NumPy arrays.
+    """
+    features, target = load_training_data(path)
+    X = scale_training_features(preprocessor, features)
+    return train_test_split(X, target, test_size = test_size, random_state = RANDOM_STATE, stratify = target)
+
+
+def scale_training_features(preprocessor, features):
+    X = np.column_stack([
+        features['age'], features['ap_hi'], features['ap_lo'],
+        preprocessor.encode_batch(features['cholesterol']), preprocessor.encode_batch(features['gluc']),
+        features['bmi'], features['ap_m'],
+    ]).astype(np.float64)
+    return preprocessor.scale_features(X)
+
+
+def evaluate(model, X, y):
+    """
+    Computes the accuracy and the recall (class 1) of a model.
+
+    Returns:
+        dict: Accuracy, recall and the predictions of the model.
+    """
+    pred = model.predict(X)
+    return {"accuracy": np.mean(pred == y), "recall": np.mean(pred[y == 1] == 1), "pred": pred}
+
+
+def compress_svm(svm, X_train, target_size, random_state = RANDOM_STATE):
+    """
+    Builds a reduced-set approximation of an RBF SVC.
+
+    The training data is summarized by 'target_size' k-means prototypes, each labelled by the original model,
+    and a new SVC with the same kernel and hyperparameters is fitted on them. The compressed model therefore
+    holds at most 'target_size' support vectors and is a regular SVC, usable as a drop-in replacement.
+
+    Args:
+        svm (SVC): The trained model.
+        X_train (np.ndarray): Scaled training features.
+        target_size (int): Number of prototypes, i.e. the maximum number of support vectors.
+
+    Returns:
+        SVC: The compressed model.
+    """
+    kmeans = MiniBatchKMeans(n_clusters = target_size, n_init = 3, random_state = random_state).fit(X_train)
+    prototypes = kmeans.cluster_centers_
+    return SVC(kernel = svm.kernel, C = svm.C, gamma = svm.gamma, random_state = random_state).fit(prototypes, svm.predict(prototypes))
+
+
+def fit_kernel_approx(X_train, y_train, gamma, n_components, feature_map = 'nystroem', random_state = RANDOM_STATE):
+    """
+    Fits an explicit RBF feature map followed by a linear classifier.
+
+    Prediction cost only depends on 'n_components', not on the size of the training set.
+
+    Args:
+        X_train (np.ndarray): Scaled training features.
+        y_train (np.ndarray): Training target.
+        gamma (float): RBF kernel coefficient, as in the SVM.
+        n_components (int): Dimension of the feature map.
+        feature_map (str): 'nystroem' or 'rff' (random Fourier features).
+
+    Returns:
+        Pipeline: The fitted feature map and classifier.
+    """
+    if feature_map == 'nystroem':
+        mapper = Nystroem(gamma = gamma, n_components = n_components, random_state = random_state)
+    else:
+        mapper = RBFSampler(gamma = gamma, n_components = n_components, random_state = random_state)
+    return make_pipeline(mapper, LogisticRegression(max_iter = 1000)).fit(X_train, y_train)
+
+
+def report(svm, model, X_test, y_test):
+    reference = evaluate(svm, X_test, y_test)
+    result = evaluate(model, X_test, y_test)
+    print(f"Accuracy: {reference['accuracy']:.1%} -> {result['accuracy']:.1%} ({result['accuracy'] - reference['accuracy']:+.1%})")
+    print(f"Recall: {reference['recall']:.1%} -> {result['recall']:.1%} ({result['recall'] - reference['recall']:+.1%})")
+    print(f"Agreement with the original model: {np.mean(result['pred'] == reference['pred']):.1%}")
+
+
+def grid_axes(age_step, bp_step, bmi_start, bmi_stop, bmi_step):
+    """
+    Defines the quantized axes of the decision grid, as (start, step, size) tuples keyed by feature name.
+    """
+    def axis(start, stop, step):
+        return (start, step, int(round((stop - start) / step)) + 1)
+
+    return {
+        "age": axis(*INPUT_RANGES["age"], age_step),
+        "cholesterol": axis(*INPUT_RANGES["cholesterol"], 1),
+        "gluc": axis(*INPUT_RANGES["gluc"], 1),
+        "ap_hi": axis(*INPUT_RANGES["ap_hi"], bp_step),
+        "ap_lo": axis(*INPUT_RANGES["ap_lo"], bp_step),
+        "bmi": axis(bmi_start, bmi_stop, bmi_step),
+    }
+
+
+def build_decision_grid(svm, preprocessor, axes, output, dtype = 'float16'):
+    """
+    Evaluates the decision function of an RBF SVC on every node of the grid and writes it to a .npy file.
+
+    The RBF kernel factorizes over features, so that for each (age, cholesterol, glucose) slice the whole
+    (ap_hi, ap_lo) x BMI block is obtained with a single matrix product over the support vectors.
+
+    Args:
+        svm (SVC): The trained model, with an RBF kernel.
+        preprocessor (Preprocessor): Encoding and scaling of the raw inputs.
+        axes (dict): Axes of the grid, as returned by grid_axes.
+        output (str): Path of the .npy file, opened as a memory map while it is filled (it should not be in use).
+
+    Returns:
+        np.memmap: The grid, indexed in the order of GRID_AXES.
+    """
+    if svm.kernel != 'rbf':
+        raise ValueError("The decision grid can only be built from an SVC with an RBF kernel.")
+
+    support_vectors = svm.support_vectors_
+    dual_coef = svm.dual_coef_[0]
+    values = {name: start + step * np.arange(size) for name, (start, step, size) in axes.items()}
+
+    def kernel(raw, feature):
+        # Kernel factor of one feature, between each raw value and each support vector
+        j = FEATURES.index(feature)
+        if feature in ("cholesterol", "gluc"):
+            raw = preprocessor.encode_batch(raw.astype(int))
+        scaled = raw * preprocessor.scale[j] + preprocessor.offset[j]
+        return np.exp(-svm._gamma * (scaled[:, None] - support_vectors[None, :, j]) ** 2)
+
+    k_age = kernel(values["age"], "age")
+    k_chol = kernel(values["cholesterol"], "cholesterol")
+    k_gluc = kernel(values["gluc"], "gluc")
+    k_bmi = kernel(values["bmi"], "bmi")
+
+    ap_hi, ap_lo = np.meshgrid(values["ap_hi"], values["ap_lo"], indexing = 'ij')
+    ap_hi, ap_lo = ap_hi.ravel(), ap_lo.ravel()
+    k_bp = kernel(ap_hi, "ap_hi")
+    k_bp *= kernel(ap_lo, "ap_lo")
+    k_bp *= kernel(np.round((ap_hi + 2 * ap_lo) / 3, 1), "ap_m")
+
+    shape = tuple(axes[name][2] for name in GRID_AXES)
+    grid = np.lib.format.open_memmap(output, mode = 'w+', dtype = dtype, shape = shape)
+    for a in range(shape[0]):
+        for c in range(shape[1]):
+            for g in range(shape[2]):
+                weights = dual_coef * k_age[a] * k_chol[c] * k_gluc[g]
+                block = k_bp @ (weights[:, None] * k_bmi.T) + svm.intercept_[0]
+                grid[a, c, g] = block.reshape(shape[3:])
+    grid.flush()
+    return grid
+
+
+def window_reduce(array, axis, reduce):
+    """
+    Reduces each element of an array with its two neighbours along 'axis' (np.maximum or np.minimum).
+    """
+    def along(part):
+        index = [slice(None)] * array.ndim
+        index[axis] = part
+        return tuple(index)
+
+    result = array.copy()
+    reduce(result[along(slice(1, None))], array[along(slice(None, -1))], out = result[along(slice(1, None))])
+    reduce(result[along(slice(None, -1))], array[along(slice(1, None))], out = result[along(slice(None, -1))])
+    return result
+
+
+def mask_unsafe_nodes(grid, axes, margin):
+    """
+    Replaces by NaN the nodes of the grid whose value may not give the label of the subjects looked up there.
+
+    A subject is looked up at its closest node, so it lies within half a step of it along the axes that are not exact
+    (BMI, and age or blood pressures quantized with a step above 1). A node is kept only if the values of all the nodes
+    of the block around it on these axes are on the same side of 0 and further from it than 'margin': between nodes,
+    the decision function then only changes sign if it varies by more than the error measured at build time.
+    NaN nodes are left to the live model by DecisionGrid.
+
+    Returns:
+        int: The number of masked nodes.
+    """
+    spread_axes = [GRID_AXES.index(name) - 1 for name in ("ap_hi", "ap_lo", "bmi") if name == "bmi" or axes[name][1] != 1]
+    spread_age = axes["age"][1] != 1
+
+    masked = 0
+    previous, current = None, np.array(grid[0], dtype = np.float32)
+    for a in range(grid.shape[0]):
+        following = np.array(grid[a + 1], dtype = np.float32) if a + 1 < grid.shape[0] else None
+        block = [current] + ([s for s in (previous, following) if s is not None] if spread_age else [])
+        high, low = np.max(block, axis = 0), np.min(block, axis = 0)
+        for axis in spread_axes:
+            high, low = window_reduce(high, axis, np.maximum), window_reduce(low, axis, np.minimum)
+        safe = (low > margin) | (high < -margin)
+        masked += int(np.count_nonzero(~safe))
+        grid[a] = np.where(safe, current, np.nan)
+        previous, current = current, following
+    grid.flush()
+    return masked
+
+
+def grid_lookup(grid, axes, raw):
+    """
+    Vectorized lookup of the grid at the nodes closest to raw subjects.
+
+    Args:
+        raw (dict): Raw inputs, one array per feature of GRID_AXES.
+
+    Returns:
+        tuple: The decision values (NaN outside of the grid) and the mask of subjects inside the grid.
+    """
+    index = []
+    inside = np.ones(len(raw["age"]), dtype = bool)
+    for name in GRID_AXES:
+        start, step, size = axes[name]
+        i = np.round((raw[name] - start) / step).astype(int)
+        inside &= (i >= 0) & (i < size)
+        index.append(i.clip(0, size - 1))
+    return np.where(inside, grid[tuple(index)], np.nan), inside
+
+
+def fit_calibration(decision_values, y):
+    """
+    Fits a sigmoid mapping decision values to the probability of class 1 (Platt scaling).
+
+    Returns:
+        tuple: The coefficient and intercept of the sigmoid.
+    """
+    logistic = LogisticRegression(C = 1e6).fit(decision_values.reshape(-1, 1), y)
+    return float(logistic.coef_[0, 0]), float(logistic.intercept_[0])
+
+
+def compress(args):
+    svm = joblib.load(args.model)
+    preprocessor = Preprocessor.from_files(args.scaler, args.le)
+    X_train, X_test, y_train, y_test = load_splits(preprocessor, args.data)
+
+    reduced = compress_svm(svm, X_train, args.target_size)
+    joblib.dump(reduced, args.output)
+
+    print(f"Support vectors: {len(svm.support_vectors_)} -> {len(reduced.support_vectors_)}")
+    report(svm, reduced, X_test, y_test)
+    print(f"Compressed model saved to {args.output}")
+
+
+def kernel_approx(args):
+    svm = joblib.load(args.model)
+    preprocessor = Preprocessor.from_files(args.scaler, args.le)
+    X_train, X_test, y_train, y_test = load_splits(preprocessor, args.data)
+
+    model = fit_kernel_approx(X_train, y_train, svm.gamma, args.n_components, args.feature_map)
+    joblib.dump(model, args.output)
+
+    print(f"Feature map: {args.feature_map}, {args.n_components} components")
+    report(svm, model, X_test, y_test)
+    print(f"Kernel-approximation model saved to {args.output}")
+
+
+def grid(args):
+    svm = joblib.load(args.model)
+    preprocessor = Preprocessor.from_files(args.scaler, args.le)
+    axes = grid_axes(args.age_step, args.bp_step, args.bmi_range[0], args.bmi_range[1], args.bmi_step)
+
+    # Built in temporary files replaced at the end, since running servers memory-map the current grid
+    directory = os.path.dirname(os.path.abspath(args.output))
+    descriptor, grid_path = tempfile.mkstemp(dir = directory, suffix = ".npy")
+    os.close(descriptor)
+    descriptor, meta_path = tempfile.mkstemp(dir = directory, suffix = ".json")
+    try:
+        decision_grid = build_decision_grid(svm, preprocessor, axes, grid_path, args.dtype)
+
+        # Estimate the quantization error on the subjects of the dataset and on random subjects of the valid input domain
+        features, _ = load_training_data(args.data)
+        rng = np.random.default_rng(RANDOM_STATE)
+        sampled = {name: rng.integers(low, high, endpoint = True, size = args.sample_size) for name, (low, high) in INPUT_RANGES.items()}
+        sampled["bmi"] = np.round(sampled["weight"] / (sampled["height"] / 100) ** 2, 1)
+        raw = {name: np.concatenate([features[name].to_numpy(), sampled[name]]) for name in GRID_AXES}
+        exact = np.concatenate([
+            svm.decision_function(scale_training_features(preprocessor, features)),
+            svm.decision_function(preprocessor.transform_batch(**{name: sampled[name] for name in INPUT_RANGES})),
+        ])
+        table, inside = grid_lookup(decision_grid, axes, raw)
+        margin = args.safety * float(np.max(np.abs(table[inside] - exact[inside])))
+
+        masked = mask_unsafe_nodes(decision_grid, axes, margin)
+        table, inside = grid_lookup(decision_grid, axes, raw)
+        resolved = inside & (np.abs(table) > margin)
+        size, nbytes = decision_grid.size, decision_grid.nbytes
+        del decision_grid
+
+        meta = {
+            "version": GRID_FORMAT_VERSION,
+            "model_digest": file_digest(args.model),
+            "axes": axes,
+            "margin": margin,
+        }
+        with os.fdopen(descriptor, 'w') as f:
+            json.dump(meta, f, indent = 2)
+        for path in (grid_path, meta_path):
+            os.chmod(path, 0o644)
+        os.replace(grid_path, args.output)
+        os.replace(meta_path, args.meta)
+    finally:
+        for path in (grid_path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    print(f"Grid of {size} nodes ({nbytes / 1e6:.0f} MB) saved to {args.output}")
+    print(f"Margin around the decision boundary: {margin:.4f}, nodes left to the live model: {masked / size:.1%}")
+    print(f"Subjects inside the grid: {np.mean(inside):.1%}, answered by table lookup: {np.mean(resolved):.1%}")
+    print(f"Agreement of table answers with the live model: {np.mean((table[resolved] > 0) == (exact[resolved] > 0)):.2%}")
+
+
+def calibrate(args):
+    model = joblib.load(args.model)
+    preprocessor = Preprocessor.from_files(args.scaler, args.le)
+    _, X_holdout, _, y_holdout = load_splits(preprocessor, args.data)
+
+    # Half of the holdout fits the sigmoid, the other half evaluates it
+    X_fit, X_eval, y_fit, y_eval = train_test_split(X_holdout, y_holdout, test_size = 0.5, random_state = RANDOM_STATE, stratify = y_holdout)
+    coef, intercept = fit_calibration(model.decision_function(X_fit), y_fit)
+
+    meta = {"version": 1, "model_digest": file_digest(args.model), "coef": coef, "intercept": intercept}
+    with open(args.output, 'w') as f:
+        json.dump(meta, f, indent = 2)
+
+    proba = 1 / (1 + np.exp(-(coef * model.decision_function(X_eval) + intercept)))
+    print(f"Sigmoid: p = 1 / (1 + exp(-({coef:.4f} * f + {intercept:.4f})))")
+    print(f"Brier score: {brier_score_loss(y_eval, proba):.4f}, log loss: {log_loss(y_eval, proba):.4f}")
+    for low in np.arange(0, 1, 0.2):
+        in_bin = (proba >= low) & (proba < low + 0.2)
+        if in_bin.any():
+            print(f"Predicted [{low:.0%} - {low + 0.2:.0%}[: {in_bin.sum()} subjects, observed prevalence {np.mean(y_eval[in_bin]):.1%}")
+    print(f"Calibration saved to {args.output}")
+
+
+def export(args):
+    svm = joblib.load(args.model)
+    scaler = joblib.load(args.scaler)
+    le = joblib.load(args.le)
+    if not isinstance(svm, SVC) or svm.kernel != "rbf" or len(svm.classes_) != 2:
+        raise SystemExit(f"{args.model} is not a binary RBF-kernel SVC, it cannot be exported")
+
+    np.savez(
+        args.output,
+        format_version = PORTABLE_FORMAT_VERSION,
+        source_digest = file_digest(args.model),
+        support_vectors = svm.support_vectors_,
+        dual_coef = svm.dual_coef_,
+        intercept = svm.intercept_,
+        gamma = svm._gamma,     # Numeric value, also when the gamma parameter is 'scale' or 'auto'
+        classes = svm.classes_,
+        scaler_scale = scaler.scale_,
+        scaler_min = scaler.min_,
+        scaler_clip_range = np.array(scaler.feature_range if getattr(scaler, "clip", False) else [], dtype = np.float64),
+        label_classes = le.classes_,
+    )
+
+    # Check the exported model, with its own preprocessing, against the original one on the whole dataset
+    portable = PortableSVM.load(args.output)
+    features, _ = load_training_data(args.data)
+    X = scale_training_features(Preprocessor.from_fitted(scaler, le), features)
+    X_portable = scale_training_features(portable.preprocessor, features)
+    exact = svm.decision_function(X)
+    values = portable.decision_function(X_portable)
+    print(f"Portable model saved to {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB, format version {PORTABLE_FORMAT_VERSION})")
+    print(f"Largest decision value difference over {len(values)} subjects: {np.max(np.abs(values - exact)):.2e}")
+    print(f"Agreement of predictions: {np.mean(portable.predict(X_portable) == svm.predict(X)):.2%}")
+
+
+def precision_report(args):
+    svm = joblib.load(args.model)
+    preprocessor = Preprocessor.from_files(args.scaler, args.le)
+    features, _ = load_training_data(args.data)
+    X = scale_training_features(preprocessor, features)
+
+    started = time.perf_counter()
+    exact = svm.decision_function(X)
+    print(f"float64 SVC: {len(svm.support_vectors_)} support vectors, {len(X)} subjects in {time.perf_counter() - started:.1f} s")
+    for precision, dtype in MODEL_PRECISIONS.items():
+        model = PortableSVM.from_svc(svm, preprocessor, dtype = dtype)
+        started = time.perf_counter()
+        values = model.decision_function(X)
+        elapsed = time.perf_counter() - started
+        print(f"{precision}: {model.nbytes / 1e6:.2f} MB of support vectors, {elapsed:.1f} s, "
+              f"largest decision value difference {np.max(np.abs(values - exact)):.2e}, "
+              f"agreement {np.mean((values > 0) == (exact > 0)):.3%} ({np.sum((values > 0) != (exact > 0))} subjects differ)")
+
+
+def memory_worker(model_path, preprocessor, mmap, start, results):
+    start.wait()
+    before = memory_usage()
+    model = load_model(model_path, mmap = mmap)
+    model.decision_function(preprocessor.transform(50, 70, 170, 120, 80, 1, 1))
+    results.put((before, memory_usage()))
+    # Stay alive until all workers have reported, so that shared pages are counted as such
+    start.wait()
+
+
+def memory_report(args):
+    preprocessor = Preprocessor.from_files(args.scaler, args.le)
+    context = multiprocessing.get_context('fork')
+    for mmap in (False, True):
+        start = context.Barrier(args.workers + 1)
+        results = context.Queue()
+        workers = [context.Process(target = memory_worker, args = (args.model, preprocessor, mmap, start, results)) for _ in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        start.wait()
+        reports = [results.get() for _ in workers]
+        start.wait()
+        for worker in workers:
+            worker.join()
+
+        print(f"Model loaded {'with' if mmap else 'without'} memory-mapping, {args.workers} workers:")
+        for i, (before, after) in enumerate(reports):
+            print(f"  worker {i}: RSS {before.get('rss_mb')} -> {after.get('rss_mb')} MB, PSS {before.get('pss_mb')} -> {after.get('pss_mb')} MB")
+        print(f"  total PSS: {sum(after.get('pss_mb', 0) for _, after in reports):.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default = 'hsb_svm.pkl')
+    parser.add_argument('--scaler', default = 'hsb_scaler.pkl')
+    parser.add_argument('--le', default = 'hsb_le.pkl')
+    parser.add_argument('--data', default = 'cardio_train.csv')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    compress_parser = commands.add_parser('compress', help = "Build a reduced-set approximation of the SVM")
+    compress_parser.add_argument('--target-size', type = int, default = 2000, help = "Maximum number of support vectors")
+    compress_parser.add_argument('--output', default = 'hsb_svm_reduced.pkl')
+    compress_parser.set_defaults(func = compress)
+
+    approx_parser = commands.add_parser('kernel-approx', help = "Train an explicit kernel feature map and a linear classifier")
+    approx_parser.add_argument('--n-components', type = int, default = 500, help = "Dimension of the feature map")
+    approx_parser.add_argument('--feature-map', choices = ['nystroem', 'rff'], default = 'nystroem')
+    approx_parser.add_argument('--output', default = 'hsb_kernel_approx.pkl')
+    approx_parser.set_defaults(func = kernel_approx)
+
+    grid_parser = commands.add_parser('grid', help = "Precompute the SVM decision function over the valid input domain")
+    grid_parser.add_argument('--age-step', type = int, default = 1)
+    grid_parser.add_argument('--bp-step', type = int, default = 5)
+    grid_parser.add_argument('--bmi-range', type = float, nargs = 2, default = [12.0, 60.0])
+    grid_parser.add_argument('--bmi-step', type = float, default = 1.0)
+    grid_parser.add_argument('--dtype', choices = ['float16', 'float32'], default = 'float16')
+    grid_parser.add_argument('--sample-size', type = int, default = 10000, help = "Subjects used to estimate the quantization error")
+    grid_parser.add_argument('--safety', type = float, default = 1.5, help = "Factor applied to the largest quantization error")
+    grid_parser.add_argument('--output', default = 'hsb_grid.npy')
+    grid_parser.add_argument('--meta', default = 'hsb_grid.json')
+    grid_parser.set_defaults(func = grid)
+
+    calibrate_parser = commands.add_parser('calibrate', help = "Fit a sigmoid mapping decision values to probabilities")
+    calibrate_parser.add_argument('--output', default = 'hsb_calibration.json')
+    calibrate_parser.set_defaults(func = calibrate)
+
+    export_parser = commands.add_parser('export', help = "Export the SVM, scaler and label encoder to a format served without scikit-learn")
+    export_parser.add_argument('--output', default = 'hsb_svm.npz')
+    export_parser.set_defaults(func = export)
+
+    precision_parser = commands.add_parser('precision-report', help = "Compare float64, float32 and float16 inference on the whole dataset")
+    precision_parser.set_defaults(func = precision_report)
+
+    memory_parser = commands.add_parser('memory-report', help = "Compare per-worker memory with and without memory-mapped model loading")
+    memory_parser.add_argument('--workers', type = int, default = 4)
+    memory_parser.set_defaults(func = memory_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
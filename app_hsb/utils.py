@@ -1,9 +1,29 @@
+import os
+import tempfile
+import weakref
 import numpy as np
-from scipy.stats import shapiro, mannwhitneyu, chi2_contingency, spearmanr
+from scipy.stats import shapiro, normaltest, mannwhitneyu, chi2_contingency, spearmanr, norm
 import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+from cleaning import clean_dataset
+from model import file_digest
+
+# Schema metadata of the Feather caches, holding the SHA-256 of the CSV file they were built from
+CACHE_DIGEST_KEY = b"hsb_source_digest"
+# and the memory used by the frame as parsed from the CSV file, before downcasting (MB, see memory_mb)
+CACHE_PARSED_MB_KEY = b"hsb_parsed_mb"
 
 def load_data():
-    df = pd.read_csv('clean_cvd.csv')
+    # Rebuilds clean_cvd.csv from cardio_train.csv if it is missing or out of date
+    clean_dataset('cardio_train.csv', 'clean_cvd.csv')
+    return read_cached('clean_cvd.csv', 'clean_cvd.feather', parse_data)
+
+def load_raw_data():
+    return read_cached('cardio_train.csv', 'cardio_train.feather', parse_raw_data)
+
+def parse_data(path):
+    df = pd.read_csv(path)
      # Pre-setting categorical data types to str to avoid issues with sns
     df[['smoke', 'alco', 'active', 'cardio', 'cholesterol', 'gluc','ap_aha', 'lifestyle', 'healthy_ls']] = df[['smoke', 'alco', 'active', 'cardio', 'cholesterol', 'gluc','ap_aha', 'lifestyle', 'healthy_ls']].astype('str') 
 
@@ -17,11 +37,293 @@ def load_data():
     df['lifestyle'] = df['lifestyle'].astype(cat_lifestyle)
     return df
 
-def load_raw_data():
-    return pd.read_csv('cardio_train.csv', sep = ";")
+def parse_raw_data(path):
+    return pd.read_csv(path, sep = ";")
+
+def read_cached(source, cache, parse):
+    """
+    Reads a dataset from its Feather cache, which stores the typed frame (categoricals as integer codes with their
+    categories and order, integers downcast to the smallest type holding them).
+
+    The cache is rebuilt with 'parse' when it is missing or was not built from the current content of 'source'.
+    The memory used by the frame as parsed, before downcasting, is kept in df.attrs['parsed_mb'].
+
+    Parameters:
+    - source (str): Path to the CSV file.
+    - cache (str): Path to the Feather file.
+    - parse (function): Reads and types the CSV file.
+
+    Returns:
+    pd.DataFrame: The typed dataset.
+    """
+    digest = file_digest(source).encode()
+    try:
+        table = feather.read_table(cache, memory_map = True)
+        if table.schema.metadata.get(CACHE_DIGEST_KEY) == digest:
+            df = table.to_pandas()
+            if CACHE_PARSED_MB_KEY in table.schema.metadata:
+                df.attrs['parsed_mb'] = float(table.schema.metadata[CACHE_PARSED_MB_KEY])
+            return df
+    except (OSError, pa.ArrowInvalid):
+        # Missing or unreadable cache: rebuild it
+        pass
+
+    df = parse(source)
+    parsed_mb = memory_mb(df)
+    for column in df.select_dtypes('integer').columns:
+        df[column] = pd.to_numeric(df[column], downcast = 'integer')
+
+    table = pa.Table.from_pandas(df, preserve_index = False)
+    table = table.replace_schema_metadata({**table.schema.metadata, CACHE_DIGEST_KEY: digest, CACHE_PARSED_MB_KEY: str(parsed_mb).encode()})
+    temporary = None
+    try:
+        # Written under a temporary name and renamed, since other processes may be reading the cache through a memory map
+        descriptor, temporary = tempfile.mkstemp(dir = os.path.dirname(cache) or '.', suffix = '.tmp')
+        os.close(descriptor)
+        feather.write_feather(table, temporary)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, cache)
+    except OSError:
+        # Read-only deployment: serve the parsed frame without caching it
+        pass
+    finally:
+        if temporary is not None and os.path.exists(temporary):
+            os.remove(temporary)
+    df.attrs['parsed_mb'] = parsed_mb
+    return df
+
+def raw_summary(df_raw):
+    """
+    Extracts the numbers of the raw dataset shown in the visualization pages, so that the raw frame does not need to be kept.
+
+    Parameters:
+    - df_raw (pd.DataFrame): The raw dataset, with age in days.
+
+    Returns:
+    dict: Row and column counts, minimal age (years) and number of subjects under 32 years.
+    """
+    return {
+        "rows": df_raw.shape[0],
+        "columns": df_raw.shape[1],
+        "min_age": np.min(df_raw['age']) / 365.25,
+        "under_32": len(df_raw[df_raw['age'] / 365.25 < 32]),
+    }
+
+def compact_frame(df):
+    """
+    Downcasts the numeric columns of a DataFrame to their narrowest type (floats to float32, which can change
+    the last digits of computed statistics). Categorical columns already store their values as int8 codes.
+
+    Parameters:
+    - df (pd.DataFrame): The DataFrame to compact, modified in place.
+
+    Returns:
+    pd.DataFrame: The same DataFrame.
+    """
+    for column in df.select_dtypes('integer').columns:
+        df[column] = pd.to_numeric(df[column], downcast = 'integer')
+    for column in df.select_dtypes('float').columns:
+        df[column] = pd.to_numeric(df[column], downcast = 'float')
+    return df
+
+def memory_mb(df):
+    return df.memory_usage(deep = True).sum() / 1e6
+
+class GroupedStats:
+    """
+    Statistics of the columns of a dataset, overall ("all") and in each 'cardio' group ("0" and "1").
+
+    The mean, standard deviation, minimum and maximum of every numerical column are computed in one grouped pass,
+    and the frequencies of a categorical column are counted for all groups at once, instead of filtering
+    the dataset for each call. Mann-Whitney tests between the groups rank each column once (see mann_whitney).
+    Results are kept for the following calls, so the dataset should not be modified.
+    """
+    def __init__(self, df):
+        # Weak reference, so that the statistics kept by grouped_stats do not keep the dataset alive
+        self.dataset = weakref.ref(df)
+        self.groups = df['cardio'].astype('category')
+        self.numerical = None
+        self.frequencies = {}
+        self.tests = {}
+
+    def describe(self, column, group = "all"):
+        """
+        Returns:
+        tuple: Mean, standard deviation (ddof = 0), minimum and maximum of the column in the group.
+        """
+        if self.numerical is None or column not in self.numerical["mean"].columns:
+            df = self.dataset()
+            columns = df.select_dtypes('number').columns
+            grouped = df[columns].groupby(self.groups, observed = True)
+            self.numerical = {}
+            for stat, overall, per_group in [
+                ("mean", df[columns].mean(), grouped.mean()),
+                ("sd", df[columns].std(ddof = 0), grouped.std(ddof = 0)),
+                ("min", df[columns].min(), grouped.min()),
+                ("max", df[columns].max(), grouped.max()),
+            ]:
+                per_group.index = per_group.index.astype(str)
+                per_group.loc["all"] = overall
+                self.numerical[stat] = per_group
+        return tuple(self.numerical[stat].at[group, column] for stat in ("mean", "sd", "min", "max"))
+
+    def shares(self, column, group = "all"):
+        """
+        Returns:
+        pd.Series: Normalized counts of the modalities of the column in the group, from the most to the least frequent
+        (as value_counts(normalize = True)).
+        """
+        if column not in self.frequencies:
+            values = self.dataset()[column].astype('category')
+            codes = values.cat.codes.to_numpy()
+            group_codes = self.groups.cat.codes.to_numpy()
+            n_modalities = len(values.cat.categories)
+            valid = (codes >= 0) & (group_codes >= 0)
+            counts = np.bincount(group_codes[valid] * n_modalities + codes[valid],
+                                 minlength = len(self.groups.cat.categories) * n_modalities).reshape(-1, n_modalities)
+            table = pd.DataFrame(counts, index = self.groups.cat.categories.astype(str), columns = values.cat.categories)
+            table.loc["all"] = counts.sum(axis = 0)
+            self.frequencies[column] = table.div(table.sum(axis = 1), axis = 0)
+        return self.frequencies[column].loc[group].sort_values(ascending = False, kind = 'stable')
+
+    def mann_whitney(self, column, by = None):
+        """
+        Mann-Whitney U tests of a numerical column between the 'cardio' groups "0" and "1", in all subjects,
+        or within each modality of the column 'by' (e.g. 'sex').
+
+        The column is ranked once for all the tests (within each modality of 'by'), and the U statistics and p-values
+        are computed for all modalities at once. p-values are two-sided and asymptotic, with the tie and continuity
+        corrections of mannwhitneyu, which is still used for groups of 8 subjects or less (exact test).
+        Both are NaN for a modality where a group is empty.
+
+        Returns:
+        pd.DataFrame: U statistic of the group "0" ('u') and p-value ('pval'), indexed by modality of 'by' ("all" if None).
+        """
+        if (column, by) not in self.tests:
+            df = self.dataset()
+            values = df[column].to_numpy(dtype = np.float64)
+            cardio = self.groups.cat.codes.to_numpy()
+            if by is None:
+                strata, modalities = np.zeros(len(values), dtype = np.int64), pd.Index(["all"])
+            else:
+                strata, modalities = pd.factorize(df[by], sort = True)
+            ranks, tie_terms = ranks_by_stratum(values, strata, len(modalities))
+
+            n_0 = np.bincount(strata[cardio == 0], minlength = len(modalities)).astype(np.float64)
+            n_1 = np.bincount(strata[cardio == 1], minlength = len(modalities)).astype(np.float64)
+            u_0 = np.bincount(strata[cardio == 0], weights = ranks[cardio == 0], minlength = len(modalities)) - n_0 * (n_0 + 1) / 2
+            n = n_0 + n_1
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                sd = np.sqrt(n_0 * n_1 / 12 * ((n + 1) - tie_terms / (n * (n - 1))))
+                z = (np.maximum(u_0, n_0 * n_1 - u_0) - n_0 * n_1 / 2 - 0.5) / sd
+            pvals = np.clip(2 * norm.sf(z), 0, 1)
+
+            smallest = np.minimum(n_0, n_1)
+            for i in np.flatnonzero((smallest > 0) & (smallest <= 8)):
+                in_stratum = strata == i
+                u_0[i], pvals[i] = mannwhitneyu(values[in_stratum & (cardio == 0)], values[in_stratum & (cardio == 1)])
+            u_0[smallest == 0], pvals[smallest == 0] = np.nan, np.nan
+            self.tests[(column, by)] = pd.DataFrame({"u": u_0, "pval": pvals}, index = modalities.astype(str))
+        return self.tests[(column, by)]
+
+def ranks_by_stratum(values, strata, n_strata):
+    """
+    Ranks values within each stratum with a single sort, ties getting their average rank.
+
+    Parameters:
+    - values (np.ndarray): The values to rank.
+    - strata (np.ndarray): The stratum code (0 to n_strata - 1) of each value.
+    - n_strata (int): The number of strata.
+
+    Returns:
+    tuple: The rank of each value (from 1 in each stratum), and the sum of t³ - t over the groups of t tied values of each stratum.
+    """
+    order = np.lexsort((values, strata))
+    sorted_values, sorted_strata = values[order], strata[order]
+    block_starts = np.flatnonzero(np.r_[True, (sorted_values[1:] != sorted_values[:-1]) | (sorted_strata[1:] != sorted_strata[:-1])])
+    block_sizes = np.diff(np.r_[block_starts, len(values)])
+    block_ranks = block_starts + (block_sizes + 1) / 2
+    ranks = np.empty(len(values))
+    ranks[order] = np.repeat(block_ranks, block_sizes) - np.searchsorted(sorted_strata, sorted_strata)
+    tie_terms = np.bincount(sorted_strata[block_starts], weights = block_sizes.astype(np.float64) ** 3 - block_sizes, minlength = n_strata)
+    return ranks, tie_terms
+
+# GroupedStats of each dataset, dropped with the dataset
+_grouped_stats = {}
+
+def grouped_stats(df):
+    """
+    Returns the GroupedStats of a DataFrame, created on the first call for this DataFrame.
+    """
+    key = id(df)
+    if key not in _grouped_stats:
+        _grouped_stats[key] = GroupedStats(df)
+        weakref.finalize(df, _grouped_stats.pop, key, None)
+    return _grouped_stats[key]
+
+# Normality test of pval_shapiro (HSB_NORMALITY_TEST): "shapiro" runs Shapiro-Wilk on a sample of SHAPIRO_MAX_SIZE subjects
+# stratified by 'cardio' and drawn with a fixed seed, as its p-value is not accurate above 5000 values; "dagostino" runs the
+# D'Agostino-Pearson test, suited to large samples, on the whole column; "shapiro-full" runs Shapiro-Wilk on the whole column.
+NORMALITY_TESTS = ("shapiro", "dagostino", "shapiro-full")
+NORMALITY_TEST = os.environ.get('HSB_NORMALITY_TEST', 'shapiro')
+SHAPIRO_MAX_SIZE = 5000
+NORMALITY_SEED = 0
+
+# p-values of the normality tests, by test, column and hash of the column
+_normality_pvals = {}
+
+def stratified_sample(values, groups, size, seed = NORMALITY_SEED):
+    """
+    Draws the same sample of values every time, with each group represented in proportion to its size.
+
+    Parameters:
+    - values (np.ndarray): The values to sample.
+    - groups (np.ndarray): The group of each value.
+    - size (int): The size of the sample, all the values being returned if there are not more.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    np.ndarray: The sampled values, in their original order.
+    """
+    if len(values) <= size:
+        return values
+    rng = np.random.default_rng(seed)
+    indices = []
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        indices.append(rng.choice(members, round(size * len(members) / len(values)), replace = False))
+    return values[np.sort(np.concatenate(indices))]
+
+def normality_pval(df, column, test = NORMALITY_TEST):
+    """
+    Tests the normality of a numerical variable, once for each version of the column.
+
+    Parameters:
+    - df (pd.DataFrame): The dataset.
+    - column (str): The name of the numerical variable.
+    - test (str): One of NORMALITY_TESTS.
+
+    Returns:
+    float: The p-value of the test.
+    """
+    if test not in NORMALITY_TESTS:
+        raise ValueError(f"Unknown normality test {test!r}, expected one of {NORMALITY_TESTS}")
+    strata = ['cardio'] if 'cardio' in df.columns and column != 'cardio' else []
+    key = (test, column, len(df), int(pd.util.hash_pandas_object(df[[column] + strata], index = False).sum()))
+    if key not in _normality_pvals:
+        values = df[column].to_numpy(dtype = np.float64)
+        if test == "shapiro":
+            groups = pd.factorize(df['cardio'])[0] if strata else np.zeros(len(values))
+            pval = shapiro(stratified_sample(values, groups, SHAPIRO_MAX_SIZE))[1]
+        elif test == "dagostino":
+            pval = normaltest(values)[1]
+        else:
+            pval = shapiro(values)[1]
+        _normality_pvals[key] = pval
+    return _normality_pvals[key]
 
 def pval_shapiro(df, var):
-    pval = shapiro(df[var.name])[1]
+    pval = normality_pval(df, var.name)
     return f"Normally distributed <br>{pval_txt(pval)}" if pval >= 0.05 else f"Not normally distributed <br>{pval_txt(pval)}"
 
 def pval_txt(pval):
@@ -43,7 +345,8 @@ def pval_txt(pval):
         return f"<i>p</i> = {pval:.4f}"
 
 def mean_sd_range(df, var):
-    return (f"{np.mean(df[var.name]):.1f} ± {np.std(df[var.name]):.1f}", f"[{np.min(df[var.name]):.1f} - {np.max(df[var.name]):.1f}]")
+    mean, sd, minimum, maximum = grouped_stats(df).describe(var.name)
+    return (f"{mean:.1f} ± {sd:.1f}", f"[{minimum:.1f} - {maximum:.1f}]")
 
 def chi2_cardio(df, var):
     """
@@ -86,8 +389,24 @@ def mwu_cardio(df, var):
     pval: float
     The p-value of the Mann-Whitney U test.
     """
-    mwu, pval = mannwhitneyu(df[df['cardio'] == "0"][var.name], df[df['cardio'] == "1"][var.name])
-    return pval
+    return grouped_stats(df).mann_whitney(var.name).at["all", "pval"]
+
+def mwu_cardio_batch(df, columns, by = None):
+    """
+    Computes Mann-Whitney tests for the difference in several characteristics between patients with and without
+    cardiovascular disease, in all patients or within each modality of 'by' (see GroupedStats.mann_whitney).
+
+    Args:
+    columns: list of str
+    The names of the characteristics to compare.
+    by: str
+    The name of a categorical variable (e.g. 'sex') to split the patients by, or None.
+
+    Returns:
+    pd.DataFrame: U statistic ('u') and p-value ('pval'), indexed by characteristic and modality of 'by'.
+    """
+    stats = grouped_stats(df)
+    return pd.concat({column: stats.mann_whitney(column, by) for column in columns}, names = ['variable', by or 'group'])
 
 def mean_sd(df, var):
     """
@@ -100,7 +419,8 @@ def mean_sd(df, var):
     Returns:
     - str: A formatted string representing the mean and standard deviation in the format 'mean ± sd'.
     """
-    return f'{np.mean(df[var.name]):.1f} ± {np.std(df[var.name]):.1f}'
+    mean, sd, _, _ = grouped_stats(df).describe(var.name)
+    return f'{mean:.1f} ± {sd:.1f}'
 
 def mean_sd_1(df, var):
     """
@@ -113,7 +433,8 @@ def mean_sd_1(df, var):
     Returns:
     - str: A formatted string representing the mean and standard deviation in the format 'mean ± sd'.
     """
-    return f'{np.mean(df[df.cardio == "1"][var.name]):.1f} ± {np.std(df[df.cardio == "1"][var.name]):.1f}'
+    mean, sd, _, _ = grouped_stats(df).describe(var.name, "1")
+    return f'{mean:.1f} ± {sd:.1f}'
 
 def mean_sd_0(df, var):
     """
@@ -126,7 +447,8 @@ def mean_sd_0(df, var):
     Returns:
     - str: A formatted string representing the mean and standard deviation in the format 'mean ± sd'.
     """
-    return f'{np.mean(df[df.cardio == "0"][var.name]):.1f} ± {np.std(df[df.cardio == "0"][var.name]):.1f}'
+    mean, sd, _, _ = grouped_stats(df).describe(var.name, "0")
+    return f'{mean:.1f} ± {sd:.1f}'
 
 def pp(df, var):
     """
@@ -139,7 +461,7 @@ def pp(df, var):
     Returns:
     - str: A formatted string representing the percentage of positive occurrences in the format 'xx.x%'.
     """
-    return f'{df[var.name].value_counts(normalize = True)[1]:.1%}'
+    return f'{grouped_stats(df).shares(var.name).iloc[1]:.1%}'
     
 def pp_0(df, var):
     """
@@ -152,7 +474,7 @@ def pp_0(df, var):
     Returns:
     - str: A formatted string representing the percentage of positive occurrences in the format 'xx.x%'.
     """
-    return f'{df[df.cardio == "0"][var.name].value_counts(normalize = True)[1]:.1%}'
+    return f'{grouped_stats(df).shares(var.name, "0").iloc[1]:.1%}'
     
 def pp_1(df, var):
     """
@@ -165,38 +487,34 @@ def pp_1(df, var):
     Returns:
     - str: A formatted string representing the percentage of positive occurrences in the format 'xx.x%'.
     """
-    return f'{df[df.cardio == "1"][var.name].value_counts(normalize = True)[1]:.1%}'
+    return f'{grouped_stats(df).shares(var.name, "1").iloc[1]:.1%}'
 
 def pp_3_cardio(df, var, card):
-    if card == "0":
-        df = df[df['cardio'] == "0"]
-    else:
-        df = df[df['cardio'] == "1"]
-    return f"""N: {df[var.name].value_counts(normalize = True)["1"]:.1%}
-    <br>+: {df[var.name].value_counts(normalize = True)["2"]:.1%}
-    <br>++: {df[var.name].value_counts(normalize = True)["3"]:.1%}
+    shares = grouped_stats(df).shares(var.name, "0" if card == "0" else "1")
+    return f"""N: {shares["1"]:.1%}
+    <br>+: {shares["2"]:.1%}
+    <br>++: {shares["3"]:.1%}
     """
 
 def pp_3(df, var):
-    return f"""N: {df[var.name].value_counts(normalize = True)["1"]:.1%}
-    <br>+: {df[var.name].value_counts(normalize = True)["2"]:.1%}
-    <br>++: {df[var.name].value_counts(normalize = True)["3"]:.1%}
+    shares = grouped_stats(df).shares(var.name)
+    return f"""N: {shares["1"]:.1%}
+    <br>+: {shares["2"]:.1%}
+    <br>++: {shares["3"]:.1%}
     """
 
 def pp_4_cardio(df, var, card):
-    if card == "0":
-        df = df[df['cardio'] == "0"]
-    else:
-        df = df[df['cardio'] == "1"]
-    return f"""Normal: {df[var.name].value_counts(normalize = True)["1"]:.1%}
-    <br>Elevated: {df[var.name].value_counts(normalize = True)["2"]:.1%}
-    <br>High Blood Pressure stage I: {df[var.name].value_counts(normalize = True)["3"]:.1%}
-    <br>High Blood Pressure stage II: {df[var.name].value_counts(normalize = True)["4"]:.1%}
+    shares = grouped_stats(df).shares(var.name, "0" if card == "0" else "1")
+    return f"""Normal: {shares["1"]:.1%}
+    <br>Elevated: {shares["2"]:.1%}
+    <br>High Blood Pressure stage I: {shares["3"]:.1%}
+    <br>High Blood Pressure stage II: {shares["4"]:.1%}
     """
 
 def pp_4(df, var):
-    return f"""Normal: {df[var.name].value_counts(normalize = True)["1"]:.1%}
-    <br>Elevated: {df[var.name].value_counts(normalize = True)["2"]:.1%}
-    <br>High Blood Pressure stage I: {df[var.name].value_counts(normalize = True)["3"]:.1%}
-    <br>High Blood Pressure stage II: {df[var.name].value_counts(normalize = True)["4"]:.1%}
+    shares = grouped_stats(df).shares(var.name)
+    return f"""Normal: {shares["1"]:.1%}
+    <br>Elevated: {shares["2"]:.1%}
+    <br>High Blood Pressure stage I: {shares["3"]:.1%}
+    <br>High Blood Pressure stage II: {shares["4"]:.1%}
     """
\ No newline at end of file
@@ -1,13 +1,18 @@
 # Creating a class "Parameter" to access parameter-related information
-from utils import pval_shapiro, pval_txt, mean_sd_range, chi2_cardio, chi2_var, mwu_cardio, mean_sd, mean_sd_1, mean_sd_0, pp, pp_0, pp_1, pp_3, pp_3_cardio, pp_4, pp_4_cardio
+from utils import pval_shapiro, pval_txt, mean_sd_range, chi2_cardio, chi2_var, mwu_cardio_batch, mean_sd, mean_sd_1, mean_sd_0, pp, pp_0, pp_1, pp_3, pp_3_cardio, pp_4, pp_4_cardio
 import pandas as pd
 import numpy as np
-from utils import load_data, load_raw_data
+from utils import load_data, load_raw_data, raw_summary, compact_frame, memory_mb
 from scipy.stats import shapiro, mannwhitneyu, chi2_contingency, spearmanr
+from model import file_digest
+from collections.abc import Mapping
+import json
+import sys
+import threading
 
-
-df = load_data()
-df_raw = load_raw_data()
+# Version of the snapshot written by 'python viz_dicts.py', and the datasets its content is computed from
+SNAPSHOT_VERSION = 1
+SOURCE_FILES = ['clean_cvd.csv', 'cardio_train.csv']
 
 class Parameter:
     def __init__(self, name, full_name, unit, mod, mod_names):
@@ -37,27 +42,9 @@ lifestyle = Parameter("lifestyle", "Lifestyle", None, ["0", "1", "2", "3", "4",
                     ["Non-smoker, No alcohol, Active", "Smoker", "Alcohol", "Not Active", "Smoker & Alcohol", "Smoker & Not active", "Alcohol & Not active", "Smoker & Alcohol & Not active"])
 healthy_ls = Parameter('healthy_ls', "Healthy Lifestyle", None, ["0", "1"], ["no", "yes"])
 
-h_lo = np.percentile(df['height'], 2.5)
-h_hi = np.percentile(df['height'], 97.5)
-w_lo = np.percentile(df['weight'], 2.5)
-w_hi = np.percentile(df['weight'], 97.5)
-
-cardio_aha = (df.groupby('ap_aha')['cardio'].value_counts(normalize = True)*100).unstack().reset_index().rename(columns = {"0" : "cardio_0", "1" : "cardio_1"})
-
-tab_gc = pd.crosstab(df['cholesterol'], df['gluc'], normalize = 'all')
-pval_chi2_gc = chi2_var(df, gluc, cholesterol)
-pval_chi2_gluc = chi2_cardio(df, gluc)
-pval_chi2_chol = chi2_cardio(df, cholesterol)
 
-df_sex_active = (df.groupby('sex')['active'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "active_0", "1" : "active_1"})
-df_sex_smoke = (df.groupby('sex')['smoke'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "smoke_0", "1" : "smoke_1"})
-df_sex_alco = (df.groupby('sex')['alco'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "alco_0", "1" : "alco_1"})
-df_sex_healthy = (df.groupby('sex')['healthy_ls'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "healthy_0", "1" : "healthy_1"})
-df_sex_ls = df_sex_active.merge(df_sex_smoke, on = "sex", how = "inner").merge(df_sex_alco, on = "sex", how = "inner").merge(df_sex_healthy, on = "sex", how = "inner")
-df_sex_ls = pd.melt(df_sex_ls.drop(['active_0', 'smoke_0', 'alco_0', 'healthy_0'], axis = 1), id_vars = "sex", var_name = "parameter", value_name = "percentage")
-
-viz_data = {
-    "age" : {
+def age_section(df, raw):
+    return {
         "title": "Age",
         "table": f"""<table>
                 <tr class = "head-tr">
@@ -76,7 +63,7 @@ viz_data = {
         "img": "age_fig.png",
         "analysis": f"""
         <p class="analysis-p">
-            The dataset revealed a minimum age of {np.min(df_raw['age']) / 365.25:.1f} years, and the {len(df_raw[df_raw['age'] / 365.25 < 32])}
+            The dataset revealed a minimum age of {raw['min_age']:.1f} years, and the {raw['under_32']}
             individuals under 32 years were identified as outliers. There were no recorded cases of cardiovascular disease among the [32 - 38] years range.
             Given the significant age gap, these outliers were excluded from further analysis.
         </p>
@@ -88,7 +75,7 @@ viz_data = {
         <p class="analysis-p">
             As anticipated, the prevalence of cardiovascular (CV) diseases escalates with age within this cohort. Approximately 50% of patients aged [51 - 55] years exhibit CV diseases. 
             This prevalence dips below 50% among younger participants and increases for older age groups. The average age among patients diagnosed with CV diseases 
-            is {mean_sd_range(df[df['cardio'] == "1"], age)[0]} years, in contrast to {mean_sd_range(df[df['cardio'] == "0"], age)[0]} years in the control group.
+            is {mean_sd_1(df, age)} years, in contrast to {mean_sd_0(df, age)} years in the control group.
         </p>""",
         "conclusion": f"""<ul class="viz-cl">
             <li>The average age within the cohort was {mean_sd_range(df, age)[0]} years old.</li>
@@ -96,8 +83,11 @@ viz_data = {
             <li>Comparatively, patients were older than control subjects, with a clear linear increase in cardiovascular disease prevalence with advancing age.</li>
             <li>Consideration for age adjustment in the model might be beneficial, <i>e.g.</i>, dividing the dataset into two distinct groups using an age cut-off around 50 years old could provide deeper insights.</li>
         </ul>""",
-    },
-    "sex" : {
+    }
+
+
+def sex_section(df, raw):
+    return {
         "title" : "Sex",
         "table" : f"""<table>
             <tr class = "head-tr">
@@ -140,8 +130,15 @@ viz_data = {
             <li>Age-related increase in CV disease prevalence is consistent between males and females, indicating that age is a significant factor for CV disease risk irrespective of sex.</li>
             <li>Considering the disproportionate female-to-male ratio of nearly 2:1 in the study population, recalibrating the dataset for an equal sex distribution or creating gender-specific models could potentially refine predictive accuracy.</li>
         </ul>"""
-    },
-    "bmi" : {
+    }
+
+
+def bmi_section(df, raw):
+    h_lo = np.percentile(df['height'], 2.5)
+    h_hi = np.percentile(df['height'], 97.5)
+    w_lo = np.percentile(df['weight'], 2.5)
+    w_hi = np.percentile(df['weight'], 97.5)
+    return {
         "title" : "Body-Mass Index, Height and Weight",
         "table" : f"""<table>
                 <tr class = "head-tr">
@@ -201,8 +198,14 @@ viz_data = {
             <li>In cases involving outlier values for height and weight, the latter demonstrates a more pronounced impact on cardiovascular risk.</li>
             <li>Evaluating the effect of extreme height and weight measurements on the model's performance could provide valuable insights.</li>
         </ul>"""
-    },
-    "bp": {
+    }
+
+
+def bp_section(df, raw):
+    # The three blood pressures are compared between the cardio groups in one batch
+    mwu_pvals = mwu_cardio_batch(df, [ap_hi.name, ap_lo.name, ap_m.name])['pval'].xs("all", level = 1)
+    cardio_aha = (df.groupby('ap_aha')['cardio'].value_counts(normalize = True)*100).unstack().reset_index().rename(columns = {"0" : "cardio_0", "1" : "cardio_1"})
+    return {
         "title" : "Blood Pressure",
         "table" : f"""<table>
                 <tr class = "head-tr">
@@ -261,9 +264,9 @@ viz_data = {
                 ariability and were found to be closely correlated 
                 ({pval_txt(spearmanr(df['ap_hi'], df['ap_lo'])[1])}). Notably, higher blood
                 pressure values were observed in patients diagnosed with cardiovascular 
-                disease-evident in systolic ({pval_txt(mwu_cardio(df, ap_hi))}),
-                diastolic ({pval_txt(mwu_cardio(df, ap_lo))}), and mean blood pressures 
-                ({pval_txt(mwu_cardio(df, ap_m))}). This aligns with the established 
+                disease-evident in systolic ({pval_txt(mwu_pvals[ap_hi.name])}),
+                diastolic ({pval_txt(mwu_pvals[ap_lo.name])}), and mean blood pressures 
+                ({pval_txt(mwu_pvals[ap_m.name])}). This aligns with the established 
                 understanding that hypertension is a major risk factor for 
                 cardiovascular conditions.
             </p>
@@ -289,8 +292,15 @@ viz_data = {
             <li>While blood pressure readings tend to rise with age in control subjects, they remained relatively stable among patients with cardiovascular conditions.</li>
             <li>The incidence of cardiovascular diseases increases in alignment with the American Heart Association’s (AHA) categorizations, peaking at {cardio_aha[cardio_aha['ap_aha'] == "4"]['cardio_1'].values[0]:.1f}% within individuals classified under 'Hypertension Stage II'.</li>
         </ul>"""
-    },
-    "gluc-chol" : {
+    }
+
+
+def gluc_chol_section(df, raw):
+    tab_gc = pd.crosstab(df['cholesterol'], df['gluc'], normalize = 'all')
+    pval_chi2_gc = chi2_var(df, gluc, cholesterol)
+    pval_chi2_gluc = chi2_cardio(df, gluc)
+    pval_chi2_chol = chi2_cardio(df, cholesterol)
+    return {
         "title" : "Glucose and Cholesterol",
         "table" : f"""<table>
             <tr class = "head-tr">
@@ -377,8 +387,17 @@ viz_data = {
                 <li>The potential redundancy of glucose as a predictive factor warrants discussion, with the suggestion to potentially exclude it from analyses in favor of focusing on cholesterol, which appears to offer more substantial insights.</li>
                 <li>Given the absence of clear cut-off values for defining glucose and cholesterol levels, caution is advised when interpreting these parameters due to the potential for bias in their categorization.</li>
             </ul>"""
-    },
-    "lifestyle" : {
+    }
+
+
+def lifestyle_section(df, raw):
+    df_sex_active = (df.groupby('sex')['active'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "active_0", "1" : "active_1"})
+    df_sex_smoke = (df.groupby('sex')['smoke'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "smoke_0", "1" : "smoke_1"})
+    df_sex_alco = (df.groupby('sex')['alco'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "alco_0", "1" : "alco_1"})
+    df_sex_healthy = (df.groupby('sex')['healthy_ls'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "healthy_0", "1" : "healthy_1"})
+    df_sex_ls = df_sex_active.merge(df_sex_smoke, on = "sex", how = "inner").merge(df_sex_alco, on = "sex", how = "inner").merge(df_sex_healthy, on = "sex", how = "inner")
+    df_sex_ls = pd.melt(df_sex_ls.drop(['active_0', 'smoke_0', 'alco_0', 'healthy_0'], axis = 1), id_vars = "sex", var_name = "parameter", value_name = "percentage")
+    return {
         "title" : "Lifestyle",
         "table" : f"""<table>
             <tr class = "head-tr">
@@ -463,4 +482,121 @@ viz_data = {
                 <li>Due to potential biases, incorporating the smoking variable into the predictive model may not be advisable.</li>
             </ul>"""
     }
-}
\ No newline at end of file
+
+
+class VizRegistry(Mapping):
+    """
+    Content of the visualization pages, computed on first access to each section and memoized.
+
+    The datasets are only loaded when the first section is computed, so that importing this module
+    (and starting the app) does not pay for the statistics of pages that may never be visited.
+    A snapshot built from the same datasets (see build_snapshot) can provide all the sections at once.
+    Only the summary numbers of the raw dataset are kept, and with 'low_memory' the cleaned dataset is downcast.
+    """
+    def __init__(self, sections, low_memory = False):
+        self.sections = sections
+        self.low_memory = low_memory
+        self.lock = threading.Lock()
+        self.data = None
+        self.memory = None
+        self.cache = {}
+
+    def __getitem__(self, viz_id):
+        section = self.sections[viz_id]
+        if viz_id not in self.cache:
+            with self.lock:
+                if viz_id not in self.cache:
+                    if self.data is None:
+                        self.data = self.load_data()
+                    self.cache[viz_id] = section(*self.data)
+        return self.cache[viz_id]
+
+    def __contains__(self, viz_id):
+        return viz_id in self.sections
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __len__(self):
+        return len(self.sections)
+
+    def load_data(self):
+        df, df_raw = load_data(), load_raw_data()
+        # Frames read from the Feather caches are already downcast: the sizes as parsed from the CSV files are reported too
+        self.memory = {
+            "df_parsed_mb": df.attrs.get('parsed_mb'),
+            "df_mb": memory_mb(df),
+            "df_raw_parsed_mb": df_raw.attrs.get('parsed_mb'),
+            "df_raw_mb": memory_mb(df_raw),
+        }
+        raw = raw_summary(df_raw)
+        del df_raw
+        if self.low_memory:
+            compact_frame(df)
+            self.memory["df_compact_mb"] = memory_mb(df)
+
+        def sizes(name):
+            parsed = self.memory[f"{name}_parsed_mb"]
+            return (f"{parsed:.1f} MB as parsed, " if parsed is not None else "") + f"{self.memory[f'{name}_mb']:.1f} MB as loaded"
+
+        print(f"Datasets: df {sizes('df')}"
+              + (f" -> {self.memory['df_compact_mb']:.1f} MB" if self.low_memory else "")
+              + f", df_raw {sizes('df_raw')}, dropped after extracting its summary")
+        return df, raw
+
+    def load_all(self):
+        for viz_id in self.sections:
+            self[viz_id]
+
+    def load_snapshot(self, path):
+        """
+        Fills the registry from a snapshot, unless it is missing, from another version or built from other datasets.
+
+        Returns:
+            bool: True if the snapshot was loaded.
+        """
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return False
+        try:
+            sources = source_digests()
+        except FileNotFoundError as error:
+            # A dataset deleted to force a rebuild: the pages are computed on demand, which rebuilds it
+            print(f"Ignoring {path}: {error.filename} is missing")
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("sources") != sources:
+            print(f"Ignoring {path}: it was not built from the current datasets")
+            return False
+        with self.lock:
+            self.cache.update({viz_id: content for viz_id, content in snapshot["sections"].items() if viz_id in self.sections})
+        return True
+
+    def build_snapshot(self, path):
+        """
+        Computes all the sections and saves them, with the digests of the datasets, to a JSON snapshot.
+        """
+        self.load_all()
+        snapshot = {"version": SNAPSHOT_VERSION, "sources": source_digests(), "sections": {viz_id: self[viz_id] for viz_id in self.sections}}
+        with open(path, 'w') as f:
+            json.dump(snapshot, f, indent = 1)
+
+
+def source_digests():
+    return {path: file_digest(path) for path in SOURCE_FILES}
+
+viz_data = VizRegistry({
+    "age": age_section,
+    "sex": sex_section,
+    "bmi": bmi_section,
+    "bp": bp_section,
+    "gluc-chol": gluc_chol_section,
+    "lifestyle": lifestyle_section,
+})
+
+if __name__ == '__main__':
+    # Build-time snapshot of the visualization pages, loaded by the app instead of computing them
+    snapshot_path = sys.argv[1] if len(sys.argv) > 1 else 'hsb_viz.json'
+    viz_data.build_snapshot(snapshot_path)
+    print(f"Snapshot of {len(viz_data)} sections saved to {snapshot_path}")
@@ -8,19 +8,56 @@ import matplotlib.gridspec as gridspec
 import seaborn as sns
 from scipy.stats import shapiro, mannwhitneyu, chi2_contingency, spearmanr
 from matplotlib.text import Text
-
-def data_viz():
-    from hsb_functions import mean_sd_range, pval_shapiro, chi2_cardio, pval_txt, mwu_cardio, chi2_var, mean_sd_1, mean_sd_0, mean_sd, pp_1, pp_0, pp, pp_3_cardio, pp_3, pp_4_cardio, pp_4
-
-    ## Utilitaries for data viz
-    fontdict_title = {'color' : 'navy', 'family' : 'Trebuchet MS', 'size' : 16, 'weight' : 'bold'}
-    fontdict_labels = {'color': 'black', 'family': 'Trebuchet MS', 'size' : 14}
-    palette_cardio = {"0":'lightcyan', "1": 'firebrick'}
-    palette_sex = {"female": "coral", "male" : "seagreen"}
-
-    df_raw = pd.read_csv('streamlit_hsb/cardio_train.csv', sep = ';').set_index('id')  # The purpose of this df is to keep a version of the dataset, it should therefore not be modified.
-
-    df = pd.read_csv('streamlit_hsb/clean_cvd.csv', sep = ',')
+from collections import OrderedDict
+import io
+import os
+import threading
+from hsb_model import file_digest
+from hsb_features import age_group, age_5, round_bmi, out_wh
+from hsb_functions import raw_summary, compact_frame, memory_mb, share_grouped_stats
+from hsb_cleaning import clean_dataset, manifest_path
+
+# Datasets of the data viz section, read by load_datasets
+RAW_DATA_PATH = 'streamlit_hsb/cardio_train.csv'
+CLEAN_DATA_PATH = 'streamlit_hsb/clean_cvd.csv'
+
+# Downcast the cleaned dataset to its narrowest dtypes
+LOW_MEMORY = os.environ.get('HSB_LOW_MEMORY', '0') == '1'
+
+def file_version(path):
+    # None if the file is missing
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+@st.cache_data(max_entries = 1, show_spinner = False)
+def update_clean_dataset(raw_version, clean_version, manifest_version):
+    # Checks the cleaned dataset (which hashes both datasets), and rebuilds it if it is missing or out of date,
+    # only when one of the files changed since the last check
+    clean_dataset(RAW_DATA_PATH, CLEAN_DATA_PATH)
+
+@st.cache_data(max_entries = 1, show_spinner = False)
+def load_datasets(raw_version, clean_version):
+    """
+    Reads and types the datasets once for all sessions and reruns; each call returns its own copy of the frames.
+
+    The versions (modification time and size, see file_version) of the files are part of the cache key,
+    so that the datasets are read again when a file changes.
+
+    Only the summary numbers of the raw dataset are kept (see raw_summary), and with LOW_MEMORY the cleaned
+    dataset is downcast (see compact_frame).
+
+    Returns:
+        tuple: The summary of the raw dataset and the cleaned dataset, with categorical columns typed.
+    """
+    df_raw = pd.read_csv(RAW_DATA_PATH, sep = ';').set_index('id')
+    raw_mb = memory_mb(df_raw)
+    raw = raw_summary(df_raw)
+    del df_raw
+
+    df = pd.read_csv(CLEAN_DATA_PATH, sep = ',')
 
     # Pre-setting categorical data types to str to avoid issues with sns
     df[['smoke', 'alco', 'active', 'cardio', 'cholesterol', 'gluc','ap_aha', 'lifestyle', 'healthy_ls']] = df[['smoke', 'alco', 'active', 'cardio', 'cholesterol', 'gluc','ap_aha', 'lifestyle', 'healthy_ls']].astype('str') 
@@ -34,6 +71,77 @@ def data_viz():
     cat_lifestyle = pd.CategoricalDtype(categories = ["0", "1", "2", "3", "4", "5", "6", "7"], ordered = False)
     df['lifestyle'] = df['lifestyle'].astype(cat_lifestyle)
 
+    df_mb = memory_mb(df)
+    if LOW_MEMORY:
+        compact_frame(df)
+    print(f"Datasets: df {df_mb:.1f} MB as parsed" + (f" -> {memory_mb(df):.1f} MB" if LOW_MEMORY else "")
+          + f", df_raw {raw_mb:.1f} MB as parsed, dropped after extracting its summary")
+
+    return raw, df
+
+@st.cache_data(max_entries = 4, show_spinner = False)
+def dataset_digest(path, version):
+    # Hashes a dataset once per version of the file
+    return file_digest(path)
+
+class FigureCache:
+    """
+    Size-bounded, thread-safe LRU cache of rendered figures (PNG bytes), shared by all sessions and reruns.
+
+    Figures are keyed on their name, the digests of the datasets and the theme, so that a page seen before
+    is displayed without plotting anything.
+    """
+    def __init__(self, maxsize = 32):
+        self.maxsize = maxsize
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            png = self.figures.get(key)
+            if png is not None:
+                self.figures.move_to_end(key)
+            return png
+
+    def render(self, key, fig):
+        """
+        Renders a figure to PNG as st.pyplot would, closes it and caches the image.
+
+        Returns:
+            bytes: The PNG image.
+        """
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format = "png", bbox_inches = "tight", dpi = 200)
+        plt.close(fig)
+        png = buffer.getvalue()
+        with self.lock:
+            self.figures[key] = png
+            self.figures.move_to_end(key)
+            while len(self.figures) > self.maxsize:
+                self.figures.popitem(last = False)
+        return png
+
+# Shared by all sessions and reruns, as long as the process lives
+figure_cache = FigureCache(maxsize = 32)
+
+def data_viz():
+    from hsb_functions import mean_sd_range, pval_shapiro, chi2_cardio, pval_txt, mwu_cardio_batch, chi2_var, mean_sd_1, mean_sd_0, mean_sd, pp_1, pp_0, pp, pp_3_cardio, pp_3, pp_4_cardio, pp_4
+
+    ## Utilitaries for data viz
+    fontdict_title = {'color' : 'navy', 'family' : 'Trebuchet MS', 'size' : 16, 'weight' : 'bold'}
+    fontdict_labels = {'color': 'black', 'family': 'Trebuchet MS', 'size' : 14}
+    palette_cardio = {"0":'lightcyan', "1": 'firebrick'}
+    palette_sex = {"female": "coral", "male" : "seagreen"}
+
+    update_clean_dataset(file_version(RAW_DATA_PATH), file_version(CLEAN_DATA_PATH), file_version(manifest_path(CLEAN_DATA_PATH)))
+    raw_version, clean_version = file_version(RAW_DATA_PATH), file_version(CLEAN_DATA_PATH)
+    raw, df = load_datasets(raw_version, clean_version)
+
+    # Rendered figures depend only on the datasets and the theme
+    figure_key = (dataset_digest(RAW_DATA_PATH, raw_version), dataset_digest(CLEAN_DATA_PATH, clean_version), st.get_option("theme.base"))
+    # load_datasets returns a new copy on each rerun: its statistics are computed once per dataset
+    share_grouped_stats(df, figure_key[1])
+
     # Creating a class "Parameter" to access parameter-related information
     class Parameter:
         def __init__(self, name, full_name, unit, mod, mod_names):
@@ -88,8 +196,8 @@ def data_viz():
         <div class = 'all'>
             <h1>Data Analysis Conclusions</h1>
             <p class = 'intro'>
-                This part of the project consisted in analysing a large dataset of <b>{df_raw.shape[0]}</b> rows and
-                <b>{df_raw.shape[1]}</b> columns. Dataset was reworked to make it 
+                This part of the project consisted in analysing a large dataset of <b>{raw['rows']}</b> rows and
+                <b>{raw['columns']}</b> columns. Dataset was reworked to make it 
                 suitable for machine learning, and relevant visualizations were produced.
             </p>
             <p class = 'intro'>
@@ -202,125 +310,123 @@ def data_viz():
             
         st.markdown('<h3>Data Visualisation</h3>', unsafe_allow_html=True)
 
-        # Creating a df for age-related viz, that specify the age group of a subject.
-
-        df_age = df[['age', 'cardio']]
-        df_age['age_group'] = df_age.apply(lambda row:
-                                        "< 45" if row['age'] < 45
-                                        else "[45 - 49]" if row['age'] < 50
-                                        else "[50 - 54]" if row['age'] < 55
-                                        else "[55 - 59]" if row['age'] < 60
-                                        else "[60 - 65]", axis = 1)
-
         ######FIGURE######
-        fig, ax = plt.subplots(nrows = 2, ncols = 2, figsize = (12,10))
-        plt.subplots_adjust(hspace = 0.55, wspace = 0.3)
-
-
-        # HISTPLOT: distribution of age
-
-        sns.histplot(x = age.name, 
-                    data = df, bins = 13,
-                    ax = ax[0,0], 
-                    color = 'silver')
-
-        ax[0,0].axvline(x = np.mean(df[age.name]), color = 'black', linestyle = 'dashed')
-
-
-
-        ax[0,0].text(np.mean(df[age.name])+1.25,
-                1.03*(np.max(ax[0,0].get_yticks())),
-                f'Mean age: {np.mean(df[age.name]):.1f} yo.',
-                bbox = {'facecolor' : 'white', 'edgecolor' : 'black', 'boxstyle' : 'round'})
-
-        ax[0,0].set_title(f'Distribution of {age.full_name}', fontdict = fontdict_title)
-        ax[0,0].set_ylabel('count', fontdict = fontdict_labels)
-        ax[0,0].set_xlabel(f'{age.full_name} ({age.unit})', fontdict = fontdict_labels)
-
-        ylim = [0,9000]
-        ax[0,0].set_ylim(ylim)
-        ax[0,0].set_yticks(range(0,10000,1000))
-
-        ax[0,0].set_xticks(range(39, 66, 2))
+        figure_id = ("age",) + figure_key
+        png = figure_cache.get(figure_id)
+        if png is None:
+            # Creating a df for age-related viz, that specify the age group of a subject.
 
-        # BOXPLOT: Comparison of age distribution regarding CV status  
-        sns.boxplot(x = 'cardio',
-                    y = age.name,
-                    data = df,
-                    ax = ax[0,1],
-                    boxprops = {'edgecolor':'black'},
-                    capprops = {'color': 'black'},
-                    whiskerprops = {'color': 'black'},
-                    medianprops = {'color': 'black'},
-                    palette = palette_cardio,
-                    width = 0.3)
+            df_age = df[['age', 'cardio']]
+            df_age['age_group'] = age_group(df_age['age'])
 
-        ax[0,1].text(0.2, np.median(df[df['cardio'] == "0"]["age"]), f'{np.median(df[df["cardio"] == "0"]["age"]):.1f}', fontsize = 12, va = "center")
-        ax[0,1].text(1.2, np.median(df[df['cardio'] == "1"]["age"]), f'{np.median(df[df["cardio"] == "1"]["age"]):.1f}', fontsize = 12, va = "center")
+            fig, ax = plt.subplots(nrows = 2, ncols = 2, figsize = (12,10))
+            plt.subplots_adjust(hspace = 0.55, wspace = 0.3)
 
-        ax[0,1].set_yticks(range(38,68,2))
-        ax[0,1].set_ylim([38,66])
-        ax[0,1].set_title(f'Patients are Older than Controls', fontdict = fontdict_title)
-        ax[0,1].set_ylabel(f'{age.full_name} ({age.unit})', fontdict = fontdict_labels)
-        ax[0,1].set_xlabel(None)
-        ax[0,1].set_xticks(ticks = ax[0,1].get_xticks(), labels = ['Controls', 'Patients'], fontsize = 14)
 
-        # COUNTPLOT: Prevalence of CV disease in every age group
+            # HISTPLOT: distribution of age
 
+            sns.histplot(x = age.name, 
+                        data = df, bins = 13,
+                        ax = ax[0,0], 
+                        color = 'silver')
 
-        sns.countplot(x = "age_group", 
-                    hue = "cardio",
-                    data = df_age, 
-                    order = ["< 45", "[45 - 49]", "[50 - 54]", "[55 - 59]", "[60 - 65]"], 
-                    ax = ax[1,0], 
-                    edgecolor = 'black', 
-                    width = 0.5,
-                    palette = palette_cardio
-                    )
-
-        ax[1,0].set_title('Inequal Distribution of Patients \nAmong Age Groups', fontdict = fontdict_title)
-        ax[1,0].set_ylabel('Count', fontdict = fontdict_labels)
-        ax[1,0].set_xlabel('Age Groups (years)', fontdict = fontdict_labels)
-        ax[1,0].set_yticks(range(0, 11000, 1000))
-
-        handles = [
-            Patch(facecolor = palette_cardio["0"], edgecolor = 'black',  label = "Controls"),
-            Patch(facecolor = palette_cardio["1"], edgecolor = 'black',  label = "Patients")
-        ]
+            ax[0,0].axvline(x = np.mean(df[age.name]), color = 'black', linestyle = 'dashed')
 
-        ax[1,0].legend(handles = handles, title = None, frameon = True, edgecolor = 'black')
 
 
-        # LINEPLOT: Prevalence of CV disease according to age
-        df_age['age'] = df_age['age'].astype('int64')
-        df_age.groupby('age').value_counts(normalize = True)
-        df_age_gb = df_age[['age', 'cardio']].groupby('age')['cardio'].value_counts(normalize = True).unstack().reset_index()
+            ax[0,0].text(np.mean(df[age.name])+1.25,
+                    1.03*(np.max(ax[0,0].get_yticks())),
+                    f'Mean age: {np.mean(df[age.name]):.1f} yo.',
+                    bbox = {'facecolor' : 'white', 'edgecolor' : 'black', 'boxstyle' : 'round'})
 
+            ax[0,0].set_title(f'Distribution of {age.full_name}', fontdict = fontdict_title)
+            ax[0,0].set_ylabel('count', fontdict = fontdict_labels)
+            ax[0,0].set_xlabel(f'{age.full_name} ({age.unit})', fontdict = fontdict_labels)
 
-        sns.lineplot(x = "age", 
-                    y = "1", 
-                    data = df_age_gb[df_age_gb["age"] >=39],
-                    ax = ax[1,1],
-                    color = 'purple',
-                    linewidth = 3
-                    )
-
-        ax[1,1].axhline(y = 0.5, linestyle = "dotted", color = 'black')
+            ylim = [0,9000]
+            ax[0,0].set_ylim(ylim)
+            ax[0,0].set_yticks(range(0,10000,1000))
 
-        ax[1,1].set_title('Cardiovascular Disease Prevalence \nIncreases with Age', fontdict = fontdict_title)
-        ax[1,1].set_ylabel('CVD Prevalence (%)', fontdict = fontdict_labels)
-        ax[1,1].set_yticks(ticks = [x/10 for x in range(0,11,1)], labels = range(0,110,10))
-        ax[1,1].set_xlabel(f'{age.full_name} ({age.unit})', fontdict = fontdict_labels)
-        ax[1,1].set_xticks(ticks = range(39,66,2))
+            ax[0,0].set_xticks(range(39, 66, 2))
 
-        st.pyplot(fig)
+            # BOXPLOT: Comparison of age distribution regarding CV status  
+            sns.boxplot(x = 'cardio',
+                        y = age.name,
+                        data = df,
+                        ax = ax[0,1],
+                        boxprops = {'edgecolor':'black'},
+                        capprops = {'color': 'black'},
+                        whiskerprops = {'color': 'black'},
+                        medianprops = {'color': 'black'},
+                        palette = palette_cardio,
+                        width = 0.3)
+
+            ax[0,1].text(0.2, np.median(df[df['cardio'] == "0"]["age"]), f'{np.median(df[df["cardio"] == "0"]["age"]):.1f}', fontsize = 12, va = "center")
+            ax[0,1].text(1.2, np.median(df[df['cardio'] == "1"]["age"]), f'{np.median(df[df["cardio"] == "1"]["age"]):.1f}', fontsize = 12, va = "center")
+
+            ax[0,1].set_yticks(range(38,68,2))
+            ax[0,1].set_ylim([38,66])
+            ax[0,1].set_title(f'Patients are Older than Controls', fontdict = fontdict_title)
+            ax[0,1].set_ylabel(f'{age.full_name} ({age.unit})', fontdict = fontdict_labels)
+            ax[0,1].set_xlabel(None)
+            ax[0,1].set_xticks(ticks = ax[0,1].get_xticks(), labels = ['Controls', 'Patients'], fontsize = 14)
+
+            # COUNTPLOT: Prevalence of CV disease in every age group
+
+
+            sns.countplot(x = "age_group", 
+                        hue = "cardio",
+                        data = df_age, 
+                        order = ["< 45", "[45 - 49]", "[50 - 54]", "[55 - 59]", "[60 - 65]"], 
+                        ax = ax[1,0], 
+                        edgecolor = 'black', 
+                        width = 0.5,
+                        palette = palette_cardio
+                        )
+
+            ax[1,0].set_title('Inequal Distribution of Patients \nAmong Age Groups', fontdict = fontdict_title)
+            ax[1,0].set_ylabel('Count', fontdict = fontdict_labels)
+            ax[1,0].set_xlabel('Age Groups (years)', fontdict = fontdict_labels)
+            ax[1,0].set_yticks(range(0, 11000, 1000))
+
+            handles = [
+                Patch(facecolor = palette_cardio["0"], edgecolor = 'black',  label = "Controls"),
+                Patch(facecolor = palette_cardio["1"], edgecolor = 'black',  label = "Patients")
+            ]
+
+            ax[1,0].legend(handles = handles, title = None, frameon = True, edgecolor = 'black')
+
+
+            # LINEPLOT: Prevalence of CV disease according to age
+            df_age['age'] = df_age['age'].astype('int64')
+            df_age.groupby('age').value_counts(normalize = True)
+            df_age_gb = df_age[['age', 'cardio']].groupby('age')['cardio'].value_counts(normalize = True).unstack().reset_index()
+
+
+            sns.lineplot(x = "age", 
+                        y = "1", 
+                        data = df_age_gb[df_age_gb["age"] >=39],
+                        ax = ax[1,1],
+                        color = 'purple',
+                        linewidth = 3
+                        )
+
+            ax[1,1].axhline(y = 0.5, linestyle = "dotted", color = 'black')
+
+            ax[1,1].set_title('Cardiovascular Disease Prevalence \nIncreases with Age', fontdict = fontdict_title)
+            ax[1,1].set_ylabel('CVD Prevalence (%)', fontdict = fontdict_labels)
+            ax[1,1].set_yticks(ticks = [x/10 for x in range(0,11,1)], labels = range(0,110,10))
+            ax[1,1].set_xlabel(f'{age.full_name} ({age.unit})', fontdict = fontdict_labels)
+            ax[1,1].set_xticks(ticks = range(39,66,2))
+            png = figure_cache.render(figure_id, fig)
+        st.image(png, use_column_width = True)
 
         st.markdown(f"""
         <div class = 'all'>
             <h3>Variable Analysis</h3>
             <p>
                 The variable <code>{age.name}</code> is not normally distributed and shows a left skew. The minimal age value found
-                in the original dataset was {np.min(df_raw['age'])/365.25:.1f} yo. There was {len(df_raw[df_raw['age']/365.25 < 32])}
+                in the original dataset was {raw['min_age']:.1f} yo. There was {raw['under_32']}
                 individuals below 32 years old, and there no subject in the age group [32 - 38] yo. None 
                 of the subjects below 32 years old had cardiovascular disease, and they were considered outliers due to the existing age gap. It was decided to
                 take them out of the analysis. Consequently, the range for <code>{age.name}</code> is
@@ -331,8 +437,8 @@ def data_viz():
             <p>
                 The prevalence of CV diseases is known to increase with age, as it is the case in this cohort. The proportion of
                 patients in the age group [51 - 55] is <b>around 50%</b>. It is below 50% in younger individuals and above in older individuals.
-                The mean age in patients is <b>{mean_sd_range(df[df['cardio'] == "1"], age)[0]}</b> years old compared to
-                <b>{mean_sd_range(df[df['cardio'] == "0"], age)[0]}</b> years old in controls.
+                The mean age in patients is <b>{mean_sd_1(df, age)}</b> years old compared to
+                <b>{mean_sd_0(df, age)}</b> years old in controls.
             </p>
         </div>
         <div class = 'all conclusion'>
@@ -391,162 +497,154 @@ def data_viz():
         st.write('<h3>Data Visualisation</h3>', unsafe_allow_html=True)
 
         ###### FIGURE ######
+        figure_id = ("sex",) + figure_key
+        png = figure_cache.get(figure_id)
+        if png is None:
+            df_age_m = df[df['sex'] == 'male'][['age', 'cardio']]
+            df_age_m['age_group'] = age_group(df_age_m['age'])
+
+            df_age_m['age'] = df_age_m['age'].astype('int64')
+            df_age_m.groupby('age').value_counts(normalize = True)
+            df_age_gb_m = df_age_m[['age', 'cardio']].groupby('age')['cardio'].value_counts(normalize = True).unstack().reset_index()
+
+            df_age_f = df[df['sex'] == 'female'][['age', 'cardio']]
+            df_age_f['age_group'] = age_group(df_age_f['age'])
+
+            df_age_f['age'] = df_age_f['age'].astype('int64')
+            df_age_f.groupby('age').value_counts(normalize = True)
+            df_age_gb_f = df_age_f[['age', 'cardio']].groupby('age')['cardio'].value_counts(normalize = True).unstack().reset_index()
+
+            fig, ax = plt.subplots(nrows = 2, ncols = 2, figsize = (12, 10))
+            plt.subplots_adjust(hspace = 0.3)
+
+            pie_females = df['sex'].value_counts(normalize = True)['female']
+            pie_males = df['sex'].value_counts(normalize = True)['male']
+
+            ax[0,0].pie(x = [pie_females, pie_males], 
+                    labels = ['Females', 'Males'], 
+                    colors = ['coral', 'seagreen'], 
+                    autopct = '%1.1f%%', 
+                    startangle = 90, 
+                    wedgeprops = {'ec' : 'black'}, textprops = {'size' : 14, 'weight' : 'bold'})
+            ax[0,0].set_title('Distribution of Sex', fontdict = fontdict_title)
+
+            # BARPLOTS
+
+            df_sex = df.groupby('sex')['cardio'].value_counts(normalize = True).unstack().reset_index().rename(columns = {'0': 'cardio_0', '1': 'cardio_1'})
+            df_sex_cardio = pd.melt(df_sex, id_vars = "sex", var_name = "cardio_type", value_name = "prevalence")
+
+            sns.barplot(
+                x = 'sex',
+                y = 'prevalence',
+                hue = 'cardio_type',
+                data = df_sex_cardio,
+                ax = ax[0,1],
+                order = ['female', 'male'],
+                edgecolor = 'black',
+                palette = [palette_cardio["0"], palette_cardio["1"]]
+                )
 
-        df_age_m = df[df['sex'] == 'male'][['age', 'cardio']]
-        df_age_m['age_group'] = df_age_m.apply(lambda row:
-                                        "< 45" if row['age'] < 45
-                                        else "[45 - 49]" if row['age'] < 50
-                                        else "[50 - 54]" if row['age'] < 55
-                                        else "[55 - 59]" if row['age'] < 60
-                                        else "[60 - 65]", axis = 1)
-
-        df_age_m['age'] = df_age_m['age'].astype('int64')
-        df_age_m.groupby('age').value_counts(normalize = True)
-        df_age_gb_m = df_age_m[['age', 'cardio']].groupby('age')['cardio'].value_counts(normalize = True).unstack().reset_index()
-
-        df_age_f = df[df['sex'] == 'female'][['age', 'cardio']]
-        df_age_f['age_group'] = df_age_f.apply(lambda row:
-                                        "< 45" if row['age'] < 45
-                                        else "[45 - 49]" if row['age'] < 50
-                                        else "[50 - 54]" if row['age'] < 55
-                                        else "[55 - 59]" if row['age'] < 60
-                                        else "[60 - 65]", axis = 1)
-
-        df_age_f['age'] = df_age_f['age'].astype('int64')
-        df_age_f.groupby('age').value_counts(normalize = True)
-        df_age_gb_f = df_age_f[['age', 'cardio']].groupby('age')['cardio'].value_counts(normalize = True).unstack().reset_index()
-
-        fig, ax = plt.subplots(nrows = 2, ncols = 2, figsize = (12, 10))
-        plt.subplots_adjust(hspace = 0.3)
-
-        pie_females = df['sex'].value_counts(normalize = True)['female']
-        pie_males = df['sex'].value_counts(normalize = True)['male']
-
-        ax[0,0].pie(x = [pie_females, pie_males], 
-                labels = ['Females', 'Males'], 
-                colors = ['coral', 'seagreen'], 
-                autopct = '%1.1f%%', 
-                startangle = 90, 
-                wedgeprops = {'ec' : 'black'}, textprops = {'size' : 14, 'weight' : 'bold'})
-        ax[0,0].set_title('Distribution of Sex', fontdict = fontdict_title)
-
-        # BARPLOTS
-
-        df_sex = df.groupby('sex')['cardio'].value_counts(normalize = True).unstack().reset_index().rename(columns = {'0': 'cardio_0', '1': 'cardio_1'})
-        df_sex_cardio = pd.melt(df_sex, id_vars = "sex", var_name = "cardio_type", value_name = "prevalence")
-
-        sns.barplot(
-            x = 'sex',
-            y = 'prevalence',
-            hue = 'cardio_type',
-            data = df_sex_cardio,
-            ax = ax[0,1],
-            order = ['female', 'male'],
-            edgecolor = 'black',
-            palette = [palette_cardio["0"], palette_cardio["1"]]
-            )
-        
-        for container in ax[0,1].containers:
-            for bar in container:
-                x = bar.get_x()
-                y = bar.get_height()
-                ax[0,1].text(x + 0.21, y + 0.02, f'{y:.1%}', weight = 'bold', size = 12, ha = "center")
-
-        ylim = [0,0.8]
-        ax[0,1].set_ylim(ylim)
-        ax[0,1].set_yticks(ticks = [x/10 for x in range(0,9,1)], labels = range(0,90,10))
-
-        ax[0,1].set_yticks(ticks = ax[0,1].get_yticks())
-        ax[0,1].set_ylabel('Subjects (%)', fontdict = fontdict_labels)
-
-        ax[0,1].set_xticks(ticks = ax[0,1].get_xticks(), labels = ['Females', 'Males'], size = 12)
-        ax[0,1].set_xlabel(None)
-
-        ax[0,1].set_title(f'Sex May Not Influence Cardiovascular \nDisease Prevalence', fontdict = fontdict_title)
-
-        # Custom legend
-        handles = [
-            Patch(facecolor = palette_cardio["0"], edgecolor = 'black', label = 'Controls'),
-            Patch(facecolor = palette_cardio["1"], edgecolor = 'black', label = 'Patients')
-        ]
-
-        ax[0,1].legend(
-            handles = handles,
-            edgecolor = 'black',
-            title = None
-            )
+            for container in ax[0,1].containers:
+                for bar in container:
+                    x = bar.get_x()
+                    y = bar.get_height()
+                    ax[0,1].text(x + 0.21, y + 0.02, f'{y:.1%}', weight = 'bold', size = 12, ha = "center")
 
+            ylim = [0,0.8]
+            ax[0,1].set_ylim(ylim)
+            ax[0,1].set_yticks(ticks = [x/10 for x in range(0,9,1)], labels = range(0,90,10))
 
-        ### Age Boxplot
-
-        sns.boxplot(x = "sex", 
-                    y = "age", 
-                    data = df, 
-                    palette = palette_sex,
-                    color = 'black',
-                    ax = ax[1,0],
-                    width = 0.3,
-                    boxprops={'edgecolor':'black'},
-                    capprops={'color':'black'},
-                    medianprops={'color':'black'},
-                    flierprops={'color':'black'},
-                    whiskerprops={'color':'black'}
-                )
+            ax[0,1].set_yticks(ticks = ax[0,1].get_yticks())
+            ax[0,1].set_ylabel('Subjects (%)', fontdict = fontdict_labels)
 
-        mean_age_fem = np.mean(df[df['sex'] == 'female']['age'])
-        mean_age_mal = np.mean(df[df['sex'] == 'male']['age'])
-                            
-        ax[1,0].text(0.2, round(mean_age_fem,1), f'{mean_age_fem:.1f}', fontweight = "bold", ha = "left")
-        ax[1,0].text(1.2, round(mean_age_mal,1), f'{mean_age_mal:.1f}', fontweight = "bold", ha = "left")
+            ax[0,1].set_xticks(ticks = ax[0,1].get_xticks(), labels = ['Females', 'Males'], size = 12)
+            ax[0,1].set_xlabel(None)
 
-        ax[1,0].set_ylim([30,70])
-        ax[1,0].set_yticks(ticks = range(30,75,5), labels = range(30,75,5))
-        ax[1,0].set_ylabel("Age (years)", fontdict = fontdict_labels)
+            ax[0,1].set_title(f'Sex May Not Influence Cardiovascular \nDisease Prevalence', fontdict = fontdict_title)
 
-        ax[1,0].set_xticks(ticks = ax[1,0].get_xticks(), labels = ["Females", "Males"], fontsize = 12)
-        ax[1,0].set_xlabel(None)
+            # Custom legend
+            handles = [
+                Patch(facecolor = palette_cardio["0"], edgecolor = 'black', label = 'Controls'),
+                Patch(facecolor = palette_cardio["1"], edgecolor = 'black', label = 'Patients')
+            ]
 
-        ax[1,0].set_title("Comparable Distribution of Age \nwas found in both Groups", fontdict = fontdict_title)
+            ax[0,1].legend(
+                handles = handles,
+                edgecolor = 'black',
+                title = None
+                )
 
 
-        # LINEPLOT
+            ### Age Boxplot
 
-        sns.lineplot(x = "age", 
-                    y = "1", 
-                    data = df_age_gb_f,
-                    ax = ax[1,1],
-                    color = palette_sex['female'],
-                    linewidth = 3
+            sns.boxplot(x = "sex", 
+                        y = "age", 
+                        data = df, 
+                        palette = palette_sex,
+                        color = 'black',
+                        ax = ax[1,0],
+                        width = 0.3,
+                        boxprops={'edgecolor':'black'},
+                        capprops={'color':'black'},
+                        medianprops={'color':'black'},
+                        flierprops={'color':'black'},
+                        whiskerprops={'color':'black'}
                     )
 
-        sns.lineplot(x = "age", 
-                    y = "1", 
-                    data = df_age_gb_m,
-                    ax = ax[1,1],
-                    color = palette_sex['male'],
-                    linewidth = 3
-                    )
+            mean_age_fem = np.mean(df[df['sex'] == 'female']['age'])
+            mean_age_mal = np.mean(df[df['sex'] == 'male']['age'])
 
-        ax[1,1].axhline(y = 0.5, linestyle = "dotted", color = 'black')
+            ax[1,0].text(0.2, round(mean_age_fem,1), f'{mean_age_fem:.1f}', fontweight = "bold", ha = "left")
+            ax[1,0].text(1.2, round(mean_age_mal,1), f'{mean_age_mal:.1f}', fontweight = "bold", ha = "left")
 
-        ax[1,1].set_title('CVD Prevalence Increases with Age \nRegardless of Sex', fontdict = fontdict_title)
-        ax[1,1].set_ylabel('Prevalence (%)', fontdict = fontdict_labels)
-        ax[1,1].set_yticks(ticks = [x/10 for x in range(0,11,1)], labels = range(0,110,10))
-        ax[1,1].set_xlabel(f'{age.full_name} ({age.unit})', fontdict = fontdict_labels)
-        ax[1,1].set_xticks(ticks = range(39,66,2))
+            ax[1,0].set_ylim([30,70])
+            ax[1,0].set_yticks(ticks = range(30,75,5), labels = range(30,75,5))
+            ax[1,0].set_ylabel("Age (years)", fontdict = fontdict_labels)
 
-        handles = [
-            Line2D([0], [0], color = palette_sex['female'], label = 'Females', marker = None),
-            Line2D([0], [0], color = palette_sex['male'], label = 'Males', marker = None)
-        ]
+            ax[1,0].set_xticks(ticks = ax[1,0].get_xticks(), labels = ["Females", "Males"], fontsize = 12)
+            ax[1,0].set_xlabel(None)
 
-        ax[1,1].legend(
-            handles = handles,
-            title = None,
-            edgecolor = 'black'
-        )
+            ax[1,0].set_title("Comparable Distribution of Age \nwas found in both Groups", fontdict = fontdict_title)
+
+
+            # LINEPLOT
+
+            sns.lineplot(x = "age", 
+                        y = "1", 
+                        data = df_age_gb_f,
+                        ax = ax[1,1],
+                        color = palette_sex['female'],
+                        linewidth = 3
+                        )
+
+            sns.lineplot(x = "age", 
+                        y = "1", 
+                        data = df_age_gb_m,
+                        ax = ax[1,1],
+                        color = palette_sex['male'],
+                        linewidth = 3
+                        )
+
+            ax[1,1].axhline(y = 0.5, linestyle = "dotted", color = 'black')
 
-        st.pyplot(fig)
+            ax[1,1].set_title('CVD Prevalence Increases with Age \nRegardless of Sex', fontdict = fontdict_title)
+            ax[1,1].set_ylabel('Prevalence (%)', fontdict = fontdict_labels)
+            ax[1,1].set_yticks(ticks = [x/10 for x in range(0,11,1)], labels = range(0,110,10))
+            ax[1,1].set_xlabel(f'{age.full_name} ({age.unit})', fontdict = fontdict_labels)
+            ax[1,1].set_xticks(ticks = range(39,66,2))
+
+            handles = [
+                Line2D([0], [0], color = palette_sex['female'], label = 'Females', marker = None),
+                Line2D([0], [0], color = palette_sex['male'], label = 'Males', marker = None)
+            ]
+
+            ax[1,1].legend(
+                handles = handles,
+                title = None,
+                edgecolor = 'black'
+            )
+            png = figure_cache.render(figure_id, fig)
+        st.image(png, use_column_width = True)
 
         st.write(f"""
         <div class = 'all'>
@@ -626,210 +724,203 @@ def data_viz():
                 </tr>
             </table><br>""", unsafe_allow_html=True)
 
-        # Creating a df with rounded bmi and aggregated lower and upper values for plotting purpose
+        st.write('<h3>Data Visualisation</h3>', unsafe_allow_html=True)
 
-        df['round_bmi'] = df.apply(lambda row: 45 if round(row['bmi'],0) > 40 else 
-                                15 if round(row['bmi'],0) < 18 else round(row['bmi'],0), axis = 1)
-        df_bmi = df.groupby('round_bmi')['cardio'].value_counts(normalize = True).unstack().reset_index()
+        ######FIGURE######
+        h_lo = np.percentile(df['height'], 2.5)
+        h_hi = np.percentile(df['height'], 97.5)
+        w_lo = np.percentile(df['weight'], 2.5)
+        w_hi = np.percentile(df['weight'], 97.5)
 
+        figure_id = ("bmi",) + figure_key
+        png = figure_cache.get(figure_id)
+        if png is None:
+            # Creating a df with rounded bmi and aggregated lower and upper values for plotting purpose
+            df['round_bmi'] = round_bmi(df['bmi'])
+            df_bmi = df.groupby('round_bmi')['cardio'].value_counts(normalize = True).unstack().reset_index()
+
+            fig = plt.figure(figsize = (10, 15))
+            fig.subplots_adjust(wspace = 0.3, hspace = 0.4)
+            spec = gridspec.GridSpec(nrows = 3, ncols = 2)
+
+            # HISTPLOT bmi
+            ax = fig.add_subplot(spec[0, 0])
+            sns.histplot(x = 'bmi', data = df, ax = ax, color = 'silver', bins = 20)
+            ax.set_title('Distribution of BMI', fontdict = fontdict_title)
+            ax.set_xticks(range(0, int(np.max(ax.get_xticks())), 5))
+            ax.set_ylabel('Count', fontdict = fontdict_labels)
+            ax.set_xlabel('BMI (kg/m²)', fontdict = fontdict_labels)
+            ax.set_xlim([10,90])
+            ax.set_xticks(ticks = range(10,95,5), labels = range(10,95,5))
+            ax.set_ylim([0, 22500])
+            ax.set_yticks(ticks = range(0,25000,2500))
+
+            # LINEPLOT CV disease and BMI
+            ax = fig.add_subplot(spec[0, 1])
+            sns.lineplot(
+                x = 'round_bmi',
+                y = '1', 
+                data = df_bmi[~df_bmi['round_bmi'].isin([15,45])], 
+                color = 'purple', 
+                linewidth = 3
+            )
 
-        st.write('<h3>Data Visualisation</h3>', unsafe_allow_html=True)
+            sns.lineplot(
+                x = 'round_bmi',
+                y = '1', 
+                data = df_bmi[df_bmi['round_bmi'].isin([15,18])], 
+                color = 'purple', 
+                linewidth = 3,
+                linestyle = "dotted"
+            )
 
-        ######FIGURE######
-        fig = plt.figure(figsize = (10, 15))
-        fig.subplots_adjust(wspace = 0.3, hspace = 0.4)
-        spec = gridspec.GridSpec(nrows = 3, ncols = 2)
-
-        # HISTPLOT bmi
-        ax = fig.add_subplot(spec[0, 0])
-        sns.histplot(x = 'bmi', data = df, ax = ax, color = 'silver', bins = 20)
-        ax.set_title('Distribution of BMI', fontdict = fontdict_title)
-        ax.set_xticks(range(0, int(np.max(ax.get_xticks())), 5))
-        ax.set_ylabel('Count', fontdict = fontdict_labels)
-        ax.set_xlabel('BMI (kg/m²)', fontdict = fontdict_labels)
-        ax.set_xlim([10,90])
-        ax.set_xticks(ticks = range(10,95,5), labels = range(10,95,5))
-        ax.set_ylim([0, 22500])
-        ax.set_yticks(ticks = range(0,25000,2500))
-
-        # LINEPLOT CV disease and BMI
-        ax = fig.add_subplot(spec[0, 1])
-        sns.lineplot(
-            x = 'round_bmi',
-            y = '1', 
-            data = df_bmi[~df_bmi['round_bmi'].isin([15,45])], 
-            color = 'purple', 
-            linewidth = 3
-        )
+            sns.lineplot(
+                x = 'round_bmi',
+                y = '1', 
+                data = df_bmi[df_bmi['round_bmi'].isin([40,45])], 
+                color = 'purple', 
+                linewidth = 3,
+                linestyle = "dotted"
+            )
 
-        sns.lineplot(
-            x = 'round_bmi',
-            y = '1', 
-            data = df_bmi[df_bmi['round_bmi'].isin([15,18])], 
-            color = 'purple', 
-            linewidth = 3,
-            linestyle = "dotted"
-        )
+            ax.axhline(y = 0.5, linestyle = 'dotted', color = 'black')
 
-        sns.lineplot(
-            x = 'round_bmi',
-            y = '1', 
-            data = df_bmi[df_bmi['round_bmi'].isin([40,45])], 
-            color = 'purple', 
-            linewidth = 3,
-            linestyle = "dotted"
-        )
+            handles = [
+                Line2D([0], [0], label = "Pooled data from individual \nwith extreme BMI, displaying\nhigh variability", linestyle = "dotted", color = "purple")
+            ]
 
-        ax.axhline(y = 0.5, linestyle = 'dotted', color = 'black')
+            ax.legend(handles = handles, title = None, edgecolor = "black")
 
-        handles = [
-            Line2D([0], [0], label = "Pooled data from individual \nwith extreme BMI, displaying\nhigh variability", linestyle = "dotted", color = "purple")
-        ]
+            ax.set_ylim([0,1])
+            ax.set_yticks(ticks = [x/10 for x in range(11)], labels = range(0,110,10))
+            ax.set_ylabel('CVD Prevalence (%)', fontdict = fontdict_labels)
 
-        ax.legend(handles = handles, title = None, edgecolor = "black")
+            ax.set_title('Cardiovascular Disease Prevalence \nIncreases with BMI', fontdict = fontdict_title)
 
-        ax.set_ylim([0,1])
-        ax.set_yticks(ticks = [x/10 for x in range(11)], labels = range(0,110,10))
-        ax.set_ylabel('CVD Prevalence (%)', fontdict = fontdict_labels)
-        
-        ax.set_title('Cardiovascular Disease Prevalence \nIncreases with BMI', fontdict = fontdict_title)
-        
-        ax.set_xlim([13,47])
-        ax.set_xticks(ticks = range(15,50,5), labels = ["< 17", 20, 25, 30, 35, 40, "> 40"])
-        ax.set_xlabel(bmi.label, fontdict = fontdict_labels)
-
-        # BMI distribution according to sex
-
-        ax = fig.add_subplot(spec[1,0])
-
-        sns.boxplot(
-            x = "sex", 
-            y = "bmi", 
-            data = df,
-            palette = palette_sex,
-            width = 0.3,
-            medianprops = {'color' : 'black'},
-            boxprops = {'edgecolor': 'black'},
-            flierprops = {'color' : 'black', 'markersize': 3},
-            whiskerprops = {'color' : 'black'},
-            capprops = {'color' : 'black'}
-        )
+            ax.set_xlim([13,47])
+            ax.set_xticks(ticks = range(15,50,5), labels = ["< 17", 20, 25, 30, 35, 40, "> 40"])
+            ax.set_xlabel(bmi.label, fontdict = fontdict_labels)
 
-        median_bmi_f = np.median(df[df['sex'] == 'female']['bmi'])
-        median_bmi_m = np.median(df[df['sex'] == 'male']['bmi'])
+            # BMI distribution according to sex
 
-        ax.text(0.3, median_bmi_f, f'{median_bmi_f:.1f}', ha = "center", va = "center", fontweight = "bold")
-        ax.text(1.3, median_bmi_m, f'{median_bmi_m:.1f}', ha = "center", va = "center", fontweight = "bold")
+            ax = fig.add_subplot(spec[1,0])
 
-        ax.set_ylim([0,90])
-        ax.set_yticks(ticks = range(0,100,10), labels = range(0,100,10))
-        ax.set_ylabel('BMI (kg/m²)', fontdict = fontdict_labels)
+            sns.boxplot(
+                x = "sex", 
+                y = "bmi", 
+                data = df,
+                palette = palette_sex,
+                width = 0.3,
+                medianprops = {'color' : 'black'},
+                boxprops = {'edgecolor': 'black'},
+                flierprops = {'color' : 'black', 'markersize': 3},
+                whiskerprops = {'color' : 'black'},
+                capprops = {'color' : 'black'}
+            )
 
-        ax.set_xlabel(None)
-        ax.set_xticks(ticks = ax.get_xticks(), labels = ['Females', 'Males'], fontsize = 12)
+            median_bmi_f = np.median(df[df['sex'] == 'female']['bmi'])
+            median_bmi_m = np.median(df[df['sex'] == 'male']['bmi'])
 
-        ax.set_title("Sex has Limited Impact on BMI", fontdict = fontdict_title)
+            ax.text(0.3, median_bmi_f, f'{median_bmi_f:.1f}', ha = "center", va = "center", fontweight = "bold")
+            ax.text(1.3, median_bmi_m, f'{median_bmi_m:.1f}', ha = "center", va = "center", fontweight = "bold")
 
-        # SCATTERPLOT height weight sex
-        ax = fig.add_subplot(spec[1,1])
-        sns.scatterplot(x= 'weight',
-                        y = 'height',
-                        data = df,
-                        ax = ax,
-                        edgecolor = 'black',
-                        hue = 'sex',
-                        alpha = 0.5,
-                        palette = palette_sex,
-                        s = 10)
+            ax.set_ylim([0,90])
+            ax.set_yticks(ticks = range(0,100,10), labels = range(0,100,10))
+            ax.set_ylabel('BMI (kg/m²)', fontdict = fontdict_labels)
 
-        h_lo = np.percentile(df['height'], 2.5)
-        h_hi = np.percentile(df['height'], 97.5)
-        w_lo = np.percentile(df['weight'], 2.5)
-        w_hi = np.percentile(df['weight'], 97.5)
+            ax.set_xlabel(None)
+            ax.set_xticks(ticks = ax.get_xticks(), labels = ['Females', 'Males'], fontsize = 12)
 
-        ax.axvline(w_lo, linestyle = 'dotted', color = 'black')
-        ax.axvline(w_hi, linestyle = 'dotted', color = 'black')
-        ax.axhline(h_lo, linestyle = 'dotted', color = 'black')
-        ax.axhline(h_hi, linestyle = 'dotted', color = 'black')
-        ax.plot([w_lo, w_hi, w_hi, w_lo, w_lo], [h_lo, h_lo, h_hi, h_hi, h_lo], color = 'black')
-
-        ax.set_title('High Variability Found for Height \nand Weight Extreme Values', fontdict = fontdict_title)
-        ax.set_ylabel('Weight (kg)', fontdict = fontdict_labels)
-
-        xlim = [40, 220]
-        ax.set_xlim(xlim)
-        ax.set_xticks(ticks = range(40,240,20), labels = range(40,240,20))
-        ax.set_xlabel('Weight (kg)', fontdict = fontdict_labels)
-
-        ax.set_ylabel('Height (cm)', fontdict = fontdict_labels)
-        ax.set_ylim([120, 220])
-        ax.set_yticks(ticks = range(120,230,10), labels = range(120,230,10))
-
-        ax.legend(title = 'Sex', frameon = True, edgecolor ='black')
-
-        ax_range = xlim[1] - xlim[0]
-        ax.text(w_lo + 0.01*ax_range, 121, f'{w_lo:.0f} kg')
-        ax.text(w_hi + 0.01*ax_range, 121, f'{w_hi:.0f} kg')
-        ax.text(xlim[1]-1, h_lo+1, f'{h_lo:.0f} cm', ha = "right")
-        ax.text(xlim[1]-1, h_hi+1, f'{h_hi:.0f} cm', ha = "right")
-
-        handles = [
-            Line2D([0], [0], color = 'w', markerfacecolor = palette_sex['female'], label = 'Female', marker = 'o', markeredgecolor = 'black'),
-            Line2D([0], [0], color = 'w', markerfacecolor = palette_sex['male'], label = 'Male', marker = 'o', markeredgecolor = 'black'),
-            Line2D([0], [0], color = 'black', linestyle = 'dotted', label = '95% CI')
-        ]
-
-        ax.legend(handles = handles, edgecolor = 'black')
-
-        # HISTPLOT focus on outliers
-        ax = fig.add_subplot(spec[2,:])
-
-        df["out_wh"] = df.apply(lambda row:
-                                "hi_wh" if row['weight'] > w_hi and row['height'] > h_hi
-                                else "hi_w" if row['weight'] > w_hi
-                                else "hi_h" if row['height'] > h_hi
-                                else "lo_wh" if row['weight'] < w_lo and row['height'] < h_lo
-                                else "lo_w" if row['weight'] < w_lo
-                                else "lo_h" if row['height'] < h_lo
-                                else "normal", axis = 1
-                            )
-
-        df_wh_temp = df.groupby('out_wh')['cardio'].value_counts(normalize = True).unstack().reset_index()
-        df_wh = pd.melt(df_wh_temp, id_vars = "out_wh", var_name = "cardio", value_name = "proportion") 
-
-        sns.barplot(x = 'out_wh', 
-                    y ="proportion",
-                    data = df_wh, 
-                    hue = "cardio", 
-                    ax =ax, 
-                    edgecolor = 'black', 
-                    order = ['hi_wh', 'hi_w', 'hi_h', 'lo_wh', 'lo_w', 'lo_h', 'normal'],
-                    palette = palette_cardio
-                )
+            ax.set_title("Sex has Limited Impact on BMI", fontdict = fontdict_title)
+
+            # SCATTERPLOT height weight sex
+            ax = fig.add_subplot(spec[1,1])
+            sns.scatterplot(x= 'weight',
+                            y = 'height',
+                            data = df,
+                            ax = ax,
+                            edgecolor = 'black',
+                            hue = 'sex',
+                            alpha = 0.5,
+                            palette = palette_sex,
+                            s = 10)
+
+
+            ax.axvline(w_lo, linestyle = 'dotted', color = 'black')
+            ax.axvline(w_hi, linestyle = 'dotted', color = 'black')
+            ax.axhline(h_lo, linestyle = 'dotted', color = 'black')
+            ax.axhline(h_hi, linestyle = 'dotted', color = 'black')
+            ax.plot([w_lo, w_hi, w_hi, w_lo, w_lo], [h_lo, h_lo, h_hi, h_hi, h_lo], color = 'black')
+
+            ax.set_title('High Variability Found for Height \nand Weight Extreme Values', fontdict = fontdict_title)
+            ax.set_ylabel('Weight (kg)', fontdict = fontdict_labels)
+
+            xlim = [40, 220]
+            ax.set_xlim(xlim)
+            ax.set_xticks(ticks = range(40,240,20), labels = range(40,240,20))
+            ax.set_xlabel('Weight (kg)', fontdict = fontdict_labels)
 
-        ax.axhline(y = 0.5, linestyle = 'dashed', color = 'black')
+            ax.set_ylabel('Height (cm)', fontdict = fontdict_labels)
+            ax.set_ylim([120, 220])
+            ax.set_yticks(ticks = range(120,230,10), labels = range(120,230,10))
 
-        for index, group in enumerate(['hi_wh', 'hi_w', 'hi_h', 'lo_wh', 'lo_w', 'lo_h', 'normal']):
-            ax.text(index, 0.1, f'n = {len(df[df["out_wh"] == group])}', ha ="center", bbox = {'facecolor' : 'white', 'edgecolor' : 'black', 'boxstyle' : 'round'})
+            ax.legend(title = 'Sex', frameon = True, edgecolor ='black')
 
-        ax.set_title('Extreme Weight and/or Height May Influence \nCardiovascular Disease Prevalence', fontdict = fontdict_title)
+            ax_range = xlim[1] - xlim[0]
+            ax.text(w_lo + 0.01*ax_range, 121, f'{w_lo:.0f} kg')
+            ax.text(w_hi + 0.01*ax_range, 121, f'{w_hi:.0f} kg')
+            ax.text(xlim[1]-1, h_lo+1, f'{h_lo:.0f} cm', ha = "right")
+            ax.text(xlim[1]-1, h_hi+1, f'{h_hi:.0f} cm', ha = "right")
 
-        ylim = ([0,1])
-        ax.set_ylim(ylim)
-        ax.set_yticks(ticks = [x/10 for x in range(11)], labels = range(0,110,10))
-        ax.set_ylabel("Subjects (%)", fontdict = fontdict_labels)
+            handles = [
+                Line2D([0], [0], color = 'w', markerfacecolor = palette_sex['female'], label = 'Female', marker = 'o', markeredgecolor = 'black'),
+                Line2D([0], [0], color = 'w', markerfacecolor = palette_sex['male'], label = 'Male', marker = 'o', markeredgecolor = 'black'),
+                Line2D([0], [0], color = 'black', linestyle = 'dotted', label = '95% CI')
+            ]
 
-        ax.set_xlabel(None)
-        ax.set_xticklabels(['High Weight\n and Height', 'High Weight', 'High Height', 'Low Weight\nand Height', 'Low Weight', 'Low Height', 'Normal Weight\nand Height'])
+            ax.legend(handles = handles, edgecolor = 'black')
 
-        handles = [
-            Patch(facecolor = palette_cardio["0"], label = "Controls", edgecolor = "black"),
-            Patch(facecolor = palette_cardio["1"], label = "Patients", edgecolor = "black")
-        ]
+            # HISTPLOT focus on outliers
+            ax = fig.add_subplot(spec[2,:])
 
-        ax.legend(handles = handles, title = None, edgecolor = "black")
+            df["out_wh"] = out_wh(df['weight'], df['height'], w_lo, w_hi, h_lo, h_hi)
 
-        st.pyplot(fig)
+            df_wh_temp = df.groupby('out_wh')['cardio'].value_counts(normalize = True).unstack().reset_index()
+            df_wh = pd.melt(df_wh_temp, id_vars = "out_wh", var_name = "cardio", value_name = "proportion") 
+
+            sns.barplot(x = 'out_wh', 
+                        y ="proportion",
+                        data = df_wh, 
+                        hue = "cardio", 
+                        ax =ax, 
+                        edgecolor = 'black', 
+                        order = ['hi_wh', 'hi_w', 'hi_h', 'lo_wh', 'lo_w', 'lo_h', 'normal'],
+                        palette = palette_cardio
+                    )
+
+            ax.axhline(y = 0.5, linestyle = 'dashed', color = 'black')
+
+            for index, group in enumerate(['hi_wh', 'hi_w', 'hi_h', 'lo_wh', 'lo_w', 'lo_h', 'normal']):
+                ax.text(index, 0.1, f'n = {len(df[df["out_wh"] == group])}', ha ="center", bbox = {'facecolor' : 'white', 'edgecolor' : 'black', 'boxstyle' : 'round'})
+
+            ax.set_title('Extreme Weight and/or Height May Influence \nCardiovascular Disease Prevalence', fontdict = fontdict_title)
+
+            ylim = ([0,1])
+            ax.set_ylim(ylim)
+            ax.set_yticks(ticks = [x/10 for x in range(11)], labels = range(0,110,10))
+            ax.set_ylabel("Subjects (%)", fontdict = fontdict_labels)
+
+            ax.set_xlabel(None)
+            ax.set_xticklabels(['High Weight\n and Height', 'High Weight', 'High Height', 'Low Weight\nand Height', 'Low Weight', 'Low Height', 'Normal Weight\nand Height'])
+
+            handles = [
+                Patch(facecolor = palette_cardio["0"], label = "Controls", edgecolor = "black"),
+                Patch(facecolor = palette_cardio["1"], label = "Patients", edgecolor = "black")
+            ]
+
+            ax.legend(handles = handles, title = None, edgecolor = "black")
+            png = figure_cache.render(figure_id, fig)
+        st.image(png, use_column_width = True)
 
         st.write(f"""
         <div class ='all'>
@@ -978,174 +1069,176 @@ def data_viz():
 
         st.write('<h3>Data Visualisation</h3>', unsafe_allow_html=True)
 
-        df_ap = df[['age', 'sex', 'ap_hi', 'ap_lo', 'ap_m', 'ap_aha', 'cardio']]
-        df_ap['age'] = df_ap['age'].astype('int64')
+        ######FIGURE######
+        cardio_aha = (df.groupby('ap_aha')['cardio'].value_counts(normalize = True)*100).unstack().reset_index().rename(columns = {"0" : "cardio_0", "1" : "cardio_1"})
 
-        df_ap['age_5'] = df_ap.apply(lambda row: 40 if row['age'] < 45
-                                    else 45 if row['age'] < 50
-                                    else 50 if row['age'] < 55
-                                    else 55 if row['age'] < 60
-                                    else 60 if row['age'] < 65
-                                    else 65, axis = 1)
+        figure_id = ("bp",) + figure_key
+        png = figure_cache.get(figure_id)
+        if png is None:
+            df_ap = df[['age', 'sex', 'ap_hi', 'ap_lo', 'ap_m', 'ap_aha', 'cardio']]
+            df_ap['age'] = df_ap['age'].astype('int64')
+
+            df_ap['age_5'] = age_5(df_ap['age'])
+
+            df_ap_all = df_ap.groupby('age_5')['ap_m'].mean().reset_index()
+            df_ap_fem_0 = df_ap[(df_ap['sex'] == 'female') & (df_ap['cardio'] == "0")].groupby('age_5')['ap_m'].mean().reset_index()
+            df_ap_fem_1 = df_ap[(df_ap['sex'] == 'female') & (df_ap['cardio'] == "1")].groupby('age_5')['ap_m'].mean().reset_index()
+
+            df_ap_mal_0 = df_ap[(df_ap['sex'] == 'male') & (df_ap['cardio'] == "0")].groupby('age_5')['ap_m'].mean().reset_index()
+            df_ap_mal_1 = df_ap[(df_ap['sex'] == 'male') & (df_ap['cardio'] == "1")].groupby('age_5')['ap_m'].mean().reset_index()
+
+            fig  = plt.figure(figsize = (10,15))
+            spec = gridspec.GridSpec(nrows = 3, ncols = 2)
+
+            # HISTPLOT systolic and diastolic distribution
+            ax = fig.add_subplot(spec[0,0])
+            sns.histplot(
+                data = df[['ap_hi', 'ap_lo']], 
+                ax=ax,
+                bins = 18, 
+                palette = ['gold', 'indigo'])
+
+            ax.set_xticks(range(40, int(np.max(ax.get_xticks())), 20))
+            ax.set_title('Distribution of Systolic \nand Diastolic Blood Pressure', fontdict = fontdict_title)
+            ax.set_xlabel('Blood Pressure (mmHg)', fontdict = fontdict_labels)
+            ax.set_ylabel('Count', fontdict = fontdict_labels)
+
+            handles = [
+                Patch(facecolor = 'khaki', edgecolor = 'black', label = 'Systolic'),
+                Patch(facecolor = 'darkorchid', edgecolor = 'black', label = 'Diastolic')
+            ]
+
+            ax.legend(handles = handles, title = None, edgecolor = 'black')
+
+            # SCATTERPLOT systolic and diastolic correlation
+            ax = fig.add_subplot(spec[0,1])
+            sns.scatterplot(
+                x = 'ap_hi',
+                y = 'ap_lo', 
+                data = df, 
+                ax = ax, 
+                hue = 'cardio',
+                palette = palette_cardio, 
+                edgecolor = 'black', 
+                alpha = 1, 
+                hue_order = ["0", "1"], 
+                )
 
-        df_ap_all = df_ap.groupby('age_5')['ap_m'].mean().reset_index()
-        df_ap_fem_0 = df_ap[(df_ap['sex'] == 'female') & (df_ap['cardio'] == "0")].groupby('age_5')['ap_m'].mean().reset_index()
-        df_ap_fem_1 = df_ap[(df_ap['sex'] == 'female') & (df_ap['cardio'] == "1")].groupby('age_5')['ap_m'].mean().reset_index()
 
-        df_ap_mal_0 = df_ap[(df_ap['sex'] == 'male') & (df_ap['cardio'] == "0")].groupby('age_5')['ap_m'].mean().reset_index()
-        df_ap_mal_1 = df_ap[(df_ap['sex'] == 'male') & (df_ap['cardio'] == "1")].groupby('age_5')['ap_m'].mean().reset_index()
+            ax.set_title('Higher Blood Pressure Values \nin Patients', fontdict = fontdict_title)
+            ax.set_xticks(range(40,250,20))
+            ax.set_yticks(range(40,250,20))
+            ax.set_xlabel('Systolic pressure (mmHg)', fontdict = fontdict_labels)
+            ax.set_ylabel('Diastolic pressure (mmHg)', fontdict = fontdict_labels)
 
-        ######FIGURE######
-        fig  = plt.figure(figsize = (10,15))
-        spec = gridspec.GridSpec(nrows = 3, ncols = 2)
-
-        # HISTPLOT systolic and diastolic distribution
-        ax = fig.add_subplot(spec[0,0])
-        sns.histplot(
-            data = df[['ap_hi', 'ap_lo']], 
-            ax=ax,
-            bins = 18, 
-            palette = ['gold', 'indigo'])
-
-        ax.set_xticks(range(40, int(np.max(ax.get_xticks())), 20))
-        ax.set_title('Distribution of Systolic \nand Diastolic Blood Pressure', fontdict = fontdict_title)
-        ax.set_xlabel('Blood Pressure (mmHg)', fontdict = fontdict_labels)
-        ax.set_ylabel('Count', fontdict = fontdict_labels)
-        
-        handles = [
-            Patch(facecolor = 'khaki', edgecolor = 'black', label = 'Systolic'),
-            Patch(facecolor = 'darkorchid', edgecolor = 'black', label = 'Diastolic')
-        ]
-
-        ax.legend(handles = handles, title = None, edgecolor = 'black')
-
-        # SCATTERPLOT systolic and diastolic correlation
-        ax = fig.add_subplot(spec[0,1])
-        sns.scatterplot(
-            x = 'ap_hi',
-            y = 'ap_lo', 
-            data = df, 
-            ax = ax, 
-            hue = 'cardio',
-            palette = palette_cardio, 
-            edgecolor = 'black', 
-            alpha = 1, 
-            hue_order = ["0", "1"], 
-            )
+            handles = [
+                Line2D([0], [0], color = 'white', marker = 'o', markerfacecolor= palette_cardio["0"], markeredgecolor='black', label = 'Controls'),
+                Line2D([0], [0], color = 'white', marker = 'o', markerfacecolor= palette_cardio["1"], markeredgecolor='black', label = 'Patients')
+            ]
+            ax.legend(title = None, handles = handles, edgecolor = 'black')
 
 
-        ax.set_title('Higher Blood Pressure Values \nin Patients', fontdict = fontdict_title)
-        ax.set_xticks(range(40,250,20))
-        ax.set_yticks(range(40,250,20))
-        ax.set_xlabel('Systolic pressure (mmHg)', fontdict = fontdict_labels)
-        ax.set_ylabel('Diastolic pressure (mmHg)', fontdict = fontdict_labels)
+            # Prevalence of CV disease according to ap_aha
+            ax = fig.add_subplot(spec[1,0])
 
-        handles = [
-            Line2D([0], [0], color = 'white', marker = 'o', markerfacecolor= palette_cardio["0"], markeredgecolor='black', label = 'Controls'),
-            Line2D([0], [0], color = 'white', marker = 'o', markerfacecolor= palette_cardio["1"], markeredgecolor='black', label = 'Patients')
-        ]
-        ax.legend(title = None, handles = handles, edgecolor = 'black')
 
+            sns.lineplot(
+                x = "ap_aha", 
+                y = "cardio_1", 
+                data = cardio_aha, 
+                linewidth = 3, 
+                ax = ax, 
+                color = "purple", 
+                marker = "o",
+                markeredgecolor = 'black'
+                )
 
-        # Prevalence of CV disease according to ap_aha
-        ax = fig.add_subplot(spec[1,0])
+            for i in range(1, 5, 1):
+                prevalence = cardio_aha[cardio_aha['ap_aha'] == str(i)]['cardio_1'].values[0]
+                ax.text(i-1, prevalence + 4, f'{prevalence:.1f}%', fontweight = 'bold', ha = "right")
 
-        cardio_aha = (df.groupby('ap_aha')['cardio'].value_counts(normalize = True)*100).unstack().reset_index().rename(columns = {"0" : "cardio_0", "1" : "cardio_1"})
 
-        sns.lineplot(
-            x = "ap_aha", 
-            y = "cardio_1", 
-            data = cardio_aha, 
-            linewidth = 3, 
-            ax = ax, 
-            color = "purple", 
-            marker = "o",
-            markeredgecolor = 'black'
-            )
+            ax.set_ylim(0,100)
+            ax.set_yticks(range(0,110,10))
+            ax.set_ylabel("CVD Prevalence (%)", fontdict = fontdict_labels)
 
-        for i in range(1, 5, 1):
-            prevalence = cardio_aha[cardio_aha['ap_aha'] == str(i)]['cardio_1'].values[0]
-            ax.text(i-1, prevalence + 4, f'{prevalence:.1f}%', fontweight = 'bold', ha = "right")
+            ax.set_xticks(ticks = ax.get_xticks(), labels = ["Normal", "Elevated", "Hypertension \nStage 1", "Hypertension \nStage 2"])
+            ax.set_xlabel("Blood Pressure Classification \n(according to AHA)", fontdict = fontdict_labels)
+            ax.set_xlim(-0.5,3.3)
+            ax.set_title("Higher Prevalence of CV Disease in AHA's \nCategories Hypertension Stage 1 & 2", fontdict = fontdict_title)
 
+            # LINEPLOT ap as a function of age, sex and CV status
+            ax = fig.add_subplot(spec[1, 1])
 
-        ax.set_ylim(0,100)
-        ax.set_yticks(range(0,110,10))
-        ax.set_ylabel("CVD Prevalence (%)", fontdict = fontdict_labels)
+            sns.lineplot(
+                x= 'age_5', 
+                y= 'ap_m', 
+                data = df_ap_fem_0, 
+                color = palette_sex['female'], 
+                linestyle = 'dotted', 
+                linewidth = 3, 
+                marker = 'o', 
+                markeredgecolor = 'black'
+                )
 
-        ax.set_xticks(ticks = ax.get_xticks(), labels = ["Normal", "Elevated", "Hypertension \nStage 1", "Hypertension \nStage 2"])
-        ax.set_xlabel("Blood Pressure Classification \n(according to AHA)", fontdict = fontdict_labels)
-        ax.set_xlim(-0.5,3.3)
-        ax.set_title("Higher Prevalence of CV Disease in AHA's \nCategories Hypertension Stage 1 & 2", fontdict = fontdict_title)
+            sns.lineplot(
+                x= 'age_5',
+                y= 'ap_m', 
+                data = df_ap_fem_1, 
+                color = palette_sex['female'], 
+                linestyle = 'solid', 
+                linewidth = 3, 
+                marker = 'o', 
+                markeredgecolor = 'black'
+                )
 
-        # LINEPLOT ap as a function of age, sex and CV status
-        ax = fig.add_subplot(spec[1, 1])
+            sns.lineplot(
+                x= 'age_5', 
+                y= 'ap_m', 
+                data = df_ap_mal_0, 
+                color = palette_sex['male'], 
+                linestyle = 'dotted', 
+                linewidth = 3, 
+                marker = 'o', 
+                markeredgecolor = 'black'
+                )
 
-        sns.lineplot(
-            x= 'age_5', 
-            y= 'ap_m', 
-            data = df_ap_fem_0, 
-            color = palette_sex['female'], 
-            linestyle = 'dotted', 
-            linewidth = 3, 
-            marker = 'o', 
-            markeredgecolor = 'black'
-            )
-        
-        sns.lineplot(
-            x= 'age_5',
-            y= 'ap_m', 
-            data = df_ap_fem_1, 
-            color = palette_sex['female'], 
-            linestyle = 'solid', 
-            linewidth = 3, 
-            marker = 'o', 
-            markeredgecolor = 'black'
-            )
+            sns.lineplot(
+                x= 'age_5', 
+                y= 'ap_m', 
+                data = df_ap_mal_1, 
+                color = palette_sex['male'], 
+                linestyle = 'solid', 
+                linewidth = 3, 
+                marker = 'o', 
+                markeredgecolor = 'black'
+                )
 
-        sns.lineplot(
-            x= 'age_5', 
-            y= 'ap_m', 
-            data = df_ap_mal_0, 
-            color = palette_sex['male'], 
-            linestyle = 'dotted', 
-            linewidth = 3, 
-            marker = 'o', 
-            markeredgecolor = 'black'
-            )
-        
-        sns.lineplot(
-            x= 'age_5', 
-            y= 'ap_m', 
-            data = df_ap_mal_1, 
-            color = palette_sex['male'], 
-            linestyle = 'solid', 
-            linewidth = 3, 
-            marker = 'o', 
-            markeredgecolor = 'black'
-            )
-        
-        ax.set_ylim(86, 104)
-        ax.set_yticks(ticks = range(86,105,1), labels = range(86,105,1))
-        ax.set_ylabel("Mean Blood Pressure (mmHg)", fontdict = fontdict_labels)
+            ax.set_ylim(86, 104)
+            ax.set_yticks(ticks = range(86,105,1), labels = range(86,105,1))
+            ax.set_ylabel("Mean Blood Pressure (mmHg)", fontdict = fontdict_labels)
 
-        ax.set_xticks(ticks = range(40, 65, 5), labels = ["<45", "[45 - 49]", "[50 - 54]", "[55 - 59]", "[60 - 65]"])
-        ax.set_xlabel("Age group (yrs.)", fontdict = fontdict_labels)
+            ax.set_xticks(ticks = range(40, 65, 5), labels = ["<45", "[45 - 49]", "[50 - 54]", "[55 - 59]", "[60 - 65]"])
+            ax.set_xlabel("Age group (yrs.)", fontdict = fontdict_labels)
+
+            ax.set_title("Blood Pressure Increases with Age in \nControls but not in Patients", fontdict = fontdict_title)
 
-        ax.set_title("Blood Pressure Increases with Age in \nControls but not in Patients", fontdict = fontdict_title)
-    
 
-        handles = [
-            Line2D([0], [0], color = 'white', marker = 'o', markerfacecolor = palette_sex['female'], markeredgecolor = 'black', label = 'Females'),
-            Line2D([0], [0], color = 'white', marker = 'o', markerfacecolor = palette_sex['male'], markeredgecolor = 'black', label = 'Males'),
-            Line2D([0], [0], color = "black", linestyle = "solid", label = "Patients"),
-            Line2D([0], [0], color = "black", linestyle = "dotted", label = "Controls")
-        ]
+            handles = [
+                Line2D([0], [0], color = 'white', marker = 'o', markerfacecolor = palette_sex['female'], markeredgecolor = 'black', label = 'Females'),
+                Line2D([0], [0], color = 'white', marker = 'o', markerfacecolor = palette_sex['male'], markeredgecolor = 'black', label = 'Males'),
+                Line2D([0], [0], color = "black", linestyle = "solid", label = "Patients"),
+                Line2D([0], [0], color = "black", linestyle = "dotted", label = "Controls")
+            ]
 
-        ax.legend(handles = handles, title = None, edgecolor = "black")
+            ax.legend(handles = handles, title = None, edgecolor = "black")
 
-        plt.tight_layout()
-        st.pyplot(fig)
+            plt.tight_layout()
+            png = figure_cache.render(figure_id, fig)
+        st.image(png, use_column_width = True)
 
+        # The three blood pressures are compared between the cardio groups in one batch
+        mwu_pvals = mwu_cardio_batch(df, [ap_hi.name, ap_lo.name, ap_m.name])['pval'].xs("all", level = 1)
         st.write(f"""
         <div class = 'all'>
             <h3>Variable Analysis</h3>
@@ -1153,8 +1246,8 @@ def data_viz():
                 Both systolic and diastolic blood pressure displayed <b>substantial variability</b>, with wide range covered; and
             strongly correlated one with the other ({pval_txt(spearmanr(df['ap_hi'], df['ap_lo'])[1])}). With both systolic and
             diastolic blood pressure, <b>higher values were measured among patients with cardiovascular disease</b>
-            ({pval_txt(mwu_cardio(df, ap_hi))} for systolic,  {pval_txt(mwu_cardio(df, ap_lo))} for diastolic 
-            and {pval_txt(mwu_cardio(df, ap_m))} for mean blood pressure). 
+            ({pval_txt(mwu_pvals[ap_hi.name])} for systolic,  {pval_txt(mwu_pvals[ap_lo.name])} for diastolic 
+            and {pval_txt(mwu_pvals[ap_m.name])} for mean blood pressure). 
             Such observations were expected as high blood pressure is known to be a risk factor
             for cardiovascular diseases.
             </p>
@@ -1252,185 +1345,188 @@ def data_viz():
         st.write('<h3>Data Visualisations</h3>', unsafe_allow_html=True)
         ##### FIGURE #####
 
-        fig = plt.figure(figsize = (12, 12))
-        plt.subplots_adjust(hspace = 0.6, wspace = 0.5)
-        spec = gridspec.GridSpec(nrows = 4, ncols = 4)
-
-        # Barplots Chol and Gluc
-
-        df_gluc = df['gluc'].value_counts(normalize = True).reset_index(name = "glucose").rename(columns = {'index' : 'score'})
-        df_chol = df['cholesterol'].value_counts(normalize = True).reset_index().rename(columns = {'index' : 'score'})
-        df_gc_temp = df_gluc.merge(df_chol, how='inner', left_on='score', right_on='score')
-        df_gc = pd.melt(df_gc_temp, id_vars = "score", var_name = "parameter", value_name = "percentage")
-        
-        palette_gc = ['palegreen', 'orange', 'orangered']
-
-        ax = fig.add_subplot(spec[0:2, 0:2])
-        sns.barplot(
-            x = 'parameter', 
-            y = 'percentage', 
-            hue = 'score', 
-            data = df_gc, 
-            ax = ax, 
-            edgecolor = "black", 
-            palette = palette_gc)
-    
-        ax.set_ylim(0,1)    
-        ax.set_yticks(ticks = [x/100 for x in range(0,105,10)], labels = range(0,105,10))
-        ax.set_ylabel('Subjects (%)', fontdict = fontdict_labels)
-
-        ax.set_xticklabels([tick.get_text().capitalize() for tick in ax.get_xticklabels()], size = 12)
-        ax.set_xlabel(None)
-
-        ax.set_title("Distribution of Glucose and \nCholesterol Levels", fontdict = fontdict_title)
-
-        handles = [
-            Patch(facecolor = "palegreen", label = "Normal", edgecolor = "black"),
-            Patch(facecolor = "orange", label = "Above normal", edgecolor = "black"),
-            Patch(facecolor = "orangered", label = "Well above normal", edgecolor = "black")
-        ]
-
-        ax.legend(handles = handles, title = None, edgecolor = "black", facecolor = 'white',framealpha=1, bbox_to_anchor = (0.75, 0.6))
-
-        # PIEPLOT Glucose Males and Females
-
-        pie_gluc_f = []
-        pie_gluc_m = []
-        pie_chol_f = []
-        pie_chol_m = []
-
-        for i in ["1", "2", "3"]:
-            pie_gluc_f.append(df[df['sex'] == "female"]["gluc"].value_counts(normalize = True)[i])
-            pie_gluc_m.append(df[df['sex'] == "male"]["gluc"].value_counts(normalize = True)[i])
-            pie_chol_f.append(df[df['sex'] == "female"]["cholesterol"].value_counts(normalize = True)[i])
-            pie_chol_m.append(df[df['sex'] == "male"]["cholesterol"].value_counts(normalize = True)[i])
-
-        ax = fig.add_subplot(spec[0,2])
-
-        ax.pie(
-            x = pie_gluc_f,  
-            colors = palette_gc, 
-            autopct = '%1.1f%%',
-            pctdistance = 1.3,
-            startangle = 90, 
-            wedgeprops = {'ec' : 'black'},
-            textprops = {'weight' : 'bold'}
-        )
+        figure_id = ("gluc-chol",) + figure_key
+        png = figure_cache.get(figure_id)
+        if png is None:
+            fig = plt.figure(figsize = (12, 12))
+            plt.subplots_adjust(hspace = 0.6, wspace = 0.5)
+            spec = gridspec.GridSpec(nrows = 4, ncols = 4)
+
+            # Barplots Chol and Gluc
+
+            df_gluc = df['gluc'].value_counts(normalize = True).reset_index(name = "glucose").rename(columns = {'index' : 'score'})
+            df_chol = df['cholesterol'].value_counts(normalize = True).reset_index().rename(columns = {'index' : 'score'})
+            df_gc_temp = df_gluc.merge(df_chol, how='inner', left_on='score', right_on='score')
+            df_gc = pd.melt(df_gc_temp, id_vars = "score", var_name = "parameter", value_name = "percentage")
+
+            palette_gc = ['palegreen', 'orange', 'orangered']
+
+            ax = fig.add_subplot(spec[0:2, 0:2])
+            sns.barplot(
+                x = 'parameter', 
+                y = 'percentage', 
+                hue = 'score', 
+                data = df_gc, 
+                ax = ax, 
+                edgecolor = "black", 
+                palette = palette_gc)
+
+            ax.set_ylim(0,1)    
+            ax.set_yticks(ticks = [x/100 for x in range(0,105,10)], labels = range(0,105,10))
+            ax.set_ylabel('Subjects (%)', fontdict = fontdict_labels)
+
+            ax.set_xticklabels([tick.get_text().capitalize() for tick in ax.get_xticklabels()], size = 12)
+            ax.set_xlabel(None)
+
+            ax.set_title("Distribution of Glucose and \nCholesterol Levels", fontdict = fontdict_title)
+
+            handles = [
+                Patch(facecolor = "palegreen", label = "Normal", edgecolor = "black"),
+                Patch(facecolor = "orange", label = "Above normal", edgecolor = "black"),
+                Patch(facecolor = "orangered", label = "Well above normal", edgecolor = "black")
+            ]
+
+            ax.legend(handles = handles, title = None, edgecolor = "black", facecolor = 'white',framealpha=1, bbox_to_anchor = (0.75, 0.6))
+
+            # PIEPLOT Glucose Males and Females
+
+            pie_gluc_f = []
+            pie_gluc_m = []
+            pie_chol_f = []
+            pie_chol_m = []
+
+            for i in ["1", "2", "3"]:
+                pie_gluc_f.append(df[df['sex'] == "female"]["gluc"].value_counts(normalize = True)[i])
+                pie_gluc_m.append(df[df['sex'] == "male"]["gluc"].value_counts(normalize = True)[i])
+                pie_chol_f.append(df[df['sex'] == "female"]["cholesterol"].value_counts(normalize = True)[i])
+                pie_chol_m.append(df[df['sex'] == "male"]["cholesterol"].value_counts(normalize = True)[i])
+
+            ax = fig.add_subplot(spec[0,2])
+
+            ax.pie(
+                x = pie_gluc_f,  
+                colors = palette_gc, 
+                autopct = '%1.1f%%',
+                pctdistance = 1.3,
+                startangle = 90, 
+                wedgeprops = {'ec' : 'black'},
+                textprops = {'weight' : 'bold'}
+            )
 
-        ax.text(1.8, 1.8, "Comparable Glucose Levels in Males and Females", fontdict = fontdict_title, ha = "center", va = "center")
-        ax.text(-1, 1, "Females", fontstyle = 'italic', fontweight = 'bold', fontsize = 12, ha = "center", va = "center")
+            ax.text(1.8, 1.8, "Comparable Glucose Levels in Males and Females", fontdict = fontdict_title, ha = "center", va = "center")
+            ax.text(-1, 1, "Females", fontstyle = 'italic', fontweight = 'bold', fontsize = 12, ha = "center", va = "center")
 
 
-        ax = fig.add_subplot(spec[0,3])
+            ax = fig.add_subplot(spec[0,3])
 
-        ax.pie(
-            x = pie_gluc_m, 
-            colors = palette_gc, 
-            autopct = '%1.1f%%', 
-            pctdistance = 1.3,
-            startangle = 90, 
-            wedgeprops = {'ec' : 'black'},
-            textprops = {'weight' : 'bold'}
-        )
-
-        ax.text(-1, 1, "Males", fontstyle = 'italic', fontweight = 'bold', fontsize = 12, ha = "center", va = "center")
+            ax.pie(
+                x = pie_gluc_m, 
+                colors = palette_gc, 
+                autopct = '%1.1f%%', 
+                pctdistance = 1.3,
+                startangle = 90, 
+                wedgeprops = {'ec' : 'black'},
+                textprops = {'weight' : 'bold'}
+            )
 
+            ax.text(-1, 1, "Males", fontstyle = 'italic', fontweight = 'bold', fontsize = 12, ha = "center", va = "center")
 
-        ax = fig.add_subplot(spec[1,2])
 
-        ax.pie(
-            x = pie_chol_f,  
-            colors = palette_gc, 
-            autopct = '%1.1f%%',
-            pctdistance = 1.4,
-            startangle = 90, 
-            wedgeprops = {'ec' : 'black'},
-            textprops = {'weight' : 'bold'}
-        )
-        ax.text(1.8, 1.8, "Fewer Females had Normal \nCholesterol Levels", fontdict = fontdict_title, ha = "center", va = "center")
-        ax.text(-1, 1, "Females", fontstyle = 'italic', fontweight = 'bold', fontsize = 12, ha = "center", va = "center")
+            ax = fig.add_subplot(spec[1,2])
 
+            ax.pie(
+                x = pie_chol_f,  
+                colors = palette_gc, 
+                autopct = '%1.1f%%',
+                pctdistance = 1.4,
+                startangle = 90, 
+                wedgeprops = {'ec' : 'black'},
+                textprops = {'weight' : 'bold'}
+            )
+            ax.text(1.8, 1.8, "Fewer Females had Normal \nCholesterol Levels", fontdict = fontdict_title, ha = "center", va = "center")
+            ax.text(-1, 1, "Females", fontstyle = 'italic', fontweight = 'bold', fontsize = 12, ha = "center", va = "center")
 
-        ax = fig.add_subplot(spec[1,3])
 
-        ax.pie(
-            x = pie_chol_m, 
-            colors = palette_gc, 
-            autopct = '%1.1f%%', 
-            pctdistance = 1.4,
-            startangle = 90, 
-            wedgeprops = {'ec' : 'black'},
-            textprops = {'weight' : 'bold'}
-        )
+            ax = fig.add_subplot(spec[1,3])
 
-        ax.text(-1, 1, "Males", fontstyle = 'italic', fontweight = 'bold', fontsize = 12, ha = "center", va = "center")
+            ax.pie(
+                x = pie_chol_m, 
+                colors = palette_gc, 
+                autopct = '%1.1f%%', 
+                pctdistance = 1.4,
+                startangle = 90, 
+                wedgeprops = {'ec' : 'black'},
+                textprops = {'weight' : 'bold'}
+            )
 
+            ax.text(-1, 1, "Males", fontstyle = 'italic', fontweight = 'bold', fontsize = 12, ha = "center", va = "center")
 
-        # CV prevalence and Gluc
 
-        ax = fig.add_subplot(spec[2:4, 0:2])
+            # CV prevalence and Gluc
 
-        df_gluc = df.groupby('gluc')['cardio'].value_counts(normalize = True).unstack().reset_index()
-        df_gluc = df_gluc.rename(columns = {"gluc" : "glucose", "0" : "cardio_0", "1" : "cardio_1"})
+            ax = fig.add_subplot(spec[2:4, 0:2])
 
-        sns.lineplot(
-            x = "glucose", 
-            y = "cardio_1", 
-            data = df_gluc,
-            color = "darkcyan", 
-            ax = ax, 
-            linewidth = 3,
-            marker = "o",
-            markeredgecolor = 'black'
-        )
+            df_gluc = df.groupby('gluc')['cardio'].value_counts(normalize = True).unstack().reset_index()
+            df_gluc = df_gluc.rename(columns = {"gluc" : "glucose", "0" : "cardio_0", "1" : "cardio_1"})
 
-        for i in [1, 2, 3]:
-            prevalence = df_gluc[df_gluc['glucose'] == str(i)]["cardio_1"].values[0]
-            ax.text(i-1, prevalence + 0.04, f'{prevalence:.1%}', fontweight = 'bold', ha = "right")
+            sns.lineplot(
+                x = "glucose", 
+                y = "cardio_1", 
+                data = df_gluc,
+                color = "darkcyan", 
+                ax = ax, 
+                linewidth = 3,
+                marker = "o",
+                markeredgecolor = 'black'
+            )
 
-        ax.set_ylim(0,1)
-        ax.set_yticks(ticks = [x/10 for x in range(0, 11, 1)], labels = range(0,110,10))
-        ax.set_ylabel('CVD Prevalence (%)', fontdict = fontdict_labels)
+            for i in [1, 2, 3]:
+                prevalence = df_gluc[df_gluc['glucose'] == str(i)]["cardio_1"].values[0]
+                ax.text(i-1, prevalence + 0.04, f'{prevalence:.1%}', fontweight = 'bold', ha = "right")
 
-        ax.set_xlim(-0.5, 2.3)
-        ax.set_xticks(ax.get_xticks(), ['Normal', 'Above normal', 'Well above \nnormal'], size = 12)
-        ax.set_xlabel("Glucose Level", fontdict = fontdict_labels)
+            ax.set_ylim(0,1)
+            ax.set_yticks(ticks = [x/10 for x in range(0, 11, 1)], labels = range(0,110,10))
+            ax.set_ylabel('CVD Prevalence (%)', fontdict = fontdict_labels)
 
-        ax.set_title('Cardiovascular Diseases Prevalence \nIncreases with Glucose Levels', fontdict = fontdict_title)
+            ax.set_xlim(-0.5, 2.3)
+            ax.set_xticks(ax.get_xticks(), ['Normal', 'Above normal', 'Well above \nnormal'], size = 12)
+            ax.set_xlabel("Glucose Level", fontdict = fontdict_labels)
 
-        # CV prevalence and Chol
+            ax.set_title('Cardiovascular Diseases Prevalence \nIncreases with Glucose Levels', fontdict = fontdict_title)
 
-        ax = fig.add_subplot(spec[2:4, 2:4])
+            # CV prevalence and Chol
 
-        df_chol = df.groupby('cholesterol')['cardio'].value_counts(normalize = True).unstack().reset_index()
-        df_chol = df_chol.rename(columns = {"0" : "cardio_0", "1" : "cardio_1"})
+            ax = fig.add_subplot(spec[2:4, 2:4])
 
-        sns.lineplot(
-            x = "cholesterol", 
-            y = "cardio_1", 
-            data = df_chol, 
-            color = "gold",
-            linewidth = 3,
-            marker = "o",
-            ax = ax, 
-            markeredgecolor = 'black'
-        )
+            df_chol = df.groupby('cholesterol')['cardio'].value_counts(normalize = True).unstack().reset_index()
+            df_chol = df_chol.rename(columns = {"0" : "cardio_0", "1" : "cardio_1"})
 
-        for i in [1, 2, 3]:
-            prevalence = df_chol[df_chol['cholesterol'] == str(i)]["cardio_1"].values[0]
-            ax.text(i-1, prevalence + 0.04, f'{prevalence:.1%}', fontweight = 'bold', ha = "right")
+            sns.lineplot(
+                x = "cholesterol", 
+                y = "cardio_1", 
+                data = df_chol, 
+                color = "gold",
+                linewidth = 3,
+                marker = "o",
+                ax = ax, 
+                markeredgecolor = 'black'
+            )
 
-        ax.set_ylim(0,1)
-        ax.set_yticks(ticks = [x/10 for x in range(0, 11, 1)], labels = range(0,110,10))
-        ax.set_ylabel('CVD Prevalence (%)', fontdict = fontdict_labels)
+            for i in [1, 2, 3]:
+                prevalence = df_chol[df_chol['cholesterol'] == str(i)]["cardio_1"].values[0]
+                ax.text(i-1, prevalence + 0.04, f'{prevalence:.1%}', fontweight = 'bold', ha = "right")
 
-        ax.set_xlim(-0.5, 2.3)
-        ax.set_xticks(ax.get_xticks(), ['Normal', 'Above normal', 'Well above \nnormal'], size = 12)
-        ax.set_xlabel("Cholesterol Level", fontdict = fontdict_labels)
+            ax.set_ylim(0,1)
+            ax.set_yticks(ticks = [x/10 for x in range(0, 11, 1)], labels = range(0,110,10))
+            ax.set_ylabel('CVD Prevalence (%)', fontdict = fontdict_labels)
 
-        ax.set_title('Cardiovascular Diseases Prevalence \nIncreases with Cholesterol Levels', fontdict = fontdict_title)
+            ax.set_xlim(-0.5, 2.3)
+            ax.set_xticks(ax.get_xticks(), ['Normal', 'Above normal', 'Well above \nnormal'], size = 12)
+            ax.set_xlabel("Cholesterol Level", fontdict = fontdict_labels)
 
-        st.pyplot(fig)
+            ax.set_title('Cardiovascular Diseases Prevalence \nIncreases with Cholesterol Levels', fontdict = fontdict_title)
+            png = figure_cache.render(figure_id, fig)
+        st.image(png, use_column_width = True)
 
         # Table: Chol & Gluc
 
@@ -1490,21 +1586,24 @@ def data_viz():
         df_percentage = df.groupby(['cholesterol', 'gluc', 'cardio']).size().reset_index(name='count')
         df_percentage['percentage'] = df_percentage.groupby(['cholesterol', 'gluc'])['count'].apply(lambda x: x / x.sum() * 100)
 
-        g = sns.FacetGrid(df_percentage, col="gluc", row="cholesterol", margin_titles=True, row_order = ["3","2","1"])
-        g.map_dataframe(sns.barplot, x="cardio", y="percentage", palette= palette_cardio, edgecolor = 'black')
+        figure_id = ("gluc-chol-grid",) + figure_key
+        png = figure_cache.get(figure_id)
+        if png is None:
+            g = sns.FacetGrid(df_percentage, col="gluc", row="cholesterol", margin_titles=True, row_order = ["3","2","1"])
+            g.map_dataframe(sns.barplot, x="cardio", y="percentage", palette= palette_cardio, edgecolor = 'black')
 
-        for ax in g.axes.flat:
-            
-            ax.set_ylim(0, 100)
-            ax.set_yticks(ticks = range(0,110,10), labels = range(0,110,10))
+            for ax in g.axes.flat:
 
-            
-            bar_y = [bar.get_height() for bar in ax.patches]
-            
-            ax.text(0, bar_y[0]+5, f"{bar_y[0]:.1f}", ha = "center", fontsize=10, fontweight='bold')
-            ax.text(1, bar_y[1]+5, f"{bar_y[1]:.1f}", ha = "center", fontsize=10, fontweight='bold')
+                ax.set_ylim(0, 100)
+                ax.set_yticks(ticks = range(0,110,10), labels = range(0,110,10))
 
-        st.pyplot(g)
+
+                bar_y = [bar.get_height() for bar in ax.patches]
+
+                ax.text(0, bar_y[0]+5, f"{bar_y[0]:.1f}", ha = "center", fontsize=10, fontweight='bold')
+                ax.text(1, bar_y[1]+5, f"{bar_y[1]:.1f}", ha = "center", fontsize=10, fontweight='bold')
+            png = figure_cache.render(figure_id, g.figure)
+        st.image(png, use_column_width = True)
 
         pval_chi2_gc = chi2_var(df, gluc, cholesterol)
         pval_chi2_gluc = chi2_cardio(df, gluc)
@@ -1670,211 +1769,215 @@ def data_viz():
 
         ##### FIGURE #####
 
-        fig = plt.figure(figsize = (12, 15))
-        spec = gridspec.GridSpec(nrows = 3, ncols = 2)
-        plt.subplots_adjust(hspace = 0.3)
+        df_lifestyle = (df.groupby('lifestyle')['cardio'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "cardio_0", "1" : "cardio_1"})
+        df_sex_active = (df.groupby('sex')['active'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "active_0", "1" : "active_1"})
+        df_sex_smoke = (df.groupby('sex')['smoke'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "smoke_0", "1" : "smoke_1"})
+        df_sex_alco = (df.groupby('sex')['alco'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "alco_0", "1" : "alco_1"})
+        df_sex_healthy = (df.groupby('sex')['healthy_ls'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "healthy_0", "1" : "healthy_1"})
+        df_sex_ls = df_sex_active.merge(df_sex_smoke, on = "sex", how = "inner").merge(df_sex_alco, on = "sex", how = "inner").merge(df_sex_healthy, on = "sex", how = "inner")
+        df_sex_ls = pd.melt(df_sex_ls.drop(['active_0', 'smoke_0', 'alco_0', 'healthy_0'], axis = 1), id_vars = "sex", var_name = "parameter", value_name = "percentage")
 
-        # boxplot Tobbaco
+        figure_id = ("lifestyle",) + figure_key
+        png = figure_cache.get(figure_id)
+        if png is None:
+            fig = plt.figure(figsize = (12, 15))
+            spec = gridspec.GridSpec(nrows = 3, ncols = 2)
+            plt.subplots_adjust(hspace = 0.3)
 
-        df_smoke = pd.melt(
-            df[['ap_hi', 'ap_lo', 'ap_m', 'smoke', 'cardio']], 
-            id_vars = ['smoke', 'cardio'], 
-            var_name = 'Pressure_type', 
-            value_name = 'Pressure_value'
-        )
+            # boxplot Tobbaco
 
-        ax = fig.add_subplot(spec[0,0])
-        sns.boxplot(
-            x = 'Pressure_type', 
-            y = 'Pressure_value', 
-            hue = 'smoke', 
-            data = df_smoke, 
-            width = 0.5, 
-            palette = ['cyan', 'gray'],
-            medianprops = {'color' : 'black'}, 
-            boxprops = {'edgecolor' : 'black'},
-            capprops = {'color' : 'black'},
-            whiskerprops = {'color' : 'black'},
-            flierprops = {'color' : 'black'},
-            ax = ax
-        )
+            df_smoke = pd.melt(
+                df[['ap_hi', 'ap_lo', 'ap_m', 'smoke', 'cardio']], 
+                id_vars = ['smoke', 'cardio'], 
+                var_name = 'Pressure_type', 
+                value_name = 'Pressure_value'
+            )
 
-        median_sys_smoke_0 = np.median(df[df['smoke'] == "0"]["ap_hi"])
-        median_sys_smoke_1 = np.median(df[df['smoke'] == "1"]["ap_hi"])
+            ax = fig.add_subplot(spec[0,0])
+            sns.boxplot(
+                x = 'Pressure_type', 
+                y = 'Pressure_value', 
+                hue = 'smoke', 
+                data = df_smoke, 
+                width = 0.5, 
+                palette = ['cyan', 'gray'],
+                medianprops = {'color' : 'black'}, 
+                boxprops = {'edgecolor' : 'black'},
+                capprops = {'color' : 'black'},
+                whiskerprops = {'color' : 'black'},
+                flierprops = {'color' : 'black'},
+                ax = ax
+            )
 
-        ax.text(-0.47, median_sys_smoke_0, f"{median_sys_smoke_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
-        ax.text(0.47, median_sys_smoke_1, f"{median_sys_smoke_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
+            median_sys_smoke_0 = np.median(df[df['smoke'] == "0"]["ap_hi"])
+            median_sys_smoke_1 = np.median(df[df['smoke'] == "1"]["ap_hi"])
 
-        median_dia_smoke_0 = np.median(df[df['smoke'] == "0"]["ap_lo"])
-        median_dia_smoke_1 = np.median(df[df['smoke'] == "1"]["ap_lo"])
+            ax.text(-0.47, median_sys_smoke_0, f"{median_sys_smoke_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
+            ax.text(0.47, median_sys_smoke_1, f"{median_sys_smoke_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
 
-        ax.text(1-0.43, median_dia_smoke_0, f"{median_dia_smoke_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
-        ax.text(1+0.43, median_dia_smoke_1, f"{median_dia_smoke_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
+            median_dia_smoke_0 = np.median(df[df['smoke'] == "0"]["ap_lo"])
+            median_dia_smoke_1 = np.median(df[df['smoke'] == "1"]["ap_lo"])
 
-        median_m_smoke_0 = np.median(df[df['smoke'] == "0"]["ap_m"])
-        median_m_smoke_1 = np.median(df[df['smoke'] == "1"]["ap_m"])
+            ax.text(1-0.43, median_dia_smoke_0, f"{median_dia_smoke_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
+            ax.text(1+0.43, median_dia_smoke_1, f"{median_dia_smoke_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
 
-        ax.text(2-0.43, median_m_smoke_0, f"{median_m_smoke_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
-        ax.text(2+0.43, median_m_smoke_1, f"{median_m_smoke_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
+            median_m_smoke_0 = np.median(df[df['smoke'] == "0"]["ap_m"])
+            median_m_smoke_1 = np.median(df[df['smoke'] == "1"]["ap_m"])
 
+            ax.text(2-0.43, median_m_smoke_0, f"{median_m_smoke_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
+            ax.text(2+0.43, median_m_smoke_1, f"{median_m_smoke_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
 
 
-        ax.set_ylim(0,250)
-        ax.set_yticks(ticks = range(0, 275, 25))
-        ax.set_ylabel("Blood Pressure (mmHg)", fontdict = fontdict_labels)
 
-        ax.set_xticks(ticks = ax.get_xticks(), labels = ['Systolic', 'Diastolic', 'Mean'])
-        ax.set_xlabel('Blood Pressure Type', fontdict = fontdict_labels)
+            ax.set_ylim(0,250)
+            ax.set_yticks(ticks = range(0, 275, 25))
+            ax.set_ylabel("Blood Pressure (mmHg)", fontdict = fontdict_labels)
 
-        ax.set_title('Blood Pressure was not Higher \nin Smokers', fontdict = fontdict_title)
+            ax.set_xticks(ticks = ax.get_xticks(), labels = ['Systolic', 'Diastolic', 'Mean'])
+            ax.set_xlabel('Blood Pressure Type', fontdict = fontdict_labels)
 
-        handles = [
-            Patch(facecolor = 'cyan', edgecolor = 'black', label = 'Non-smoker'),
-            Patch(facecolor = 'gray', edgecolor = 'black', label = 'Smoker'),
-        ]
+            ax.set_title('Blood Pressure was not Higher \nin Smokers', fontdict = fontdict_title)
 
-        ax.legend(handles = handles, title = None, edgecolor = 'black')
+            handles = [
+                Patch(facecolor = 'cyan', edgecolor = 'black', label = 'Non-smoker'),
+                Patch(facecolor = 'gray', edgecolor = 'black', label = 'Smoker'),
+            ]
 
-        # boxplot Active
+            ax.legend(handles = handles, title = None, edgecolor = 'black')
 
-        df_active = pd.melt(
-            df[['ap_hi', 'ap_lo', 'ap_m', 'active', 'cardio']], 
-            id_vars = ['active', 'cardio'], 
-            var_name = 'Pressure_type', 
-            value_name = 'Pressure_value'
-        )
+            # boxplot Active
 
-        ax = fig.add_subplot(spec[0,1])
-        sns.boxplot(
-            x = 'Pressure_type', 
-            y = 'Pressure_value', 
-            hue = 'active', 
-            data = df_active, 
-            width = 0.5, 
-            palette = ['gray', 'chartreuse'],
-            medianprops = {'color' : 'black'}, 
-            boxprops = {'edgecolor' : 'black'},
-            capprops = {'color' : 'black'},
-            whiskerprops = {'color' : 'black'},
-            flierprops = {'color' : 'black'},
-            ax = ax
-        )
+            df_active = pd.melt(
+                df[['ap_hi', 'ap_lo', 'ap_m', 'active', 'cardio']], 
+                id_vars = ['active', 'cardio'], 
+                var_name = 'Pressure_type', 
+                value_name = 'Pressure_value'
+            )
 
-        median_sys_active_0 = np.median(df[df['active'] == "0"]["ap_hi"])
-        median_sys_active_1 = np.median(df[df['active'] == "1"]["ap_hi"])
+            ax = fig.add_subplot(spec[0,1])
+            sns.boxplot(
+                x = 'Pressure_type', 
+                y = 'Pressure_value', 
+                hue = 'active', 
+                data = df_active, 
+                width = 0.5, 
+                palette = ['gray', 'chartreuse'],
+                medianprops = {'color' : 'black'}, 
+                boxprops = {'edgecolor' : 'black'},
+                capprops = {'color' : 'black'},
+                whiskerprops = {'color' : 'black'},
+                flierprops = {'color' : 'black'},
+                ax = ax
+            )
 
-        ax.text(-0.47, median_sys_active_0, f"{median_sys_active_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
-        ax.text(0.47, median_sys_active_1, f"{median_sys_active_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
+            median_sys_active_0 = np.median(df[df['active'] == "0"]["ap_hi"])
+            median_sys_active_1 = np.median(df[df['active'] == "1"]["ap_hi"])
 
-        median_dia_active_0 = np.median(df[df['active'] == "0"]["ap_lo"])
-        median_dia_active_1 = np.median(df[df['active'] == "1"]["ap_lo"])
+            ax.text(-0.47, median_sys_active_0, f"{median_sys_active_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
+            ax.text(0.47, median_sys_active_1, f"{median_sys_active_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
 
-        ax.text(1-0.43, median_dia_active_0, f"{median_dia_active_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
-        ax.text(1+0.43, median_dia_active_1, f"{median_dia_active_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
+            median_dia_active_0 = np.median(df[df['active'] == "0"]["ap_lo"])
+            median_dia_active_1 = np.median(df[df['active'] == "1"]["ap_lo"])
 
-        median_m_active_0 = np.median(df[df['active'] == "0"]["ap_m"])
-        median_m_active_1 = np.median(df[df['active'] == "1"]["ap_m"])
+            ax.text(1-0.43, median_dia_active_0, f"{median_dia_active_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
+            ax.text(1+0.43, median_dia_active_1, f"{median_dia_active_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
 
-        ax.text(2-0.43, median_m_active_0, f"{median_m_active_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
-        ax.text(2+0.43, median_m_active_1, f"{median_m_active_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
+            median_m_active_0 = np.median(df[df['active'] == "0"]["ap_m"])
+            median_m_active_1 = np.median(df[df['active'] == "1"]["ap_m"])
 
-        ax.set_ylim(0,250)
-        ax.set_yticks(ticks = range(0, 275, 25))
-        ax.set_ylabel("Blood Pressure (mmHg)", fontdict = fontdict_labels)
+            ax.text(2-0.43, median_m_active_0, f"{median_m_active_0:.0f}", fontweight = 'bold', ha = 'left', va = "center")
+            ax.text(2+0.43, median_m_active_1, f"{median_m_active_1:.0f}", fontweight = 'bold', ha = 'right', va = "center")
 
-        ax.set_xticks(ticks = ax.get_xticks(), labels = ['Systolic', 'Diastolic', 'Mean'])
-        ax.set_xlabel('Blood Pressure Type', fontdict = fontdict_labels)
+            ax.set_ylim(0,250)
+            ax.set_yticks(ticks = range(0, 275, 25))
+            ax.set_ylabel("Blood Pressure (mmHg)", fontdict = fontdict_labels)
 
-        ax.set_title('Physical Activity did not Influence \n Blood Pressure', fontdict = fontdict_title)
+            ax.set_xticks(ticks = ax.get_xticks(), labels = ['Systolic', 'Diastolic', 'Mean'])
+            ax.set_xlabel('Blood Pressure Type', fontdict = fontdict_labels)
 
-        handles = [
-            Patch(facecolor = 'gray', edgecolor = 'black', label = 'Not active'),
-            Patch(facecolor = 'chartreuse', edgecolor = 'black', label = 'Active'),
-            Text("120", color='black', ha='center', va='center', fontweight='bold')
-        ]
+            ax.set_title('Physical Activity did not Influence \n Blood Pressure', fontdict = fontdict_title)
 
-        ax.legend(handles = handles, title = None, edgecolor = 'black')
+            handles = [
+                Patch(facecolor = 'gray', edgecolor = 'black', label = 'Not active'),
+                Patch(facecolor = 'chartreuse', edgecolor = 'black', label = 'Active'),
+                Text("120", color='black', ha='center', va='center', fontweight='bold')
+            ]
 
-        # Lifestyle barplot
+            ax.legend(handles = handles, title = None, edgecolor = 'black')
 
-        ax = fig.add_subplot(spec[1,:])
+            # Lifestyle barplot
 
+            ax = fig.add_subplot(spec[1,:])
 
-        df_lifestyle = (df.groupby('lifestyle')['cardio'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "cardio_0", "1" : "cardio_1"})
-        sns.barplot(
-            x = "lifestyle",
-            y = "cardio_1", 
-            data = df_lifestyle, 
-            edgecolor = "black", 
-            ax = ax,
-            palette = ["cornsilk", "yellow", "salmon", "lightskyblue", "orangered", "greenyellow", "blueviolet", "darkslategray"]
-        )
-        ax.axhline(y = 50, linestyle = "dashed", color = "black")
 
+            sns.barplot(
+                x = "lifestyle",
+                y = "cardio_1", 
+                data = df_lifestyle, 
+                edgecolor = "black", 
+                ax = ax,
+                palette = ["cornsilk", "yellow", "salmon", "lightskyblue", "orangered", "greenyellow", "blueviolet", "darkslategray"]
+            )
+            ax.axhline(y = 50, linestyle = "dashed", color = "black")
 
 
-        ax.set_ylim(0,100)
-        ax.set_yticks(range(0,110,10))
-        ax.set_ylabel("Prevalence (%)", fontdict = fontdict_labels)
 
-        ax.set_xticks(ticks = ax.get_xticks(),
-                    labels = [
-            "Non-smoker\nNo alcohol\nActive",
-            "Smoker",
-            "Alcohol",
-            "Not Active",
-            "Smoker\nAlcohol",
-            "Smoker\nNot active",
-            "Alcohol\nNot active",
-            "Smoker\nAlcohol\nNot active"    
-        ], 
-                    size = 12)
+            ax.set_ylim(0,100)
+            ax.set_yticks(range(0,110,10))
+            ax.set_ylabel("Prevalence (%)", fontdict = fontdict_labels)
 
-        ax.set_xlabel(None)
+            ax.set_xticks(ticks = ax.get_xticks(),
+                        labels = [
+                "Non-smoker\nNo alcohol\nActive",
+                "Smoker",
+                "Alcohol",
+                "Not Active",
+                "Smoker\nAlcohol",
+                "Smoker\nNot active",
+                "Alcohol\nNot active",
+                "Smoker\nAlcohol\nNot active"    
+            ], 
+                        size = 12)
 
-        ax.set_title("No Strong Influence of Lifestyle was found on Cardiovascular Diseases Prevalence", fontdict = fontdict_title)
+            ax.set_xlabel(None)
 
-        # barplot sex ratio lifestyle
+            ax.set_title("No Strong Influence of Lifestyle was found on Cardiovascular Diseases Prevalence", fontdict = fontdict_title)
 
-        ax = fig.add_subplot(spec[2, :])
+            # barplot sex ratio lifestyle
 
-        df_sex_active = (df.groupby('sex')['active'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "active_0", "1" : "active_1"})
-        df_sex_smoke = (df.groupby('sex')['smoke'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "smoke_0", "1" : "smoke_1"})
-        df_sex_alco = (df.groupby('sex')['alco'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "alco_0", "1" : "alco_1"})
-        df_sex_healthy = (df.groupby('sex')['healthy_ls'].value_counts(normalize = True)*100).sort_index().unstack().reset_index().rename(columns = {"0": "healthy_0", "1" : "healthy_1"})
-        df_sex_ls = df_sex_active.merge(df_sex_smoke, on = "sex", how = "inner").merge(df_sex_alco, on = "sex", how = "inner").merge(df_sex_healthy, on = "sex", how = "inner")
-        df_sex_ls = pd.melt(df_sex_ls.drop(['active_0', 'smoke_0', 'alco_0', 'healthy_0'], axis = 1), id_vars = "sex", var_name = "parameter", value_name = "percentage")
+            ax = fig.add_subplot(spec[2, :])
 
-        sns.barplot(
-            x = "parameter",
-            y = "percentage",
-            hue = "sex", 
-            data = df_sex_ls,
-            palette = palette_sex, 
-            ax = ax,
-            edgecolor = 'black',
-            order = ['smoke_1', 'alco_1', 'active_1', 'healthy_1']
-        )
 
-        for container in ax.containers:
-            for bar in container:
-                y = bar.get_height()
-                x = bar.get_x()
-                ax.text(x + 0.2, y + 5, f'{y:.1f}%', fontweight='bold', fontsize = 12, ha = "center")
+            sns.barplot(
+                x = "parameter",
+                y = "percentage",
+                hue = "sex", 
+                data = df_sex_ls,
+                palette = palette_sex, 
+                ax = ax,
+                edgecolor = 'black',
+                order = ['smoke_1', 'alco_1', 'active_1', 'healthy_1']
+            )
 
+            for container in ax.containers:
+                for bar in container:
+                    y = bar.get_height()
+                    x = bar.get_x()
+                    ax.text(x + 0.2, y + 5, f'{y:.1f}%', fontweight='bold', fontsize = 12, ha = "center")
 
-        ax.set_ylim(0,100)
-        ax.set_yticks(ticks = range(0,110,10), labels = range(0,110,10))
-        ax.set_ylabel('Percentage (%)', fontdict = fontdict_labels)
 
-        ax.set_xticks(ticks = ax.get_xticks(), labels = ['Smoker', 'Alcohol', 'Active','Healthy\nlifestyle'], size = 12)
-        ax.set_xlabel(None)
+            ax.set_ylim(0,100)
+            ax.set_yticks(ticks = range(0,110,10), labels = range(0,110,10))
+            ax.set_ylabel('Percentage (%)', fontdict = fontdict_labels)
 
-        ax.set_title("Females were less Likely to Smoke and Drink Alcohol", fontdict = fontdict_title)
+            ax.set_xticks(ticks = ax.get_xticks(), labels = ['Smoker', 'Alcohol', 'Active','Healthy\nlifestyle'], size = 12)
+            ax.set_xlabel(None)
 
-        ax.legend(title = None, edgecolor = 'black')
+            ax.set_title("Females were less Likely to Smoke and Drink Alcohol", fontdict = fontdict_title)
 
-        st.pyplot(fig)
+            ax.legend(title = None, edgecolor = 'black')
+            png = figure_cache.render(figure_id, fig)
+        st.image(png, use_column_width = True)
 
         st.write(f"""
         <div class = 'all'>
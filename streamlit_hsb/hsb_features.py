@@ -0,0 +1,102 @@
+"""
+Vectorized derivation of the features added to the raw dataset, mirroring app_hsb/features.py.
+
+Every function takes array-likes (or DataFrame columns) and returns a NumPy array computed in a single pass,
+instead of a Python function applied row by row.
+"""
+import numpy as np
+
+AGE_GROUPS = ["< 45", "[45 - 49]", "[50 - 54]", "[55 - 59]", "[60 - 65]"]
+
+# Lifestyle code for each combination of smoker (1), alcohol (2) and not active (4) flags:
+# 0 = non-smoker, no alcohol, active, 1 = smoker, 2 = alcohol, 3 = not active, 4 = smoker & alcohol,
+# 5 = smoker & not active, 6 = alcohol & not active, 7 = smoker & alcohol & not active
+LIFESTYLE_CODES = np.array([0, 1, 2, 4, 3, 5, 6, 7])
+
+def bmi(weight, height):
+    """
+    Body-mass index (kg/m²) from weight (kg) and height (cm), rounded to 1 decimal.
+    """
+    height_in_meters = np.asarray(height, dtype = np.float64) / 100
+    return np.round(np.asarray(weight, dtype = np.float64) / height_in_meters ** 2, 1)
+
+def ap_m(ap_hi, ap_lo):
+    """
+    Mean arterial pressure (mmHg) from systolic and diastolic blood pressure, rounded to 1 decimal.
+    """
+    return np.round((np.asarray(ap_hi, dtype = np.float64) + 2 * np.asarray(ap_lo, dtype = np.float64)) / 3, 1)
+
+def ap_aha(ap_hi, ap_lo):
+    """
+    Blood pressure category of the American Heart Association: 1 = normal, 2 = elevated,
+    3 = hypertension stage I, 4 = hypertension stage II.
+    """
+    ap_hi = np.asarray(ap_hi)
+    ap_lo = np.asarray(ap_lo)
+    return np.select([(ap_hi >= 140) | (ap_lo >= 90), (ap_hi >= 130) | (ap_lo >= 80), ap_hi >= 120], [4, 3, 2], 1)
+
+def lifestyle(smoke, alco, active):
+    """
+    Lifestyle code (see LIFESTYLE_CODES) from the smoke, alco and active flags.
+    """
+    flags = np.asarray(smoke, dtype = np.int64) + 2 * np.asarray(alco, dtype = np.int64) + 4 * (1 - np.asarray(active, dtype = np.int64))
+    return LIFESTYLE_CODES[flags]
+
+def healthy_ls(lifestyle_codes):
+    """
+    1 for non-smokers who do not drink alcohol and are physically active, 0 otherwise.
+    """
+    return (np.asarray(lifestyle_codes) == 0).astype(np.int64)
+
+def age_group(age):
+    """
+    Age group label of each subject (see AGE_GROUPS).
+    """
+    codes = np.digitize(np.asarray(age, dtype = np.float64), [45, 50, 55, 60])
+    return np.array(AGE_GROUPS, dtype = object)[codes]
+
+def age_5(age):
+    """
+    Lower bound of the 5-year age bin of each subject, from 40 (under 45) to 65 (65 and over).
+    """
+    return 40 + 5 * np.digitize(np.asarray(age, dtype = np.float64), [45, 50, 55, 60, 65])
+
+def round_bmi(bmi_values):
+    """
+    BMI rounded to the unit, with values under 18 grouped at 15 and values over 40 grouped at 45.
+    """
+    rounded = np.round(np.asarray(bmi_values, dtype = np.float64))
+    return np.select([rounded > 40, rounded < 18], [45, 15], rounded)
+
+def out_wh(weight, height, w_lo, w_hi, h_lo, h_hi):
+    """
+    Position of each subject relative to the weight and height intervals [w_lo, w_hi] and [h_lo, h_hi]:
+    'hi_wh', 'hi_w', 'hi_h', 'lo_wh', 'lo_w', 'lo_h' or 'normal'.
+    """
+    weight = np.asarray(weight)
+    height = np.asarray(height)
+    conditions = [
+        (weight > w_hi) & (height > h_hi),
+        weight > w_hi,
+        height > h_hi,
+        (weight < w_lo) & (height < h_lo),
+        weight < w_lo,
+        height < h_lo,
+    ]
+    return np.select(conditions, ["hi_wh", "hi_w", "hi_h", "lo_wh", "lo_w", "lo_h"], "normal").astype(object)
+
+def add_features(df):
+    """
+    Adds the derived columns bmi, ap_m, ap_aha, lifestyle and healthy_ls to a dataset with the raw columns
+    height, weight, ap_hi, ap_lo, smoke, alco and active.
+
+    Returns:
+        pd.DataFrame: The same DataFrame, with the derived columns added.
+    """
+    df['bmi'] = bmi(df['weight'], df['height'])
+    df['ap_m'] = ap_m(df['ap_hi'], df['ap_lo'])
+    df['ap_aha'] = ap_aha(df['ap_hi'], df['ap_lo'])
+    df['lifestyle'] = lifestyle(df['smoke'], df['alco'], df['active'])
+    df['healthy_ls'] = healthy_ls(df['lifestyle'])
+    return df
+
@@ -1,10 +1,268 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
 import numpy as np
-from scipy.stats import shapiro, mannwhitneyu, chi2_contingency, spearmanr
+from scipy.stats import shapiro, normaltest, mannwhitneyu, chi2_contingency, spearmanr, norm
 import pandas as pd
 
 
+def raw_summary(df_raw):
+    """
+    Extracts the numbers of the raw dataset shown in the visualization pages, so that the raw frame does not need to be kept.
+
+    Parameters:
+    - df_raw (pd.DataFrame): The raw dataset, with age in days.
+
+    Returns:
+    dict: Row and column counts, minimal age (years) and number of subjects under 32 years.
+    """
+    return {
+        "rows": df_raw.shape[0],
+        "columns": df_raw.shape[1],
+        "min_age": np.min(df_raw['age']) / 365.25,
+        "under_32": len(df_raw[df_raw['age'] / 365.25 < 32]),
+    }
+
+def compact_frame(df):
+    """
+    Downcasts the numeric columns of a DataFrame to their narrowest type (floats to float32, which can change
+    the last digits of computed statistics). Categorical columns already store their values as int8 codes.
+
+    Parameters:
+    - df (pd.DataFrame): The DataFrame to compact, modified in place.
+
+    Returns:
+    pd.DataFrame: The same DataFrame.
+    """
+    for column in df.select_dtypes('integer').columns:
+        df[column] = pd.to_numeric(df[column], downcast = 'integer')
+    for column in df.select_dtypes('float').columns:
+        df[column] = pd.to_numeric(df[column], downcast = 'float')
+    return df
+
+def memory_mb(df):
+    return df.memory_usage(deep = True).sum() / 1e6
+
+class GroupedStats:
+    """
+    Statistics of the columns of a dataset, overall ("all") and in each 'cardio' group ("0" and "1").
+
+    The mean, standard deviation, minimum and maximum of every numerical column are computed in one grouped pass,
+    and the frequencies of a categorical column are counted for all groups at once, instead of filtering
+    the dataset for each call. Mann-Whitney tests between the groups rank each column once (see mann_whitney).
+    Results are kept for the following calls, so the dataset should not be modified.
+    """
+    def __init__(self, df):
+        # Weak reference, so that the statistics kept by grouped_stats do not keep the dataset alive
+        self.dataset = weakref.ref(df)
+        self.groups = df['cardio'].astype('category')
+        self.numerical = None
+        self.frequencies = {}
+        self.tests = {}
+
+    def describe(self, column, group = "all"):
+        """
+        Returns:
+        tuple: Mean, standard deviation (ddof = 0), minimum and maximum of the column in the group.
+        """
+        if self.numerical is None or column not in self.numerical["mean"].columns:
+            df = self.dataset()
+            columns = df.select_dtypes('number').columns
+            grouped = df[columns].groupby(self.groups, observed = True)
+            self.numerical = {}
+            for stat, overall, per_group in [
+                ("mean", df[columns].mean(), grouped.mean()),
+                ("sd", df[columns].std(ddof = 0), grouped.std(ddof = 0)),
+                ("min", df[columns].min(), grouped.min()),
+                ("max", df[columns].max(), grouped.max()),
+            ]:
+                per_group.index = per_group.index.astype(str)
+                per_group.loc["all"] = overall
+                self.numerical[stat] = per_group
+        return tuple(self.numerical[stat].at[group, column] for stat in ("mean", "sd", "min", "max"))
+
+    def shares(self, column, group = "all"):
+        """
+        Returns:
+        pd.Series: Normalized counts of the modalities of the column in the group, from the most to the least frequent
+        (as value_counts(normalize = True)).
+        """
+        if column not in self.frequencies:
+            values = self.dataset()[column].astype('category')
+            codes = values.cat.codes.to_numpy()
+            group_codes = self.groups.cat.codes.to_numpy()
+            n_modalities = len(values.cat.categories)
+            valid = (codes >= 0) & (group_codes >= 0)
+            counts = np.bincount(group_codes[valid] * n_modalities + codes[valid],
+                                 minlength = len(self.groups.cat.categories) * n_modalities).reshape(-1, n_modalities)
+            table = pd.DataFrame(counts, index = self.groups.cat.categories.astype(str), columns = values.cat.categories)
+            table.loc["all"] = counts.sum(axis = 0)
+            self.frequencies[column] = table.div(table.sum(axis = 1), axis = 0)
+        return self.frequencies[column].loc[group].sort_values(ascending = False, kind = 'stable')
+
+    def mann_whitney(self, column, by = None):
+        """
+        Mann-Whitney U tests of a numerical column between the 'cardio' groups "0" and "1", in all subjects,
+        or within each modality of the column 'by' (e.g. 'sex').
+
+        The column is ranked once for all the tests (within each modality of 'by'), and the U statistics and p-values
+        are computed for all modalities at once. p-values are two-sided and asymptotic, with the tie and continuity
+        corrections of mannwhitneyu, which is still used for groups of 8 subjects or less (exact test).
+        Both are NaN for a modality where a group is empty.
+
+        Returns:
+        pd.DataFrame: U statistic of the group "0" ('u') and p-value ('pval'), indexed by modality of 'by' ("all" if None).
+        """
+        if (column, by) not in self.tests:
+            df = self.dataset()
+            values = df[column].to_numpy(dtype = np.float64)
+            cardio = self.groups.cat.codes.to_numpy()
+            if by is None:
+                strata, modalities = np.zeros(len(values), dtype = np.int64), pd.Index(["all"])
+            else:
+                strata, modalities = pd.factorize(df[by], sort = True)
+            ranks, tie_terms = ranks_by_stratum(values, strata, len(modalities))
+
+            n_0 = np.bincount(strata[cardio == 0], minlength = len(modalities)).astype(np.float64)
+            n_1 = np.bincount(strata[cardio == 1], minlength = len(modalities)).astype(np.float64)
+            u_0 = np.bincount(strata[cardio == 0], weights = ranks[cardio == 0], minlength = len(modalities)) - n_0 * (n_0 + 1) / 2
+            n = n_0 + n_1
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                sd = np.sqrt(n_0 * n_1 / 12 * ((n + 1) - tie_terms / (n * (n - 1))))
+                z = (np.maximum(u_0, n_0 * n_1 - u_0) - n_0 * n_1 / 2 - 0.5) / sd
+            pvals = np.clip(2 * norm.sf(z), 0, 1)
+
+            smallest = np.minimum(n_0, n_1)
+            for i in np.flatnonzero((smallest > 0) & (smallest <= 8)):
+                in_stratum = strata == i
+                u_0[i], pvals[i] = mannwhitneyu(values[in_stratum & (cardio == 0)], values[in_stratum & (cardio == 1)])
+            u_0[smallest == 0], pvals[smallest == 0] = np.nan, np.nan
+            self.tests[(column, by)] = pd.DataFrame({"u": u_0, "pval": pvals}, index = modalities.astype(str))
+        return self.tests[(column, by)]
+
+def ranks_by_stratum(values, strata, n_strata):
+    """
+    Ranks values within each stratum with a single sort, ties getting their average rank.
+
+    Parameters:
+    - values (np.ndarray): The values to rank.
+    - strata (np.ndarray): The stratum code (0 to n_strata - 1) of each value.
+    - n_strata (int): The number of strata.
+
+    Returns:
+    tuple: The rank of each value (from 1 in each stratum), and the sum of t³ - t over the groups of t tied values of each stratum.
+    """
+    order = np.lexsort((values, strata))
+    sorted_values, sorted_strata = values[order], strata[order]
+    block_starts = np.flatnonzero(np.r_[True, (sorted_values[1:] != sorted_values[:-1]) | (sorted_strata[1:] != sorted_strata[:-1])])
+    block_sizes = np.diff(np.r_[block_starts, len(values)])
+    block_ranks = block_starts + (block_sizes + 1) / 2
+    ranks = np.empty(len(values))
+    ranks[order] = np.repeat(block_ranks, block_sizes) - np.searchsorted(sorted_strata, sorted_strata)
+    tie_terms = np.bincount(sorted_strata[block_starts], weights = block_sizes.astype(np.float64) ** 3 - block_sizes, minlength = n_strata)
+    return ranks, tie_terms
+
+# GroupedStats of each dataset, dropped with the dataset
+_grouped_stats = {}
+
+def grouped_stats(df):
+    """
+    Returns the GroupedStats of a DataFrame, created on the first call for this DataFrame.
+    """
+    key = id(df)
+    if key not in _grouped_stats:
+        _grouped_stats[key] = GroupedStats(df)
+        weakref.finalize(df, _grouped_stats.pop, key, None)
+    return _grouped_stats[key]
+
+# GroupedStats shared by the copies of the last datasets (see share_grouped_stats), by dataset key
+_shared_stats = OrderedDict()
+_shared_stats_lock = threading.Lock()
+
+def share_grouped_stats(df, key, maxsize = 2):
+    """
+    Makes a DataFrame use the GroupedStats of the earlier copies of the same dataset, such as those returned
+    by st.cache_data on each rerun, so that the statistics are computed once per dataset rather than once per copy.
+    The statistics then keep the latest copy alive, and read the columns they have not computed yet from it.
+
+    Parameters:
+    - df (pd.DataFrame): A copy of the dataset.
+    - key (str): Identifies the dataset, e.g. the digest of its file.
+    - maxsize (int): Number of datasets whose statistics are kept.
+    """
+    with _shared_stats_lock:
+        stats = _shared_stats.pop(key, None) or GroupedStats(df)
+        stats.dataset = lambda: df
+        _shared_stats[key] = stats
+        while len(_shared_stats) > maxsize:
+            _shared_stats.popitem(last = False)
+        _grouped_stats[id(df)] = stats
+    weakref.finalize(df, _grouped_stats.pop, id(df), None)
+
+# Normality test of pval_shapiro (HSB_NORMALITY_TEST): "shapiro" runs Shapiro-Wilk on a sample of SHAPIRO_MAX_SIZE subjects
+# stratified by 'cardio' and drawn with a fixed seed, as its p-value is not accurate above 5000 values; "dagostino" runs the
+# D'Agostino-Pearson test, suited to large samples, on the whole column; "shapiro-full" runs Shapiro-Wilk on the whole column.
+NORMALITY_TESTS = ("shapiro", "dagostino", "shapiro-full")
+NORMALITY_TEST = os.environ.get('HSB_NORMALITY_TEST', 'shapiro')
+SHAPIRO_MAX_SIZE = 5000
+NORMALITY_SEED = 0
+
+# p-values of the normality tests, by test, column and hash of the column
+_normality_pvals = {}
+
+def stratified_sample(values, groups, size, seed = NORMALITY_SEED):
+    """
+    Draws the same sample of values every time, with each group represented in proportion to its size.
+
+    Parameters:
+    - values (np.ndarray): The values to sample.
+    - groups (np.ndarray): The group of each value.
+    - size (int): The size of the sample, all the values being returned if there are not more.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    np.ndarray: The sampled values, in their original order.
+    """
+    if len(values) <= size:
+        return values
+    rng = np.random.default_rng(seed)
+    indices = []
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        indices.append(rng.choice(members, round(size * len(members) / len(values)), replace = False))
+    return values[np.sort(np.concatenate(indices))]
+
+def normality_pval(df, column, test = NORMALITY_TEST):
+    """
+    Tests the normality of a numerical variable, once for each version of the column.
+
+    Parameters:
+    - df (pd.DataFrame): The dataset.
+    - column (str): The name of the numerical variable.
+    - test (str): One of NORMALITY_TESTS.
+
+    Returns:
+    float: The p-value of the test.
+    """
+    if test not in NORMALITY_TESTS:
+        raise ValueError(f"Unknown normality test {test!r}, expected one of {NORMALITY_TESTS}")
+    strata = ['cardio'] if 'cardio' in df.columns and column != 'cardio' else []
+    key = (test, column, len(df), int(pd.util.hash_pandas_object(df[[column] + strata], index = False).sum()))
+    if key not in _normality_pvals:
+        values = df[column].to_numpy(dtype = np.float64)
+        if test == "shapiro":
+            groups = pd.factorize(df['cardio'])[0] if strata else np.zeros(len(values))
+            pval = shapiro(stratified_sample(values, groups, SHAPIRO_MAX_SIZE))[1]
+        elif test == "dagostino":
+            pval = normaltest(values)[1]
+        else:
+            pval = shapiro(values)[1]
+        _normality_pvals[key] = pval
+    return _normality_pvals[key]
+
 def pval_shapiro(df, var):
-    pval = shapiro(df[var.name])[1]
+    pval = normality_pval(df, var.name)
     return f"Normally distributed <br>{pval_txt(pval)}" if pval >= 0.05 else f"Not normally distributed <br>{pval_txt(pval)}"
 
 def pval_txt(pval):
@@ -25,12 +283,10 @@ def pval_txt(pval):
     else:
         return f"<i>p</i> = {pval:.4f}"
 
-
 def mean_sd_range(df, var):
-    return (f"{np.mean(df[var.name]):.1f} ± {np.std(df[var.name]):.1f}", f"[{np.min(df[var.name]):.1f} - {np.max(df[var.name]):.1f}]")
-
+    mean, sd, minimum, maximum = grouped_stats(df).describe(var.name)
+    return (f"{mean:.1f} ± {sd:.1f}", f"[{minimum:.1f} - {maximum:.1f}]")
 
-    
 def chi2_cardio(df, var):
     """
     Calculates the chi-squared statistic and p-value for a categorical variable in relation to 'cardio'.
@@ -72,8 +328,24 @@ def mwu_cardio(df, var):
     pval: float
     The p-value of the Mann-Whitney U test.
     """
-    mwu, pval = mannwhitneyu(df[df['cardio'] == "0"][var.name], df[df['cardio'] == "1"][var.name])
-    return pval
+    return grouped_stats(df).mann_whitney(var.name).at["all", "pval"]
+
+def mwu_cardio_batch(df, columns, by = None):
+    """
+    Computes Mann-Whitney tests for the difference in several characteristics between patients with and without
+    cardiovascular disease, in all patients or within each modality of 'by' (see GroupedStats.mann_whitney).
+
+    Args:
+    columns: list of str
+    The names of the characteristics to compare.
+    by: str
+    The name of a categorical variable (e.g. 'sex') to split the patients by, or None.
+
+    Returns:
+    pd.DataFrame: U statistic ('u') and p-value ('pval'), indexed by characteristic and modality of 'by'.
+    """
+    stats = grouped_stats(df)
+    return pd.concat({column: stats.mann_whitney(column, by) for column in columns}, names = ['variable', by or 'group'])
 
 def mean_sd(df, var):
     """
@@ -86,7 +358,8 @@ def mean_sd(df, var):
     Returns:
     - str: A formatted string representing the mean and standard deviation in the format 'mean ± sd'.
     """
-    return f'{np.mean(df[var.name]):.1f} ± {np.std(df[var.name]):.1f}'
+    mean, sd, _, _ = grouped_stats(df).describe(var.name)
+    return f'{mean:.1f} ± {sd:.1f}'
 
 def mean_sd_1(df, var):
     """
@@ -99,7 +372,8 @@ def mean_sd_1(df, var):
     Returns:
     - str: A formatted string representing the mean and standard deviation in the format 'mean ± sd'.
     """
-    return f'{np.mean(df[df.cardio == "1"][var.name]):.1f} ± {np.std(df[df.cardio == "1"][var.name]):.1f}'
+    mean, sd, _, _ = grouped_stats(df).describe(var.name, "1")
+    return f'{mean:.1f} ± {sd:.1f}'
 
 def mean_sd_0(df, var):
     """
@@ -112,7 +386,8 @@ def mean_sd_0(df, var):
     Returns:
     - str: A formatted string representing the mean and standard deviation in the format 'mean ± sd'.
     """
-    return f'{np.mean(df[df.cardio == "0"][var.name]):.1f} ± {np.std(df[df.cardio == "0"][var.name]):.1f}'
+    mean, sd, _, _ = grouped_stats(df).describe(var.name, "0")
+    return f'{mean:.1f} ± {sd:.1f}'
 
 def pp(df, var):
     """
@@ -125,7 +400,7 @@ def pp(df, var):
     Returns:
     - str: A formatted string representing the percentage of positive occurrences in the format 'xx.x%'.
     """
-    return f'{df[var.name].value_counts(normalize = True)[1]:.1%}'
+    return f'{grouped_stats(df).shares(var.name).iloc[1]:.1%}'
     
 def pp_0(df, var):
     """
@@ -138,7 +413,7 @@ def pp_0(df, var):
     Returns:
     - str: A formatted string representing the percentage of positive occurrences in the format 'xx.x%'.
     """
-    return f'{df[df.cardio == "0"][var.name].value_counts(normalize = True)[1]:.1%}'
+    return f'{grouped_stats(df).shares(var.name, "0").iloc[1]:.1%}'
     
 def pp_1(df, var):
     """
@@ -151,38 +426,34 @@ def pp_1(df, var):
     Returns:
     - str: A formatted string representing the percentage of positive occurrences in the format 'xx.x%'.
     """
-    return f'{df[df.cardio == "1"][var.name].value_counts(normalize = True)[1]:.1%}'
+    return f'{grouped_stats(df).shares(var.name, "1").iloc[1]:.1%}'
 
 def pp_3_cardio(df, var, card):
-    if card == "0":
-        df = df[df['cardio'] == "0"]
-    else:
-        df = df[df['cardio'] == "1"]
-    return f"""N: {df[var.name].value_counts(normalize = True)["1"]:.1%}
-    <br>+: {df[var.name].value_counts(normalize = True)["2"]:.1%}
-    <br>++: {df[var.name].value_counts(normalize = True)["3"]:.1%}
+    shares = grouped_stats(df).shares(var.name, "0" if card == "0" else "1")
+    return f"""N: {shares["1"]:.1%}
+    <br>+: {shares["2"]:.1%}
+    <br>++: {shares["3"]:.1%}
     """
 
 def pp_3(df, var):
-    return f"""N: {df[var.name].value_counts(normalize = True)["1"]:.1%}
-    <br>+: {df[var.name].value_counts(normalize = True)["2"]:.1%}
-    <br>++: {df[var.name].value_counts(normalize = True)["3"]:.1%}
+    shares = grouped_stats(df).shares(var.name)
+    return f"""N: {shares["1"]:.1%}
+    <br>+: {shares["2"]:.1%}
+    <br>++: {shares["3"]:.1%}
     """
 
 def pp_4_cardio(df, var, card):
-    if card == "0":
-        df = df[df['cardio'] == "0"]
-    else:
-        df = df[df['cardio'] == "1"]
-    return f"""Normal: {df[var.name].value_counts(normalize = True)["1"]:.1%}
-    <br>Elevated: {df[var.name].value_counts(normalize = True)["2"]:.1%}
-    <br>High Blood Pressure stage I: {df[var.name].value_counts(normalize = True)["3"]:.1%}
-    <br>High Blood Pressure stage II: {df[var.name].value_counts(normalize = True)["4"]:.1%}
+    shares = grouped_stats(df).shares(var.name, "0" if card == "0" else "1")
+    return f"""Normal: {shares["1"]:.1%}
+    <br>Elevated: {shares["2"]:.1%}
+    <br>High Blood Pressure stage I: {shares["3"]:.1%}
+    <br>High Blood Pressure stage II: {shares["4"]:.1%}
     """
 
 def pp_4(df, var):
-    return f"""Normal: {df[var.name].value_counts(normalize = True)["1"]:.1%}
-    <br>Elevated: {df[var.name].value_counts(normalize = True)["2"]:.1%}
-    <br>High Blood Pressure stage I: {df[var.name].value_counts(normalize = True)["3"]:.1%}
-    <br>High Blood Pressure stage II: {df[var.name].value_counts(normalize = True)["4"]:.1%}
+    shares = grouped_stats(df).shares(var.name)
+    return f"""Normal: {shares["1"]:.1%}
+    <br>Elevated: {shares["2"]:.1%}
+    <br>High Blood Pressure stage I: {shares["3"]:.1%}
+    <br>High Blood Pressure stage II: {shares["4"]:.1%}
     """
\ No newline at end of file
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import threading
+import warnings
+from collections import OrderedDict
+import joblib
+import numpy as np
+from hsb_features import bmi, ap_m
+
+# The model was fitted on a DataFrame, but is fed NumPy arrays at inference time
+warnings.filterwarnings("ignore", message = "X does not have valid feature names", category = UserWarning)
+
+# Features expected by the SVM, in the order used for training
+FEATURES = ["age", "ap_hi", "ap_lo", "cholesterol", "gluc", "bmi", "ap_m"]
+
+
+class Preprocessor:
+    """
+    Maps raw subject inputs to the scaled feature vector expected by the SVM, without going through pandas.
+
+    The label encoding and min-max scaling parameters are read once from the fitted LabelEncoder and
+    MinMaxScaler, so that each prediction only costs a few arithmetic operations on a NumPy array.
+    """
+    def __init__(self, scale, offset, classes, clip_range = None):
+        self.scale = np.asarray(scale, dtype = np.float64)
+        self.offset = np.asarray(offset, dtype = np.float64)
+        self.clip_range = clip_range
+        self.classes = np.asarray(classes)
+        self.codes = {label.item(): code for code, label in enumerate(self.classes)}
+
+    @classmethod
+    def from_fitted(cls, scaler, le):
+        clip_range = tuple(scaler.feature_range) if getattr(scaler, "clip", False) else None
+        return cls(scaler.scale_, scaler.min_, le.classes_, clip_range)
+
+    @classmethod
+    def from_files(cls, scaler_path, le_path):
+        return cls.from_fitted(joblib.load(scaler_path), joblib.load(le_path))
+
+    def encode(self, label):
+        try:
+            return self.codes[label]
+        except KeyError:
+            raise ValueError(f"y contains previously unseen labels: {label}") from None
+
+    def encode_batch(self, labels):
+        labels = np.asarray(labels)
+        codes = np.searchsorted(self.classes, labels).clip(0, len(self.classes) - 1)
+        if not np.array_equal(self.classes[codes], labels):
+            raise ValueError(f"y contains previously unseen labels: {np.setdiff1d(labels, self.classes)}")
+        return codes
+
+    def scale_features(self, features):
+        features *= self.scale
+        features += self.offset
+        if self.clip_range is not None:
+            np.clip(features, self.clip_range[0], self.clip_range[1], out = features)
+        return features
+
+    def scale_subject(self, age, ap_hi, ap_lo, cholesterol, gluc, bmi, ap_m):
+        """
+        Encodes and scales the model features of a single subject.
+
+        Returns:
+            np.ndarray: A (1, 7) array, with columns in the order of FEATURES.
+        """
+        features = np.array([[age, ap_hi, ap_lo, self.encode(cholesterol), self.encode(gluc), bmi, ap_m]], dtype = np.float64)
+        return self.scale_features(features)
+
+    def transform(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
+        """
+        Computes BMI and mean arterial pressure from the raw inputs of a single subject, then encodes and scales its features.
+
+        Returns:
+            np.ndarray: A (1, 7) array, with columns in the order of FEATURES.
+        """
+        height_in_meters = height / 100     # Convert height (cm to meters)
+        bmi = round(weight / (height_in_meters ** 2), 1)
+        ap_m = round((ap_hi + 2 * ap_lo) / 3, 1)
+        return self.scale_subject(age, ap_hi, ap_lo, cholesterol, gluc, bmi, ap_m)
+
+    def transform_batch(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
+        """
+        Vectorized counterpart of transform: each argument is an array with one value per subject.
+
+        Returns:
+            np.ndarray: A (n, 7) array, with columns in the order of FEATURES.
+        """
+        features = np.empty((len(weight), len(FEATURES)), dtype = np.float64)
+        features[:, 0] = age
+        features[:, 1] = ap_hi
+        features[:, 2] = ap_lo
+        features[:, 3] = self.encode_batch(cholesterol)
+        features[:, 4] = self.encode_batch(gluc)
+        features[:, 5] = bmi(weight, height)
+        features[:, 6] = ap_m(ap_hi, ap_lo)
+        return self.scale_features(features)
+
+
+class PredictionCache:
+    """
+    Size-bounded, thread-safe LRU cache of decision values, keyed on the scaled feature vector of a subject.
+
+    Inputs are integers within the form's ranges and BMI and mean arterial pressure are rounded to 0.1,
+    so identical subjects are frequent and their prediction can be reused.
+    """
+    def __init__(self, maxsize = 4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def decision_function(self, model, features):
+        """
+        Returns the decision value of 'model' for a (1, 7) feature array, from the cache when possible.
+        """
+        key = tuple(features.ravel().tolist())
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = float(model.decision_function(features)[0])
+        with self.lock:
+            self.entries[key] = value
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last = False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+            }
+
+
+def file_digest(path):
+    """
+    Computes the SHA-256 digest of a file, used to tie derived artifacts to the files they were built from.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Calibrator:
+    """
+    Maps the decision values of the model to probabilities with a sigmoid fitted offline (Platt scaling),
+    which avoids training the SVM with probability=True.
+    """
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = intercept
+
+    @classmethod
+    def load(cls, path, model_path):
+        """
+        Loads a calibration, unless it is missing or was fitted for another model than the one at 'model_path'.
+
+        Returns:
+            Calibrator or None
+        """
+        try:
+            with open(path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta["model_digest"] != file_digest(model_path):
+            print(f"Ignoring {path}: it was not fitted for {model_path}")
+            return None
+        return cls(meta["coef"], meta["intercept"])
+
+    def probability(self, decision_value):
+        """
+        Returns the probability of class 1 for a decision value (or an array of decision values).
+        """
+        return 1 / (1 + np.exp(-(self.coef * decision_value + self.intercept)))
@@ -1,85 +1,90 @@
 import streamlit as st
 import joblib
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+import os
+from hsb_model import Preprocessor, PredictionCache, Calibrator
 
-def test_the_model():
-    svm = joblib.load('streamlit_hsb/hsb_svm.pkl')
-    scaler = joblib.load('streamlit_hsb/hsb_scaler.pkl')
-    le = joblib.load('streamlit_hsb/hsb_le.pkl')
-
-
-    class Subject:
-        def __init__(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
-            self.age = age                                 # in years
-            self.weight = weight                           # in kg
-            self.height = height                           # in cm
-            self.ap_hi = ap_hi                             # in mmHg
-            self.ap_lo = ap_lo                             # in mmHg
-            self.cholesterol = cholesterol                 # categorical: 1 = normal, 2 = above average, 3 = well above average
-            self.gluc = gluc                               # categorical: 1 = normal,  2 = above average, 3 = well above average
-            self.bmi = self.calculate_bmi()                # calculate BMI
-            self.ap_m = self.calculate_ap_m()              # calculate mean arterial pressure
-            
-        def calculate_bmi(self):
-            # Calculate BMI (weight / (height in meters)^2)
-            height_m = self.height / 100  # Convert height from cm to meters
-            return round(self.weight / (height_m ** 2), 1)
-        
-        def calculate_ap_m(self):
-            # Calculate mean arterial pressure
-            return round((self.ap_hi + 2 * self.ap_lo) / 3, 1)
+# HSB_MODEL_PATH may point to a compressed model built with app_hsb/model_build.py
+MODEL_PATH = os.environ.get('HSB_MODEL_PATH', 'streamlit_hsb/hsb_svm.pkl')
+
+# Shared by all sessions and reruns, as long as the process lives
+prediction_cache = PredictionCache(maxsize = 4096)
+
+@st.cache_resource
+def load_artifacts():
+    """
+    Loads the model, the preprocessing parameters and the calibration once per process, for all sessions and reruns.
+
+    Returns:
+        tuple: The SVM, the Preprocessor and the Calibrator (None if unavailable).
+    """
+    svm = joblib.load(MODEL_PATH)
+    calibrator = Calibrator.load('streamlit_hsb/hsb_calibration.json', MODEL_PATH)
+    preprocessor = Preprocessor.from_files('streamlit_hsb/hsb_scaler.pkl', 'streamlit_hsb/hsb_le.pkl')
+    return svm, preprocessor, calibrator
+
+
+class Subject:
+    def __init__(self, age, weight, height, ap_hi, ap_lo, cholesterol, gluc):
+        self.age = age                                 # in years
+        self.weight = weight                           # in kg
+        self.height = height                           # in cm
+        self.ap_hi = ap_hi                             # in mmHg
+        self.ap_lo = ap_lo                             # in mmHg
+        self.cholesterol = cholesterol                 # categorical: 1 = normal, 2 = above average, 3 = well above average
+        self.gluc = gluc                               # categorical: 1 = normal,  2 = above average, 3 = well above average
+        self.bmi = self.calculate_bmi()                # calculate BMI
+        self.ap_m = self.calculate_ap_m()              # calculate mean arterial pressure
         
-        def make_predict(self):
-            # Gathers subjects data
-            subject_data = {
-                "age": [self.age],
-                "ap_hi": [self.ap_hi],
-                "ap_lo": [self.ap_lo],
-                "cholesterol": [self.cholesterol],
-                "gluc": [self.gluc],
-                "bmi": [self.bmi],
-                "ap_m": [self.ap_m]
-            }
-            
-            # Create a DataFrame
-            df_subject = pd.DataFrame(subject_data)
-            df_s1 = df_subject.copy()
-            # Preprocess data: label encoding, min-max scaling
-            df_subject['cholesterol'] = le.transform(df_subject['cholesterol'])
-            df_subject['gluc'] = le.transform(df_subject['gluc'])
-            
-            cols = df_subject.columns
-            df_subject = scaler.transform(df_subject)
-            df_subject = pd.DataFrame(df_subject, columns = cols)
-            
-            # Make the prediction
-            sub_pred = svm.predict(df_subject)
-            if sub_pred == [0]:
-                st.markdown(f"""
-                            <div class = 'all'>
-                            <p style = 'margin-left: 3px; border-left: 5px solid darkgreen; padding-left: 8px; padding-bottom: 5px;'>
-                            <b>Based on the information provided, the model predicts that it is unlikely for you to have a cardiovascular disease.</b> 
-                            <br>However, it's essential to maintain a healthy lifestyle and consult with a 
-                            healthcare professional for personalized advice and preventive measures.
-                            </p>
-                            <p>
-                            <i>The accuracy of this prediction is of 74%</i>.
-                            </p>
-                            </div>""", unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                            <div class = 'all'>
-                            <p style = 'margin-left: 3px; border-left: 5px solid firebrick; padding-left: 8px; padding-bottom: 5px;'>
-                            <b>Based on the information provided, the model predicts that you may have a higher risk of cardiovascular disease.</b> 
-                            <br>It's important to consult with a healthcare professional for further evaluation and guidance.
-                            </p>
-                            <p>
-                            <i>The accuracy of this prediction is of 74%</i>.
-                            </p>
-                            </div>
-                            """, unsafe_allow_html=True)
+    def calculate_bmi(self):
+        # Calculate BMI (weight / (height in meters)^2)
+        height_m = self.height / 100  # Convert height from cm to meters
+        return round(self.weight / (height_m ** 2), 1)
+    
+    def calculate_ap_m(self):
+        # Calculate mean arterial pressure
+        return round((self.ap_hi + 2 * self.ap_lo) / 3, 1)
+    
+    def make_predict(self):
+        svm, preprocessor, calibrator = load_artifacts()
+
+        # Preprocess data: label encoding, min-max scaling
+        subject = preprocessor.scale_subject(self.age, self.ap_hi, self.ap_lo, self.cholesterol, self.gluc, self.bmi, self.ap_m)
         
+        # Make the prediction
+        decision_value = prediction_cache.decision_function(svm, subject)
+        sub_pred = svm.classes_[int(decision_value > 0)]
+
+        risk_note = ""
+        if calibrator is not None:
+            risk_note = f"<br><i>Estimated risk of cardiovascular disease: {calibrator.probability(decision_value):.0%}</i>."
+
+        if sub_pred == 0:
+            st.markdown(f"""
+                        <div class = 'all'>
+                        <p style = 'margin-left: 3px; border-left: 5px solid darkgreen; padding-left: 8px; padding-bottom: 5px;'>
+                        <b>Based on the information provided, the model predicts that it is unlikely for you to have a cardiovascular disease.</b> 
+                        <br>However, it's essential to maintain a healthy lifestyle and consult with a 
+                        healthcare professional for personalized advice and preventive measures.
+                        </p>
+                        <p>
+                        <i>The accuracy of this prediction is of 74%</i>.{risk_note}
+                        </p>
+                        </div>""", unsafe_allow_html=True)
+        else:
+            st.markdown(f"""
+                        <div class = 'all'>
+                        <p style = 'margin-left: 3px; border-left: 5px solid firebrick; padding-left: 8px; padding-bottom: 5px;'>
+                        <b>Based on the information provided, the model predicts that you may have a higher risk of cardiovascular disease.</b> 
+                        <br>It's important to consult with a healthcare professional for further evaluation and guidance.
+                        </p>
+                        <p>
+                        <i>The accuracy of this prediction is of 74%</i>.{risk_note}
+                        </p>
+                        </div>
+                        """, unsafe_allow_html=True)
+
+
+def test_the_model():
     st.markdown(f"""
                 <div class = 'all'>
                     <h1>Cardiovascular Disease Prediction</h1>